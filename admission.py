@@ -0,0 +1,141 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+
+import psutil
+
+logger = logging.getLogger("admission")
+
+# load_fnc values are normalized so 1.0 means "at a limit"; LiveKit stops sending
+# jobs once the reported load reaches this threshold (must be < 1 in production).
+LOAD_THRESHOLD = 0.99
+
+# Job processes that haven't reported lag for this long are ignored and their file removed (dead).
+_LAG_STALE_SECONDS = 10
+
+
+class AdmissionControl:
+    """
+    Load reporting and job admission for the worker (runs in the main worker process).
+
+    Reported load is the highest of:
+      - active sessions / max_calls
+      - system CPU / cpu_limit
+      - worst event-loop lag among job processes / lag_budget_ms
+    so the worker reports itself full as soon as any of them hits its limit, and
+    request_fnc() rejects new jobs at capacity or while draining so LiveKit sends
+    them to another worker.
+    """
+
+    def __init__(self, max_calls: int, cpu_limit: float, lag_budget_ms: float, metrics_dir: str):
+        self.max_calls = max_calls
+        self.cpu_limit = cpu_limit
+        self.lag_budget_ms = lag_budget_ms
+        self.metrics_dir = metrics_dir
+        self.worker = None
+        self.last_load = 0.0
+        psutil.cpu_percent(interval=None)  # Prime: the first reading is always 0
+
+    def _loop_lag_ms(self) -> float:
+        worst = 0.0
+        now = time.time()
+        for path in glob.glob(os.path.join(self.metrics_dir, "lag-*.json")):
+            try:
+                with open(path) as f:
+                    sample = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if now - sample.get("ts", 0) > _LAG_STALE_SECONDS:
+                # Left by a job process that exited without stopping its monitor
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            worst = max(worst, sample.get("lag_ms", 0.0))
+        return worst
+
+    def load(self, worker) -> float:
+        """WorkerOptions.load_fnc - called periodically from an executor thread."""
+        self.worker = worker
+        sessions = len(worker.active_jobs) / max(self.max_calls, 1)
+        cpu = psutil.cpu_percent(interval=None) / 100 / self.cpu_limit
+        lag = self._loop_lag_ms() / self.lag_budget_ms
+        self.last_load = min(1.0, max(sessions, cpu, lag))
+        return self.last_load
+
+    async def on_request(self, req):
+        """WorkerOptions.request_fnc - accept or pass on each job offer."""
+        worker = self.worker
+        if worker is not None:
+            if worker.draining:
+                logger.info(f"Draining; passing on job {req.id}")
+                await req.reject(terminate=False)
+                return
+            active = len(worker.active_jobs)
+            if active >= self.max_calls or self.last_load >= LOAD_THRESHOLD:
+                logger.warning(
+                    f"At capacity ({active}/{self.max_calls} calls, load {self.last_load:.2f}); "
+                    f"passing on job {req.id}"
+                )
+                await req.reject(terminate=False)
+                return
+        await req.accept()
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag inside a job process (how late a short sleep wakes up)
+    and publishes a smoothed value to <metrics_dir>/lag-<pid>.json for AdmissionControl.
+    stop() removes the file when the job ends.
+    """
+
+    def __init__(self, metrics_dir: str, interval: float = 0.05, publish_every: float = 1.0):
+        self.metrics_dir = metrics_dir
+        self.interval = interval
+        self.publish_every = publish_every
+        self.lag_ms = 0.0
+        self._task = None
+        self._path = os.path.join(metrics_dir, f"lag-{os.getpid()}.json")
+
+    def start(self):
+        """Start once per process (idempotent). Must be called inside the running loop."""
+        if self._task is None or self._task.done():
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        last_publish = 0.0
+        while True:
+            t = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, (time.perf_counter() - t - self.interval) * 1000)
+            # Rise fast, decay slowly: spikes matter for audio quality
+            self.lag_ms = lag if lag > self.lag_ms else self.lag_ms * 0.9 + lag * 0.1
+
+            if time.perf_counter() - last_publish >= self.publish_every:
+                last_publish = time.perf_counter()
+                try:
+                    tmp = self._path + ".tmp"
+                    with open(tmp, "w") as f:
+                        json.dump({"lag_ms": round(self.lag_ms, 2), "ts": time.time()}, f)
+                    os.replace(tmp, self._path)
+                except OSError:
+                    pass
+
+    async def stop(self):
+        """At job end: stop measuring and remove this process's lag file."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            os.remove(self._path)
+        except OSError:
+            pass
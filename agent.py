@@ -9,154 +9,284 @@ import json
 from dotenv import load_dotenv
 
 from livekit import agents, api
-from livekit.agents import AgentSession, Agent, RoomInputOptions
-from livekit.plugins import (
-    openai,
-    cartesia,
-    deepgram,
-    noise_cancellation,
-    silero,
-    sarvam,
-)
+from livekit.agents import AgentSession, Agent, RoomInputOptions, RoomOutputOptions, StopResponse
 from livekit.agents import llm
 from typing import Annotated, Optional
+from datetime import timedelta
 import asyncio
+import sys
+import time
 
 # Load environment variables
 load_dotenv(".env")
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("outbound-agent")
 
 import config
+import provider_registry
+from provider_pool import ProviderPool
+import greeting_cache
+from greeting_cache import GreetingCache
+from transcript_delivery import TranscriptDelivery
+import turn_metrics
+from turn_metrics import LatencyHistograms, TurnTracker
+from admission import AdmissionControl, LoopLagMonitor, LOAD_THRESHOLD
+from trunk_pool import TrunkPool
+from answer_cache import AnswerCache, AnswerResponder
+from speculation import Speculator
+from tool_runtime import CallTools, ToolRegistry
+from chat_compaction import ChatCompactor
+from provider_chain import ProviderChain, ProviderHealth, TextTee, llm_opener, tts_opener
+from call_recorder import CallRecorder
+from answering_machine import DEFAULT_KEYWORDS, MACHINE, MachineClassifier, MachineDetector
+from pipeline_warmup import PipelineWarmup
+from trunk_pool import dial_outcome, sip_status
+import call_tracing
+from call_tracing import CallTrace
+import telephony_audio
+from telephony_audio import AudioPath, CallCPU
+from call_transfer import CallTransfer
+from call_transcript import CallTranscript
 
 # TRUNK ID - Now loaded from config.py
 # You can find this by running 'python setup_trunk.py --list' or checking LiveKit Dashboard 
 
 
-def _build_tts(config_provider: str = None, config_voice: str = None):
+def _tts_spec(config_provider: str = None, config_voice: str = None, cfg=config):
+    """
+    Resolve which TTS provider / model / voice to use (see provider_registry).
+    Priority: Config > Env Var > Default
+
+    Returns:
+        (provider, *settings) - e.g. (provider, model, voice, language, sample_rate, chunking) for the built-ins.
+    """
+    provider = (config_provider or os.getenv("TTS_PROVIDER", cfg.DEFAULT_TTS_PROVIDER)).lower()
+
+    # A provider-specific voice name (e.g. Sarvam's Anushka/Aravind) forces that provider
+    tts = provider_registry.for_voice("tts", config_voice) or provider_registry.get("tts", provider, "openai")
+    return (tts.name,) + tts.spec(cfg, config_voice)
+
+
+def _build_tts(config_provider: str = None, config_voice: str = None, cfg=config):
     """Configure the Text-to-Speech provider based on env vars or dynamic config."""
-    # Priority: Config > Env Var > Default
-    provider = (config_provider or os.getenv("TTS_PROVIDER", config.DEFAULT_TTS_PROVIDER)).lower()
-    
-    # If using Sarvam Voice names (Anushka/Aravind), force Sarvam provider
-    if config_voice in ["anushka", "aravind", "amartya", "dhruv"]:
-        provider = "sarvam"
-
-    if provider == "cartesia":
-        logger.info("Using Cartesia TTS")
-        model = os.getenv("CARTESIA_TTS_MODEL", config.CARTESIA_MODEL)
-        voice = os.getenv("CARTESIA_TTS_VOICE", config.CARTESIA_VOICE)
-        return cartesia.TTS(model=model, voice=voice)
-    
-    if provider == "sarvam":
-        logger.info(f"Using Sarvam TTS (Voice: {config_voice})")
-        model = os.getenv("SARVAM_TTS_MODEL", config.SARVAM_MODEL)
-        # Use dynamic voice or env var or default
-        voice = config_voice or os.getenv("SARVAM_VOICE", "anushka")
-        language = os.getenv("SARVAM_LANGUAGE", config.SARVAM_LANGUAGE)
-        return sarvam.TTS(model=model, speaker=voice, target_language_code=language)
-
-    # Default to OpenAI
-    logger.info(f"Using OpenAI TTS (Voice: {config_voice})")
-    model = os.getenv("OPENAI_TTS_MODEL", "tts-1")
-    voice = config_voice or os.getenv("OPENAI_TTS_VOICE", config.DEFAULT_TTS_VOICE)
-    return openai.TTS(model=model, voice=voice)
-
-
-def _build_llm(config_provider: str = None):
+    provider, *settings = _tts_spec(config_provider, config_voice, cfg)
+    logger.info(f"Using {provider} TTS ({', '.join(str(v) for v in settings if v is not None)})")
+    return provider_registry.get("tts", provider).create(settings)
+
+
+def _llm_spec(config_provider: str = None, cfg=config):
+    """
+    Resolve which LLM provider / model to use (unknown providers fall back to OpenAI).
+
+    Returns:
+        (provider, *settings)
+    """
+    provider = (config_provider or os.getenv("LLM_PROVIDER", cfg.DEFAULT_LLM_PROVIDER)).lower()
+    llm_provider = provider_registry.get("llm", provider, "openai")
+    return (llm_provider.name,) + llm_provider.spec(cfg)
+
+
+def _build_llm(config_provider: str = None, cfg=config):
     """Configure the LLM provider based on config or env vars."""
-    provider = (config_provider or os.getenv("LLM_PROVIDER", config.DEFAULT_LLM_PROVIDER)).lower()
-
-    if provider == "groq":
-        logger.info("Using Groq LLM")
-        return openai.LLM(
-            base_url="https://api.groq.com/openai/v1",
-            api_key=os.getenv("GROQ_API_KEY"),
-            model=os.getenv("GROQ_MODEL", config.GROQ_MODEL),
-            temperature=float(os.getenv("GROQ_TEMPERATURE", str(config.GROQ_TEMPERATURE))),
+    provider, *settings = _llm_spec(config_provider, cfg)
+    logger.info(f"Using {provider} LLM")
+    return provider_registry.get("llm", provider).create(settings)
+
+
+def _stt_spec(cfg=config):
+    """(provider, *settings) for the Speech-to-Text provider (STT_PROVIDER, Deepgram by default)."""
+    stt = provider_registry.get("stt", cfg.STT_PROVIDER, "deepgram")
+    return (stt.name,) + stt.spec(cfg)
+
+
+def _build_stt(cfg=config):
+    """Configure the Speech-to-Text provider (STT_PROVIDER, Deepgram by default)."""
+    provider, *settings = _stt_spec(cfg)
+    return provider_registry.get("stt", provider).create(settings)
+
+
+def _load_vad(sample_rate: int = None):
+    """Silero VAD, running at the telephony rate when there is one (no resampling in front of it)."""
+    return provider_registry.load_plugin("silero").VAD.load(sample_rate=sample_rate or telephony_audio.DEFAULT_RATE)
+
+
+def _noise_cancellation():
+    return provider_registry.load_plugin("noise_cancellation").BVCTelephony()
+
+
+def _borrow_plugins(pool: ProviderPool, config_dict: dict, cfg=config):
+    """
+    Borrow ready STT / LLM / TTS clients from the per-process pool.
+
+    Returns:
+        (stt, llm, tts, saved_ms) - saved_ms is the setup time skipped thanks to the pool.
+    """
+    model_provider = config_dict.get("model_provider")
+    voice_id = config_dict.get("voice_id")
+
+    stt_client, stt_saved = pool.borrow(("stt",) + _stt_spec(cfg), lambda: _build_stt(cfg))
+    llm_client, llm_saved = pool.borrow(
+        ("llm",) + _llm_spec(model_provider, cfg), lambda: _build_llm(model_provider, cfg)
+    )
+    tts_client, tts_saved = pool.borrow(
+        ("tts",) + _tts_spec(model_provider, voice_id, cfg), lambda: _build_tts(model_provider, voice_id, cfg)
+    )
+    return stt_client, llm_client, tts_client, stt_saved + llm_saved + tts_saved
+
+
+def _side_llm(pool: ProviderPool, model_provider: str = None, cfg=config):
+    """
+    A second client for the call's LLM, for requests that aren't caller turns (running
+    summaries, greeting text, speculation, warm-up priming). The session reports every
+    LLMMetrics its own client emits as part of the current turn, so these stay off it.
+    """
+    client, _ = pool.borrow(
+        ("llm_side",) + _llm_spec(model_provider, cfg), lambda: _build_llm(model_provider, cfg)
+    )
+    return client
+
+
+def _provider_chain(pool: ProviderPool, kind: str, primary: tuple, cfg=config) -> list:
+    """
+    [(name, client), ...] for a provider chain: the call's primary provider, then the
+    LLM_CHAIN / TTS_CHAIN entries (borrowed from the pool like the primary).
+    """
+    chain = [primary]
+    names = (cfg.LLM_CHAIN if kind == "llm" else cfg.TTS_CHAIN).lower().split(",")
+    for name in filter(None, (n.strip() for n in names)):
+        if name in (n for n, _ in chain):
+            continue
+        if kind == "llm":
+            client, _ = pool.borrow(("llm",) + _llm_spec(name, cfg), lambda: _build_llm(name, cfg))
+        else:
+            client, _ = pool.borrow(("tts",) + _tts_spec(name, None, cfg), lambda: _build_tts(name, None, cfg))
+        chain.append((name, client))
+    return chain
+
+
+def _new_trunk_pool() -> TrunkPool:
+    limits = {}
+    for item in filter(None, (p.strip() for p in config.TRUNK_LIMITS.split(","))):
+        trunk_id, _, cap = item.partition(":")
+        limits[trunk_id] = int(cap)
+    return TrunkPool(
+        config.TRUNK_STATE_PATH,
+        max_concurrent=config.TRUNK_MAX_CONCURRENT,
+        min_health=config.TRUNK_MIN_HEALTH,
+        cooldown=config.TRUNK_COOLDOWN,
+        limits=limits,
+    )
+
+
+def _new_tool_registry() -> ToolRegistry:
+    return ToolRegistry(
+        config.TOOLS_CACHE_PATH,
+        default_timeout=config.TOOL_TIMEOUT,
+        default_ttl=config.TOOL_CACHE_TTL,
+        max_entries=config.TOOL_CACHE_MAX_ENTRIES,
+        results_path=config.TOOL_RESULTS_PATH,
+    )
+
+
+def prewarm(proc: agents.JobProcess):
+    """
+    Runs once per worker process, before any job is assigned to it.
+    Loads the VAD model and builds the default STT / LLM / TTS clients so
+    answered calls don't pay model load and connection setup.
+    """
+    start = time.perf_counter()
+    # Log records are handed to a background thread: the event loop never writes logs
+    call_tracing.use_queue_logging()
+    # Last-known-good Dashboard settings from disk (instant); each job re-reads the file
+    config.load_cached_config()
+
+    proc.userdata["vad"] = _load_vad(telephony_audio.sample_rate(config))
+    proc.userdata["vad_load_ms"] = (time.perf_counter() - start) * 1000
+
+    # Only the plugins this deployment selects are imported (see provider_registry)
+    pool = ProviderPool()
+    stt_client, llm_client, tts_client, _ = _borrow_plugins(pool, {})
+    _provider_chain(pool, "llm", (_llm_spec(None)[0], llm_client))
+    _side_llm(pool)
+    _provider_chain(pool, "tts", (_tts_spec(None)[0], tts_client))
+    provider_registry.load_plugin("noise_cancellation")
+    proc.userdata["provider_pool"] = pool
+    proc.userdata["turn_histograms"] = LatencyHistograms(config.METRICS_DIR)
+    proc.userdata["provider_health"] = ProviderHealth(
+        config.PROVIDER_BREAKER_FAILURES, config.PROVIDER_BREAKER_COOLDOWN, proc.userdata["turn_histograms"],
+        config.PROVIDER_STATE_PATH,
+    )
+    proc.userdata["loop_lag_monitor"] = LoopLagMonitor(config.METRICS_DIR)
+    if config.TRACING_ENABLED:
+        proc.userdata["tracer_provider"] = call_tracing.new_tracer_provider(config.TRACE_DIR, "outbound-agent")
+    proc.userdata["trunk_pool"] = _new_trunk_pool()
+    proc.userdata["tool_registry"] = _new_tool_registry()
+    proc.userdata["tool_registry"].load()
+
+    if config.ANSWER_CACHE_ENABLED:
+        answers = AnswerCache(
+            ttl=config.ANSWER_CACHE_TTL,
+            max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+            threshold=config.ANSWER_CACHE_THRESHOLD,
+            learned_path=config.ANSWER_CACHE_LEARNED_PATH,
         )
-    
-    # Default to OpenAI
-    logger.info("Using OpenAI LLM")
-    return openai.LLM(model=config.DEFAULT_LLM_MODEL)
+        answers.load_faq(config.ANSWER_CACHE_FAQ_PATH, config.SYSTEM_PROMPT)
+
+        def on_prompt_change(changed):
+            if "SYSTEM_PROMPT" in changed:
+                answers.invalidate()
+                answers.load_faq(config.ANSWER_CACHE_FAQ_PATH, config.SYSTEM_PROMPT)
+
+        config.on_change(on_prompt_change)
+        proc.userdata["answer_cache"] = answers
+
+    if config.GREETING_CACHE_ENABLED:
+        cache = GreetingCache(config.GREETING_CACHE_DIR, config.GREETING_CACHE_MAX_MB * 1024 * 1024)
+        config.on_change(lambda changed: cache.invalidate())
+        proc.userdata["greeting_cache"] = cache
+
+    logger.info(
+        f"Prewarm done in {(time.perf_counter() - start) * 1000:.0f} ms "
+        f"(VAD {proc.userdata['vad_load_ms']:.0f} ms, {len(pool)} clients)"
+    )
+    logger.info(
+        "Plugin imports: "
+        + ", ".join(f"{name} {ms:.0f} ms" for name, ms in provider_registry.import_profile().items())
+    )
 
 
 
 class TransferFunctions(llm.ToolContext):
-    def __init__(self, ctx: agents.JobContext, phone_number: str = None):
+    def __init__(self, ctx: agents.JobContext, phone_number: str = None, cfg=config, tools: CallTools = None,
+                 transfer: CallTransfer = None):
         super().__init__(tools=[])
         self.ctx = ctx
         self.phone_number = phone_number
+        self.cfg = cfg
+        self.call_tools = tools
+        self.transfer = transfer
 
     @llm.function_tool(description="Look up user details by phone number.")
-    def lookup_user(self, phone: str):
+    async def lookup_user(self, phone: str):
         """
-        Mock function to look up user details.
+        Look up the contact's details (attributes sent by the Dashboard with the call).
 
         Args:
             phone: The phone number to look up
         """
         logger.info(f"Looking up user: {phone}")
-        return f"User found: Shreyas Raj. Status: Premium. Last order: Coffee setup (Delivered)."
+        if self.call_tools is None:
+            return "No details on file for this contact."
+        return await self.call_tools.lookup_contact(phone)
 
     @llm.function_tool(description="Transfer the call to a human support agent or another phone number.")
     async def transfer_call(self, destination: Optional[str] = None):
         """
         Transfer the call.
         """
-        if destination is None:
-            destination = config.DEFAULT_TRANSFER_NUMBER
-            if not destination:
-                 return "Error: No default transfer number configured."
-        if "@" not in destination:
-            # If no domain is provided, append the SIP domain
-            if config.SIP_DOMAIN:
-                # Ensure clean number (strip tel: or sip: prefix if present but no domain)
-                clean_dest = destination.replace("tel:", "").replace("sip:", "")
-                destination = f"sip:{clean_dest}@{config.SIP_DOMAIN}"
-            else:
-                # Fallback to tel URI if no domain configured
-                if not destination.startswith("tel:") and not destination.startswith("sip:"):
-                     destination = f"tel:{destination}"
-        elif not destination.startswith("sip:"):
-             destination = f"sip:{destination}"
-        
-        logger.info(f"Transferring call to {destination}")
-        
-        # Determine the participant identity
-        # For outbound calls initiated by this agent, the participant identity is typically "sip_<phone_number>"
-        # For inbound, we might need to find the remote participant.
-        participant_identity = None
-        
-        # If we stored the phone number from metadata, we can construct the identity
-        if self.phone_number:
-            participant_identity = f"sip_{self.phone_number}"
-        else:
-            # Try to find a participant that is NOT the agent
-            for p in self.ctx.room.remote_participants.values():
-                participant_identity = p.identity
-                break
-        
-        if not participant_identity:
-            logger.error("Could not determine participant identity for transfer")
-            return "Failed to transfer: could not identify the caller."
-
-        try:
-            logger.info(f"Transferring participant {participant_identity} to {destination}")
-            await self.ctx.api.sip.transfer_sip_participant(
-                api.TransferSIPParticipantRequest(
-                    room_name=self.ctx.room.name,
-                    participant_identity=participant_identity,
-                    transfer_to=destination,
-                    play_dialtone=False
-                )
-            )
-            return "Transfer initiated successfully."
-        except Exception as e:
-            logger.error(f"Transfer failed: {e}")
-            return f"Error executing transfer: {e}"
+        if self.transfer is None:
+            return "Error: Transfers are not available on this call."
+        return await self.transfer.transfer(destination)
 
 
 class OutboundAssistant(Agent):
@@ -164,14 +294,106 @@ class OutboundAssistant(Agent):
     An AI agent tailored for outbound calls.
     Attempts to be helpful and concise.
     """
-    def __init__(self, tools: list, system_prompt: str = None) -> None:
+    def __init__(self, tools: list, system_prompt: str = None, answers: AnswerResponder = None,
+                 speculator: Speculator = None, compactor: ChatCompactor = None,
+                 llm_chain: ProviderChain = None, tts_chain: ProviderChain = None,
+                 detector: MachineDetector = None) -> None:
         super().__init__(
             instructions=system_prompt or config.SYSTEM_PROMPT,
             tools=tools,
         )
+        self.answers = answers
+        self.speculator = speculator
+        self.compactor = compactor
+        self.llm_chain = llm_chain
+        self.tts_chain = tts_chain
+        self.detector = detector
+
+    async def on_user_turn_completed(self, turn_ctx: llm.ChatContext, new_message: llm.ChatMessage) -> None:
+        # Still screening for an answering machine: don't talk to it
+        if self.detector is not None and self.detector.screening:
+            self._no_reply()
+        # Repeated FAQ question? Speak the cached answer and skip the LLM round trip.
+        if self.answers is not None and await self.answers.answer(self.session, new_message.text_content):
+            self._no_reply()
+
+    def _no_reply(self):
+        """End the turn without an LLM reply; a speculation started for it would never be taken."""
+        if self.speculator is not None:
+            self.speculator.discard()
+        raise StopResponse()
+
+    async def llm_node(self, chat_ctx, tools, model_settings):
+        # Reuse the generation started on the interim transcript if the final one matches
+        speculative = self.speculator.take(chat_ctx, tools, model_settings) if self.speculator else None
+        if speculative is None and self.compactor is not None:
+            # Summary of older turns + recent window instead of the full history
+            chat_ctx = self.compactor.window(chat_ctx)
+        if speculative is not None:
+            source = speculative
+        elif self.llm_chain is not None:
+            # Race the fallback LLMs if the primary misses its first-token deadline
+            source = self.llm_chain.race(llm_opener(
+                chat_ctx, tools, model_settings.tool_choice, self.session.conn_options.llm_conn_options
+            ))
+        else:
+            source = Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+        async for chunk in source:
+            yield chunk
+
+    async def tts_node(self, text, model_settings):
+        if self.tts_chain is None:
+            async for frame in Agent.default.tts_node(self, text, model_settings):
+                yield frame
+            return
+        # Race the fallback voices if the primary misses its first-audio deadline
+        tee = TextTee(text)
+        try:
+            async for frame in self.tts_chain.race(tts_opener(tee, self.session.conn_options.tts_conn_options)):
+                yield frame
+        finally:
+            tee.close()
+
+
+
 
+async def _prepare_greeting(cache: GreetingCache, llm_client, tts_client, tts_spec: tuple,
+                            system_prompt: str, instructions: str = None, text: str = None):
+    """Resolve the greeting text (LLM, once per prompt) and its audio (TTS, once per voice)."""
+    if text is None:
+        text = await cache.greeting_text(llm_client, system_prompt, instructions)
+    return await cache.get_or_render(tts_client, tts_spec, text)
 
 
+async def _speak_greeting(session: AgentSession, greeting_task, instructions: str):
+    """Play the cached greeting if it is ready, otherwise fall back to a live LLM + TTS reply."""
+    if greeting_task is not None:
+        try:
+            greeting = await greeting_task
+            greeting_cache.play(session, greeting)
+            return
+        except Exception as e:
+            logger.warning(f"Cached greeting unavailable, generating live: {e}")
+    await session.generate_reply(instructions=instructions)
+
+
+async def _handle_machine(ctx: agents.JobContext, session: AgentSession, detector: MachineDetector,
+                          voicemail_task, cfg=config):
+    """Leave the voicemail message (AMD_ACTION = "message") and hang up, freeing the slot and trunk channel."""
+    try:
+        if cfg.AMD_ACTION == "message" and await detector.wait_for_beep(cfg.AMD_BEEP_TIMEOUT):
+            if voicemail_task is not None:
+                handle = greeting_cache.play(session, await voicemail_task)
+            else:
+                handle = session.say(cfg.VOICEMAIL_MESSAGE)
+            await handle
+    except Exception as e:
+        logger.warning(f"Could not leave voicemail message: {e}")
+    try:
+        await ctx.api.room.delete_room(api.DeleteRoomRequest(room=ctx.room.name))
+    except Exception as e:
+        logger.error(f"Failed to hang up on answering machine: {e}")
+
 
 async def entrypoint(ctx: agents.JobContext):
     """
@@ -183,7 +405,21 @@ async def entrypoint(ctx: agents.JobContext):
     3. Initiates the SIP call to the phone number.
     4. Waits for answer before speaking.
     """
+    job_start_ns = time.time_ns()
+    call_cpu = CallCPU()
+    call_tracing.use_queue_logging()  # No-op when prewarm() already did it
     logger.info(f"Connecting to room: {ctx.room.name}")
+
+    # Dashboard settings as the worker's refresher last saved them (see config.start_refresher()),
+    # pinned for this call: a reload never changes a live call.
+    await config.reload_cached_config()
+    cfg = config.snapshot()
+
+    # Report this process's event-loop lag to the worker's load calculation
+    lag_monitor = ctx.proc.userdata.get("loop_lag_monitor")
+    if lag_monitor is not None:
+        lag_monitor.start()
+        ctx.add_shutdown_callback(lag_monitor.stop)
     
     # parse the phone number AND config from the metadata
     phone_number = None
@@ -208,29 +444,296 @@ async def entrypoint(ctx: agents.JobContext):
     except Exception:
         logger.warning("No valid JSON metadata found in Room.")
 
+    # Setup spans for this call, correlated by call_id / room name (see call_tracing.py)
+    tracer_provider = ctx.proc.userdata.get("tracer_provider")
+    if tracer_provider is None and cfg.TRACING_ENABLED:
+        tracer_provider = ctx.proc.userdata["tracer_provider"] = call_tracing.new_tracer_provider(
+            cfg.TRACE_DIR, "outbound-agent"
+        )
+    call_trace = CallTrace(tracer_provider, ctx.room.name, config_dict, job_start_ns=job_start_ns)
+
+    # Dashboard tools (see prewarm()); the contact's data is prefetched while the phone rings
+    registry = ctx.proc.userdata.get("tool_registry")
+    if registry is None:
+        registry = ctx.proc.userdata["tool_registry"] = _new_tool_registry()
+        registry.load()
+    call_tools = CallTools(registry, phone_number, config_dict.get("user_data"))
+    call_tools.prefetch()
+    ctx.add_shutdown_callback(registry.aclose)
+
+    # Per-turn latency (end of speech -> STT final -> LLM first token -> TTS first byte -> first audio)
+    histograms = ctx.proc.userdata.get("turn_histograms")
+    if histograms is None:
+        histograms = ctx.proc.userdata["turn_histograms"] = LatencyHistograms(cfg.METRICS_DIR)
+
+    # Transfers (see call_transfer.py): destination and caller identity resolved now, not mid-call
+    trunk_pool = ctx.proc.userdata.get("trunk_pool")
+    if trunk_pool is None:
+        trunk_pool = ctx.proc.userdata["trunk_pool"] = _new_trunk_pool()
+    transfer = CallTransfer(ctx, phone_number, cfg, trunk_pool, histograms)
+    transfer.prepare()
+
     # Initialize function context
-    fnc_ctx = TransferFunctions(ctx, phone_number)
+    fnc_ctx = TransferFunctions(ctx, phone_number, cfg, call_tools, transfer)
+    # Dashboard tools override built-ins of the same name
+    tools = [t for name, t in fnc_ctx.function_tools.items() if name not in call_tools.names()]
+    tools += call_tools.build()
+
+    # Borrow prewarmed plugins from the worker process (see prewarm())
+    pool = ctx.proc.userdata.get("provider_pool")
+    if pool is None:
+        pool = ctx.proc.userdata["provider_pool"] = ProviderPool()
+
+    # One sample rate end to end in telephony mode (see telephony_audio.py)
+    audio_rate = telephony_audio.sample_rate(cfg)
+    vad = ctx.proc.userdata.get("vad")
+    saved_ms = ctx.proc.userdata.get("vad_load_ms", 0.0)
+    if vad is None or (audio_rate and telephony_audio.component_rate(vad) not in (None, audio_rate)):
+        vad = ctx.proc.userdata["vad"] = _load_vad(audio_rate)
+        saved_ms = 0.0
+
+    stt_client, llm_client, tts_client, plugins_saved_ms = _borrow_plugins(pool, config_dict, cfg)
+    side_llm = _side_llm(pool, config_dict.get("model_provider"), cfg)
+    saved_ms += plugins_saved_ms
+    logger.info(f"Prewarmed plugins saved {saved_ms:.0f} ms of setup for this job")
+
+    # Process-wide transcript delivery (one HTTP session, batched + spooled)
+    delivery = ctx.proc.userdata.get("transcript_delivery")
+    if delivery is None:
+        delivery = ctx.proc.userdata["transcript_delivery"] = TranscriptDelivery(
+            cfg.WEBHOOK_URL,
+            cfg.TRANSCRIPT_SPOOL_DIR,
+            batch_size=cfg.TRANSCRIPT_BATCH_SIZE,
+            batch_interval=cfg.TRANSCRIPT_BATCH_INTERVAL,
+        )
+    await delivery.acquire()
+
+    # Greeting audio cache (see prewarm()); rendered in the background while the phone rings
+    cache = ctx.proc.userdata.get("greeting_cache")
+    tts_spec = _tts_spec(config_dict.get("model_provider"), config_dict.get("voice_id"), cfg)
+    system_prompt = config_dict.get("user_prompt") or cfg.SYSTEM_PROMPT
+    greeting_task = None
+
+    # FAQ answer cache (see prewarm()); cached answers reuse the greeting audio cache
+    answer_cache = ctx.proc.userdata.get("answer_cache")
+    answers = None
+    if answer_cache is not None:
+        answers = AnswerResponder(
+            answer_cache, system_prompt,
+            audio_cache=cache, tts_client=tts_client, tts_spec=tts_spec,
+            learn=cfg.ANSWER_CACHE_LEARN,
+        )
+        if cfg.ANSWER_CACHE_LEARN:
+            await answers.load()
 
     # Initialize the Agent Session with plugins
+    session_options = {}
+    if cfg.SPECULATIVE_ENABLED:
+        session_options["turn_handling"] = {"preemptive_generation": {"preemptive_tts": cfg.SPECULATIVE_TTS}}
     session = AgentSession(
-        vad=silero.VAD.load(),
-        stt=deepgram.STT(model=config.STT_MODEL, language=config.STT_LANGUAGE), 
-        llm=_build_llm(config_dict.get("model_provider")),
-        tts=_build_tts(config_dict.get("model_provider"), config_dict.get("voice_id")),
+        vad=vad,
+        stt=stt_client,
+        llm=llm_client,
+        tts=tts_client,
+        **session_options,
     )
+    if answers is not None:
+        answers.attach(session)
+    transfer.attach(session)
+    # Rates along the call's audio path (24 kHz room audio is the framework default)
+    audio_path = AudioPath(audio_rate or 24000, audio_rate or 24000, vad, stt_client, tts_client)
+    logger.info(f"Audio path: {audio_path.summary()}")
+
+    # LLM / TTS provider chains with first-output deadlines (see provider_chain.py)
+    health = ctx.proc.userdata.get("provider_health")
+    if health is None:
+        health = ctx.proc.userdata["provider_health"] = ProviderHealth(
+            cfg.PROVIDER_BREAKER_FAILURES, cfg.PROVIDER_BREAKER_COOLDOWN, histograms, cfg.PROVIDER_STATE_PATH
+        )
+    llm_chain = tts_chain = None
+    llm_providers = _provider_chain(pool, "llm", (_llm_spec(config_dict.get("model_provider"), cfg)[0], llm_client), cfg)
+    if len(llm_providers) > 1:
+        llm_chain = ProviderChain("llm", llm_providers, health, cfg.LLM_FIRST_TOKEN_DEADLINE)
+    tts_providers = _provider_chain(pool, "tts", (tts_spec[0], tts_client), cfg)
+    if len(tts_providers) > 1:
+        tts_chain = ProviderChain("tts", tts_providers, health, cfg.TTS_FIRST_AUDIO_DEADLINE)
+    if llm_chain is not None or tts_chain is not None:
+        # Breakers opened by earlier calls' failures
+        await health.load()
+
+    # Rolling chat-context compaction for long calls
+    compactor = None
+    if cfg.CONTEXT_COMPACTION_ENABLED:
+        compactor = ChatCompactor(
+            side_llm,
+            max_tokens=cfg.CONTEXT_MAX_TOKENS,
+            min_recent=cfg.CONTEXT_MIN_RECENT,
+            summary_words=cfg.CONTEXT_SUMMARY_WORDS,
+        )
+        compactor.attach(session)
+
+    # Speculative LLM generation on interim transcripts (attached to the agent below)
+    speculator = None
+    if cfg.SPECULATIVE_ENABLED:
+        speculator = Speculator(
+            side_llm,
+            threshold=cfg.SPECULATIVE_THRESHOLD,
+            min_words=cfg.SPECULATIVE_MIN_WORDS,
+            max_attempts=cfg.SPECULATIVE_MAX_ATTEMPTS,
+            histograms=histograms,
+            language=cfg.STT_LANGUAGE,
+            prepare=compactor.window if compactor else None,
+        )
+
+    # Call recording for QA (taps attached once the session's audio is up)
+    recorder = None
+    if cfg.RECORDING_ENABLED:
+        recorder = CallRecorder(
+            os.path.join(cfg.RECORDING_DIR, f"{ctx.room.name}-{int(time.time())}.{cfg.RECORDING_FORMAT}"),
+            fmt=cfg.RECORDING_FORMAT,
+            sample_rate=cfg.RECORDING_SAMPLE_RATE,
+            buffer_seconds=cfg.RECORDING_BUFFER_SECONDS,
+            chunk_seconds=cfg.RECORDING_CHUNK_SECONDS,
+        )
+
+    # Answering-machine detection between answer and greeting (outbound dial-outs only)
+    detector = None
+    if cfg.AMD_ENABLED and phone_number:
+        extra_keywords = [k.strip() for k in cfg.AMD_KEYWORDS.split(",") if k.strip()]
+        detector = MachineDetector(
+            MachineClassifier(
+                human_max_speech=cfg.AMD_HUMAN_MAX_SPEECH,
+                human_silence=cfg.AMD_HUMAN_SILENCE,
+                machine_min_speech=cfg.AMD_MACHINE_MIN_SPEECH,
+                initial_silence=cfg.AMD_INITIAL_SILENCE,
+                keywords=DEFAULT_KEYWORDS + tuple(extra_keywords),
+            ),
+            budget=cfg.AMD_BUDGET,
+            histograms=histograms,
+        )
+
+    # Per-turn transcript (text, timing, interruptions, tool calls) for the Dashboard and post-call analytics
+    transcript = CallTranscript()
+    transcript.attach(session)
+
+    turn_tracker = TurnTracker(session, {
+        "stt": cfg.STT_PROVIDER,
+        "llm": _llm_spec(config_dict.get("model_provider"), cfg)[0],
+        "tts": tts_spec[0],
+    }, histograms)
+
+    # Dial-out outcome and ring time, and the ringing-time warm-up (filled in below)
+    dial = {}
+    warmup = None
+
+    # --- DATA COLLECTION ---
+    # Queue the transcript when the job shuts down (caller hung up, room closed, or worker stopping),
+    # then give the delivery engine a chance to flush. Undelivered records stay in the spool.
+    async def on_shutdown():
+        transcript_text = transcript.text()
+        logger.info(f"Transcript length: {len(transcript_text)}")
+
+        turn_tracker.close()
+        latency = turn_tracker.summary()
+        if speculator is not None:
+            speculator.close()
+            latency["speculation"] = speculator.summary()
+        if compactor is not None:
+            compactor.close()
+            latency["context"] = compactor.summary()
+        for chain in (llm_chain, tts_chain):
+            if chain is not None:
+                latency[f"{chain.kind}_chain"] = chain.summary()
+        await health.flush()
+        if warmup is not None:
+            warmup.cancel()
+            latency["warmup"] = warmup.summary()
+        logger.info(f"Turn latency: {latency}")
+        recording = None
+        if recorder is not None:
+            await recorder.aclose()
+            recording = recorder.summary()
+            logger.info(f"Recording: {recording}")
+
+        await transfer.aclose()
+        status = dial.get("outcome")
+        if status is None:
+            if transfer.transferred:
+                status = "TRANSFERRED"
+            elif detector is not None and detector.verdict == MACHINE:
+                status = "VOICEMAIL"
+            else:
+                status = "COMPLETED"
+        call_trace.end(status=status, **{"sip.status": dial.get("sip_status")})
+        try:
+            # This process serves no more calls: its histograms join the worker's total
+            await histograms.flush()
+            await asyncio.to_thread(histograms.fold)
+        except OSError as e:
+            logger.warning(f"Could not fold turn metrics: {e}")
+
+        delivery.submit({
+            "call_id": config_dict.get("call_id"), # Passed from Dispatch
+            "phone": phone_number,
+            "transcript": transcript_text,
+            "turns": transcript.turns(),
+            "started_at": transcript.answered_at,
+            "status": status,
+            "duration": transcript.duration(),
+            "latency": latency,
+            "answer_cache": answers.summary() if answers else None,
+            "tools": call_tools.summary(),
+            "recording_url": recording["path"] if recording and recording["bytes"] else None,
+            "recording": recording,
+            "amd": detector.summary() if detector is not None and detector.verdict else None,
+            "dial": dial or None,
+            "trace": call_trace.summary(),
+            "audio": {**audio_path.summary(), "cpu": call_cpu.summary()},
+            "transfer": transfer.summary(),
+        })
+        if tracer_provider is not None:
+            await asyncio.to_thread(tracer_provider.force_flush, 2000)
+        await delivery.release(timeout=cfg.TRANSCRIPT_DRAIN_TIMEOUT)
+        logger.info(f"Transcript delivery: {delivery.metrics()}")
+        if answers is not None:
+            await answers.flush()
+        if answer_cache is not None:
+            logger.info(f"Answer cache: {answer_cache.metrics()}")
+
+    ctx.add_shutdown_callback(on_shutdown)
 
     # Start the session
-    await session.start(
-        room=ctx.room,
-        agent=OutboundAssistant(
-            tools=list(fnc_ctx.function_tools.values()),
-            system_prompt=config_dict.get("user_prompt")
-        ),
-        room_input_options=RoomInputOptions(
-            noise_cancellation=noise_cancellation.BVCTelephony(),
-            close_on_disconnect=True, # Close room when agent disconnects
-        ),
+    assistant = OutboundAssistant(
+        tools=tools,
+        system_prompt=system_prompt,
+        answers=answers,
+        speculator=speculator,
+        compactor=compactor,
+        llm_chain=llm_chain,
+        tts_chain=tts_chain,
+        detector=detector,
     )
+    if speculator is not None:
+        speculator.attach(session, assistant)
+    # Room audio in and out at the telephony rate: the track is decoded straight to it and
+    # VAD / STT / TTS already run at it, so no resampler sits between them
+    room_rate = {"audio_sample_rate": audio_rate} if audio_rate else {}
+    call_trace.record("setup", job_start_ns)
+    with call_trace.stage("room_connect"):
+        await session.start(
+            room=ctx.room,
+            agent=assistant,
+            room_input_options=RoomInputOptions(
+                noise_cancellation=_noise_cancellation(),
+                close_on_disconnect=True, # Close room when agent disconnects
+                **room_rate,
+            ),
+            room_output_options=RoomOutputOptions(**room_rate),
+        )
+    if recorder is not None:
+        recorder.attach(session)
+    if detector is not None:
+        detector.attach(session)
 
     # Logic to dial out:
     # 1. If 'phone_number' is present, we MIGHT need to dial.
@@ -253,38 +756,106 @@ async def entrypoint(ctx: agents.JobContext):
 
     if should_dial:
         logger.info(f"Initiating outbound SIP call to {phone_number}...")
+        if cache:
+            greeting_task = asyncio.create_task(_prepare_greeting(
+                cache, side_llm, tts_client, tts_spec, system_prompt, instructions=cfg.INITIAL_GREETING
+            ))
+        voicemail_task = None
+        if detector is not None and cfg.AMD_ACTION == "message" and cache:
+            voicemail_task = asyncio.create_task(_prepare_greeting(
+                cache, side_llm, tts_client, tts_spec, system_prompt, text=cfg.VOICEMAIL_MESSAGE
+            ))
+        # Use the ringing time to open and prime every provider the first reply may use
+        if cfg.PIPELINE_WARMUP_ENABLED:
+            warmup = PipelineWarmup(stt_client, llm_providers, tts_providers, prime_llm=cfg.WARMUP_PRIME_LLM,
+                                    primers=[(llm_providers[0][0], side_llm)] + llm_providers[1:])
+            warmup.start(system_prompt, tools)
+        ring_start = time.perf_counter()
         try:
             # Create a SIP participant to dial out
             # This effectively "calls" the phone number and brings them into this room
             # --- CONNECTING TO THE PHONE NETWORK ---
             # This step actually "dials" the number using Vobiz (SIP Trunk).
             # It invites the phone number into this digital room.
-            await ctx.api.sip.create_sip_participant(
-                api.CreateSIPParticipantRequest(
-                    room_name=ctx.room.name,
-                    sip_trunk_id=config.SIP_TRUNK_ID,
-                    sip_call_to=phone_number,
-                    participant_identity=f"sip_{phone_number}", # Unique ID for the SIP user
-                    wait_until_answered=True, # Important: Wait for pickup before continuing
+            # The trunk pool picks the least-loaded healthy trunk and fails over on SIP errors.
+            with call_trace.stage("sip_dial") as span:
+                trunk_pool.load(
+                    ctx.api,
+                    only_ids=[t.strip() for t in cfg.SIP_TRUNK_IDS.split(",") if t.strip()],
+                    fallback_id=cfg.SIP_TRUNK_ID,
                 )
-            )
-            logger.info("Call answered! Agent is now listening.")
+                trunk_id = await asyncio.wait_for(trunk_pool.dial(
+                    ctx.api.sip,
+                    lambda trunk_id: api.CreateSIPParticipantRequest(
+                        room_name=ctx.room.name,
+                        sip_trunk_id=trunk_id,
+                        sip_call_to=phone_number,
+                        participant_identity=f"sip_{phone_number}", # Unique ID for the SIP user
+                        wait_until_answered=True, # Important: Wait for pickup before continuing
+                        ringing_timeout=timedelta(seconds=cfg.RING_TIMEOUT),
+                    ),
+                    preferred=config_dict.get("sip_trunk_id"),
+                ), timeout=cfg.RING_TIMEOUT + cfg.DIAL_GRACE)
+                span.set_attribute("sip.trunk_id", trunk_id)
+        except Exception as e:
+            # Ring timeout, busy, rejected, bad number, or every trunk failed: end the job now
+            # so the slot is free, and report the outcome instead of an empty transcript.
+            dial["outcome"] = dial_outcome(e)
+            dial["sip_status"] = sip_status(e) or None
+            dial["ring_ms"] = round((time.perf_counter() - ring_start) * 1000, 1)
+            logger.warning(f"Call to {phone_number} not connected: {dial['outcome']} ({e})")
+            for task in (greeting_task, voicemail_task):
+                if task:
+                    task.cancel()
+            if warmup is not None:
+                warmup.cancel()
+            ctx.shutdown(reason=dial["outcome"])
+            return
+
+        dial["ring_ms"] = round((time.perf_counter() - ring_start) * 1000, 1)
+        turn_tracker.answered()
+        transcript.answered()
+        try:
+            # Hold the trunk channel until the call ends
+            async def release_trunk():
+                await asyncio.to_thread(trunk_pool.release, trunk_id)
+
+            ctx.add_shutdown_callback(release_trunk)
+            logger.info(f"Call answered via trunk {trunk_id}! Agent is now listening.")
             
             # Note: We do NOT generate an initial reply here immediately.
             # Usually for outbound, we want to hear "Hello?" from the user first,
             # OR we can speak immediately. 
             # If you want the agent to speak first, uncomment the lines below:
             
-            await session.generate_reply(
-                instructions=config.INITIAL_GREETING
-            )
+            # Screen for voicemail before spending LLM/TTS on the greeting
+            if detector is not None:
+                with call_trace.stage("amd") as span:
+                    await detector.detect()
+                    span.set_attribute("amd.verdict", detector.verdict)
+            if detector is not None and detector.verdict == MACHINE:
+                if greeting_task:
+                    greeting_task.cancel()
+                await _handle_machine(ctx, session, detector, voicemail_task, cfg)
+                return
+
+            with call_trace.stage("greeting"):
+                await _speak_greeting(session, greeting_task, cfg.INITIAL_GREETING)
             
         except Exception as e:
-            logger.error(f"Failed to place outbound call: {e}")
+            logger.error(f"Failed to start the conversation: {e}")
+            if greeting_task:
+                greeting_task.cancel()
+            if voicemail_task:
+                voicemail_task.cancel()
     else:
         # Fallback for inbound calls (SIP Inbound or Web Widget)
         # In these cases, the user is likely already in the room or joining.
         logger.info("No phone number found. Assuming Inbound/Web user.")
+        if cache:
+            greeting_task = asyncio.create_task(_prepare_greeting(
+                cache, side_llm, tts_client, tts_spec, system_prompt, text=cfg.WEB_GREETING
+            ))
         
         # Check if we have a web participant
         if not ctx.room.remote_participants:
@@ -300,82 +871,59 @@ async def entrypoint(ctx: agents.JobContext):
                 await asyncio.wait_for(participant_connected.wait(), timeout=30)
             except asyncio.TimeoutError:
                 logger.warning("No participant joined within 30s. Exiting.")
+                if greeting_task:
+                    greeting_task.cancel()
                 return
         
         logger.info("Greeting the user...")
-        # Small delay to ensure audio is ready
-        await asyncio.sleep(1)
-        await session.generate_reply(instructions=config.WEB_GREETING)
-
-    # --- DATA COLLECTION LOOP ---
-    # Register a callback for when the agent disconnects or the job ends
-    pass # Implementation done below in event handlers
-    
-    # We need to capture the transcript. 
-    # LiveKit Agents 1.0 doesn't have a simple "on_end" callback in entrypoint easily without using events.
-    # But we can assume when entrypoint exits? No, entrypoint exits immediately?
-    # No, `await session.start` blocks?
-    # Actually `await session.start` returns the tasks.
-    # A common pattern is to wait for the room to disconnect.
-
-    # Wait for the session to end
-    # Note: session.start() runs the agent logic.
-    # To wait for disconnect:
-    # await ctx.room.disconnect() # No
-    pass
-
-# We will wrap the execution in a try/finally block or use a shutdown hook?
-# Better: Hook into the 'job' (if using jobs) or just Room events.
-# For simplicity in this `entrypoint` function:
-
-    @ctx.room.on("disconnected")
-    async def on_disconnect(reason):
-        logger.info(f"Room disconnected: {reason}")
-        # Extract Chat History / Transcript
-        # The 'chat_ctx' is on the agent?
-        # session.chat_ctx is available.
-        
-        chat_history = session.chat_ctx.messages
-        # Format transcript
-        transcript_text = "\n".join([f"{m.role}: {m.content}" for m in chat_history])
-        
-        logger.info(f"Transcript length: {len(transcript_text)}")
-        
-        # Send to Webhook
-        try:
-            import aiohttp
-            # Default to localhost because agent runs in network_mode: host and dashboard ports are mapped to host
-            webhook_url = os.getenv("WEBHOOK_URL", "http://localhost:3000/api/hooks/transcript")
-            
-            payload = {
-                "call_id": config_dict.get("call_id"), # Passed from Dispatch
-                "phone": phone_number,
-                "transcript": transcript_text,
-                "status": "COMPLETED",
-                "duration": 0 # Calculate if needed
-            }
-            
-            async with aiohttp.ClientSession() as http_session:
-                async with http_session.post(webhook_url, json=payload) as resp:
-                    logger.info(f"Webhook sent: {resp.status}")
-                    
-        except Exception as e:
-            logger.error(f"Failed to send webhook: {e}")
-
-
-
+        turn_tracker.answered()
+        transcript.answered()
+        if greeting_task is None:
+            # Small delay to ensure audio is ready
+            await asyncio.sleep(1)
+        with call_trace.stage("greeting"):
+            await _speak_greeting(session, greeting_task, cfg.WEB_GREETING)
 
 if __name__ == "__main__":
-    # Load dynamic settings from Dashboard API if available
+    # Plugins are imported lazily per process; download-files needs them all registered
+    if "download-files" in sys.argv:
+        provider_registry.load_all()
+
+    # Load dynamic settings: last-known-good cache from disk (instant). Only a first boot
+    # with no cache waits on the Dashboard; after that, this process keeps the cache file
+    # fresh in the background and every job picks it up when it starts.
     try:
-        config.load_dynamic_config()
+        if not config.load_cached_config():
+            config.load_dynamic_config()
     except Exception as e:
         logger.warning(f"Failed to load dynamic config: {e}")
+    config.start_refresher()
+
+    # Dashboard tools: fetched once per worker; job processes read the cache file
+    _new_tool_registry().refresh(config.DASHBOARD_URL)
+
+    if config.METRICS_PORT:
+        turn_metrics.start_metrics_server(config.METRICS_PORT, config.METRICS_DIR)
+
+    # Load = max(active calls / WORKER_MAX_CALLS, CPU, event-loop lag). At capacity or while
+    # draining (SIGTERM), new jobs are rejected so LiveKit hands them to another worker;
+    # live calls finish and flush their transcripts before the process exits.
+    admission = AdmissionControl(
+        max_calls=config.WORKER_MAX_CALLS,
+        cpu_limit=config.WORKER_CPU_LIMIT,
+        lag_budget_ms=config.WORKER_LAG_BUDGET_MS,
+        metrics_dir=config.METRICS_DIR,
+    )
 
     # The agent name "outbound-caller" is used by the dispatch script to find this worker
     agents.cli.run_app(
         agents.WorkerOptions(
             entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
+            request_fnc=admission.on_request,
+            load_fnc=admission.load,
+            load_threshold=LOAD_THRESHOLD,
+            drain_timeout=config.WORKER_DRAIN_TIMEOUT,
             agent_name="outbound-caller", 
         )
     )
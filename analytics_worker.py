@@ -0,0 +1,184 @@
+"""
+Post-call analytics worker: summary, sentiment, intent and outcome for finished calls.
+
+Runs apart from the voice workers, so live calls never wait on it. Each worker claims
+finished, unanalysed calls from the Dashboard in batches (POST /api/analytics/claim,
+row locks skip calls another worker holds), runs one LLM request per call with at most
+ANALYTICS_CONCURRENCY in flight, and posts the batch's results back in one request
+(POST /api/analytics/results). Failed calls are released and retried by the next claim;
+calls a crashed worker held are reclaimed once their lease expires. Scale out by running
+more workers.
+
+    python analytics_worker.py                 # poll forever
+    python analytics_worker.py --once          # analyse what is queued, then exit
+    python analytics_worker.py --concurrency 8 --batch 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import socket
+import sys
+import time
+
+import aiohttp
+
+import config
+import provider_registry  # LLM providers the agent uses (plugins import on demand)
+from livekit.agents import llm
+
+logger = logging.getLogger("analytics-worker")
+
+SENTIMENTS = ("positive", "neutral", "negative")
+OUTCOMES = ("interested", "not_interested", "callback", "transferred", "wrong_person", "no_conversation", "other")
+_OUTCOME_KEYS = {o.replace("_", ""): o for o in OUTCOMES}
+
+INSTRUCTIONS = f"""You analyse transcripts of phone calls between an AI voice agent and a person it called.
+Reply with one JSON object and nothing else:
+{{"summary": "2-3 sentences: who the caller was, what they wanted, how the call ended",
+  "sentiment": one of {list(SENTIMENTS)} (the caller's, by the end of the call),
+  "intent": "the caller's main intent in a few words",
+  "outcome": one of {list(OUTCOMES)}}}
+Write the summary in English whatever language the call was in."""
+
+
+def conversation(call: dict, max_chars: int) -> str:
+    """The call as "Caller:" / "Agent:" lines, cut to head + tail if it is long."""
+    lines = []
+    for turn in call.get("turns") or []:
+        if turn.get("text"):
+            who = "Caller" if turn["role"] == "user" else "Agent"
+            lines.append(f"{who}: {turn['text']}" + (" [interrupted]" if turn.get("interrupted") else ""))
+        for tool in turn.get("tools") or []:
+            lines.append(f"[tool {tool['name']}({tool.get('args', '')}) -> {tool.get('output', '')}]")
+    if not lines:
+        lines = (call.get("transcript") or "").splitlines()
+    text = "\n".join(lines)
+    if len(text) > max_chars:
+        half = max_chars // 2
+        text = text[:half] + "\n[...]\n" + text[-half:]
+    return text
+
+
+def parse(reply: str) -> dict:
+    """The LLM's JSON reply, with labels outside the allowed sets mapped to "other" / None."""
+    match = re.search(r"\{.*\}", reply, re.DOTALL)
+    if match is None:
+        raise ValueError(f"No JSON in reply: {reply[:80]!r}")
+    data = json.loads(match.group(0))
+    sentiment = str(data.get("sentiment", "")).strip().lower()
+    # "Call back", "call_back" and "callback" are the same label
+    outcome = _OUTCOME_KEYS.get(re.sub(r"[\s_-]", "", str(data.get("outcome", "")).lower()), "other")
+    return {
+        "summary": str(data.get("summary", "")).strip(),
+        "sentiment": sentiment if sentiment in SENTIMENTS else None,
+        "intent": str(data.get("intent", "")).strip()[:80] or None,
+        "outcome": outcome,
+    }
+
+
+class AnalyticsWorker:
+    """One worker of the pool: claim a batch, analyse it with bounded concurrency, report it."""
+
+    def __init__(self, llm_client, model: str, cfg=config, dashboard_url: str = None,
+                 batch_size: int = None, concurrency: int = None):
+        self.llm = llm_client
+        self.model = model
+        self.cfg = cfg
+        self.dashboard_url = (dashboard_url or cfg.DASHBOARD_URL).rstrip("/")
+        self.batch_size = batch_size or cfg.ANALYTICS_BATCH_SIZE
+        self.limit = asyncio.Semaphore(concurrency or cfg.ANALYTICS_CONCURRENCY)
+        self.worker_id = f"analytics-{socket.gethostname()}-{os.getpid()}"
+        self.analysed = 0
+        self.failed = 0
+        self._ms = []
+
+    async def analyse(self, call: dict) -> dict:
+        chat_ctx = llm.ChatContext()
+        chat_ctx.add_message(role="system", content=INSTRUCTIONS)
+        chat_ctx.add_message(role="user", content=conversation(call, self.cfg.ANALYTICS_MAX_CHARS))
+        start = time.perf_counter()
+        reply = []
+        async with self.llm.chat(chat_ctx=chat_ctx) as stream:
+            async for chunk in stream:
+                if chunk.delta and chunk.delta.content:
+                    reply.append(chunk.delta.content)
+        ms = round((time.perf_counter() - start) * 1000)
+        return {"call_id": call["id"], **parse("".join(reply)), "model": self.model, "ms": ms}
+
+    async def _analyse_one(self, call: dict) -> dict:
+        async with self.limit:
+            try:
+                result = await asyncio.wait_for(self.analyse(call), self.cfg.ANALYTICS_TIMEOUT)
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Call {call['id']} not analysed: {e}")
+                return {"call_id": call["id"], "error": str(e) or type(e).__name__}
+        self.analysed += 1
+        self._ms.append(result["ms"])
+        return result
+
+    async def run_batch(self, http: aiohttp.ClientSession) -> int:
+        """Claim, analyse and report one batch. Returns how many calls it had."""
+        async with http.post(f"{self.dashboard_url}/api/analytics/claim",
+                             json={"limit": self.batch_size, "worker": self.worker_id}) as resp:
+            resp.raise_for_status()
+            calls = (await resp.json()).get("calls") or []
+        if not calls:
+            return 0
+        results = await asyncio.gather(*(self._analyse_one(call) for call in calls))
+        async with http.post(f"{self.dashboard_url}/api/analytics/results",
+                             json={"worker": self.worker_id, "results": results}) as resp:
+            resp.raise_for_status()
+        logger.info(f"Batch of {len(calls)}: {self.stats()}")
+        return len(calls)
+
+    async def run(self, once: bool = False):
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as http:
+            while True:
+                try:
+                    if await self.run_batch(http):
+                        continue
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    # Dashboard down, slow or not answering JSON: claimed calls come back when their lease expires
+                    logger.warning(f"Dashboard unavailable: {e}")
+                if once:
+                    return
+                await asyncio.sleep(self.cfg.ANALYTICS_POLL_INTERVAL)
+
+    def stats(self) -> dict:
+        out = {"analysed": self.analysed, "failed": self.failed}
+        if self._ms:
+            ms = sorted(self._ms)
+            out["llm_ms"] = {"p50": ms[len(ms) // 2], "p95": ms[min(len(ms) - 1, int(len(ms) * 0.95))]}
+        return out
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Post-call analytics worker (summary, sentiment, intent, outcome).")
+    parser.add_argument("--once", action="store_true", help="Analyse what is queued, then exit")
+    parser.add_argument("--batch", type=int, default=config.ANALYTICS_BATCH_SIZE, help="Calls claimed per request")
+    parser.add_argument("--concurrency", type=int, default=config.ANALYTICS_CONCURRENCY, help="LLM requests in flight")
+    parser.add_argument("--dashboard", default=config.DASHBOARD_URL, help="Dashboard URL")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # ANALYTICS_LLM_PROVIDER, else the agent's LLM (unknown names fall back to OpenAI, as in agent.py)
+    name = (config.ANALYTICS_LLM_PROVIDER or os.getenv("LLM_PROVIDER", config.DEFAULT_LLM_PROVIDER)).lower()
+    provider = provider_registry.get("llm", name, "openai")
+    settings = provider.spec(config)
+    client = provider.create(settings)
+    worker = AnalyticsWorker(client, f"{provider.name}:{settings[0] if settings else ''}",
+                             dashboard_url=args.dashboard, batch_size=args.batch, concurrency=args.concurrency)
+    logger.info(f"Analytics worker {worker.worker_id}: batches of {args.batch}, {args.concurrency} in flight")
+    try:
+        await worker.run(once=args.once)
+    finally:
+        await client.aclose()
+        print(json.dumps(worker.stats()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
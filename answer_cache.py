@@ -0,0 +1,338 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger("answer-cache")
+
+# Words that carry no meaning for matching FAQ questions
+_FILLERS = {"um", "uh", "umm", "hmm", "please", "ok", "okay", "so", "well", "actually", "just"}
+
+
+def normalize(text: str) -> str:
+    """
+    Lower-case, strip punctuation/symbols and filler words. Works for any script:
+    only Unicode punctuation (P*) and symbols (S*) are removed, so Devanagari
+    vowel signs stay attached to their words.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = "".join(" " if unicodedata.category(ch)[0] in "PS" else ch for ch in text)
+    return " ".join(w for w in text.split() if w not in _FILLERS)
+
+
+def _grams(norm: str) -> frozenset:
+    padded = f" {norm} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def prompt_digest(system_prompt: str) -> str:
+    return hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()[:16]
+
+
+class _Entry:
+    __slots__ = ("question", "answer", "grams", "expires_at", "hits")
+
+    def __init__(self, question: str, answer: str, expires_at: float):
+        self.question = question
+        self.answer = answer
+        self.grams = _grams(question)
+        self.expires_at = expires_at
+        self.hits = 0
+
+
+class _Namespace:
+    """Entries for one system prompt, with a character-trigram inverted index."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # question -> _Entry, in LRU order
+        self.index = {}               # trigram -> set(question)
+
+    def add(self, entry: _Entry):
+        self.remove(entry.question)
+        self.entries[entry.question] = entry
+        for gram in entry.grams:
+            self.index.setdefault(gram, set()).add(entry.question)
+
+    def remove(self, question: str):
+        entry = self.entries.pop(question, None)
+        if entry is None:
+            return
+        for gram in entry.grams:
+            bucket = self.index.get(gram)
+            if bucket is not None:
+                bucket.discard(question)
+                if not bucket:
+                    del self.index[gram]
+
+    def best_match(self, grams: frozenset):
+        """Return (entry, jaccard similarity) of the closest cached question."""
+        overlap = {}
+        for gram in grams:
+            for question in self.index.get(gram, ()):
+                overlap[question] = overlap.get(question, 0) + 1
+        best, best_score = None, 0.0
+        for question, shared in overlap.items():
+            entry = self.entries[question]
+            score = shared / (len(grams) + len(entry.grams) - shared)
+            if score > best_score:
+                best, best_score = entry, score
+        return best, best_score
+
+
+class AnswerCache:
+    """
+    Process-wide question -> answer cache for repeated FAQ turns.
+
+    FAQ entries (load_faq) are curated for the deployment's SYSTEM_PROMPT and only answer
+    calls running under that prompt (campaign personas never get them). Answers learned
+    from live calls are namespaced by the system prompt they were
+    produced under (the call's effective prompt, campaign prompts included), expire after
+    `ttl` seconds and are evicted LRU beyond `max_entries` per prompt. Job processes serve
+    one call each, so learned answers are also kept in `learned_path` (a JSON file under
+    an fcntl lock, shared by every job process) and loaded when a call starts.
+
+    Matching uses Jaccard similarity over character trigrams (script-agnostic), served
+    from an inverted index so a lookup only touches entries that share trigrams with the query.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, threshold: float = 0.8, min_words: int = 2,
+                 learned_path: str = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.min_words = min_words
+        self.learned_path = learned_path
+        self._namespaces = {}
+        self._faq = {}  # prompt digest -> _Namespace
+        self.hits = 0
+        self.misses = 0
+        if learned_path:
+            os.makedirs(os.path.dirname(learned_path) or ".", exist_ok=True)
+
+    def _ns(self, system_prompt: str) -> _Namespace:
+        return self._namespaces.setdefault(prompt_digest(system_prompt), _Namespace())
+
+    def add(self, system_prompt: str, question: str, answer: str, ttl: float = None) -> str:
+        """Cache a learned `answer` for `question`. Returns the normalized question ('' if rejected)."""
+        norm = normalize(question)
+        if len(norm.split()) < self.min_words or not answer:
+            return ""
+        ns = self._ns(system_prompt)
+        ns.add(_Entry(norm, answer, time.time() + (ttl if ttl is not None else self.ttl)))
+        while len(ns.entries) > self.max_entries:
+            ns.remove(next(iter(ns.entries)))
+        return norm
+
+    def lookup(self, system_prompt: str, question: str):
+        """Return the cached answer for a similar question (FAQ or learned, under this prompt), or None."""
+        norm = normalize(question)
+        if len(norm.split()) < self.min_words:
+            self.misses += 1
+            return None
+
+        grams = _grams(norm)
+        best, best_ns, best_score = None, None, 0.0
+        digest = prompt_digest(system_prompt)
+        for ns in (self._namespaces.get(digest), self._faq.get(digest)):
+            if ns is None:
+                continue
+            entry, score = ns.best_match(grams)
+            if entry is not None and entry.expires_at < time.time():
+                ns.remove(entry.question)
+                continue
+            if entry is not None and score > best_score:
+                best, best_ns, best_score = entry, ns, score
+        if best is None or best_score < self.threshold:
+            self.misses += 1
+            return None
+
+        best_ns.entries.move_to_end(best.question)
+        best.hits += 1
+        self.hits += 1
+        logger.info(f"Answer cache hit ({best_score:.2f}): '{norm}' ~ '{best.question}'")
+        return best.answer
+
+    def load_faq(self, path: str, system_prompt: str) -> int:
+        """
+        Seed FAQ entries from a JSON file: [{"questions": ["...", ...], "answer": "..."}, ...],
+        served only to calls under `system_prompt` (the prompt the answers were written for).
+        FAQ entries never expire on their own (only on reload).
+        """
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        ns = self._faq[prompt_digest(system_prompt)] = _Namespace()
+        count = 0
+        for item in items:
+            for question in item.get("questions", []):
+                norm = normalize(question)
+                if len(norm.split()) >= self.min_words and item.get("answer"):
+                    ns.add(_Entry(norm, item["answer"], float("inf")))
+                    count += 1
+        logger.info(f"Loaded {count} FAQ questions from {path}")
+        return count
+
+    def invalidate(self):
+        self._namespaces.clear()
+        self._faq.clear()
+        logger.info("Answer cache invalidated")
+
+    # --- Learned answers on disk (blocking: call via asyncio.to_thread) ---
+
+    def load_learned(self, system_prompt: str) -> int:
+        """Add the unexpired answers earlier calls learned under `system_prompt`."""
+        if not self.learned_path:
+            return 0
+        digest = prompt_digest(system_prompt)
+        saved = self._locked(lambda state: list(state.get(digest, [])))
+        now = time.time()
+        ns = self._ns(system_prompt)
+        for question, answer, expires_at in saved:
+            if expires_at > now and question not in ns.entries:
+                ns.add(_Entry(question, answer, expires_at))
+        return len(saved)
+
+    def save_learned(self, system_prompt: str, question: str):
+        """Persist one learned entry (by normalized question) for later calls."""
+        entry = self._ns(system_prompt).entries.get(question)
+        if not self.learned_path or entry is None:
+            return
+        digest = prompt_digest(system_prompt)
+
+        def mutate(state):
+            now = time.time()
+            kept = [e for e in state.get(digest, []) if e[0] != question and e[2] > now]
+            kept.append([entry.question, entry.answer, entry.expires_at])
+            state[digest] = kept[-self.max_entries:]
+
+        self._locked(mutate)
+
+    def _locked(self, mutate):
+        """Run mutate(state) under an exclusive file lock and persist; returns its result."""
+        with open(self.learned_path, "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                result = mutate(state)
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f, ensure_ascii=False)
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def metrics(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": sum(len(ns.entries) for ns in (*self._namespaces.values(), *self._faq.values())),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class AnswerResponder:
+    """
+    Per-call glue between the AnswerCache, the session and the pre-rendered audio.
+    Used by OutboundAssistant.on_user_turn_completed().
+    """
+
+    def __init__(self, cache: AnswerCache, system_prompt: str, audio_cache=None,
+                 tts_client=None, tts_spec: tuple = None, learn: bool = False):
+        self.cache = cache
+        self.system_prompt = system_prompt
+        self.audio_cache = audio_cache
+        self.tts_client = tts_client
+        self.tts_spec = tts_spec
+        self.learn = learn
+        self.hits = 0
+        self.misses = 0
+        self._last_question = None
+        self._answered_from_cache = False
+        self._saves = set()
+
+    def attach(self, session):
+        """Learn question -> answer pairs from plain (tool-free) LLM turns."""
+        if self.learn:
+            session.on("conversation_item_added", self._on_item)
+
+    def _on_item(self, ev):
+        item = ev.item
+        if getattr(item, "type", "message") != "message":
+            self._last_question = None  # Tool call involved - answer depends on live data
+            return
+        if item.role == "user":
+            self._last_question = item.text_content
+        elif item.role == "assistant" and self._last_question and not self._answered_from_cache:
+            question = self.cache.add(self.system_prompt, self._last_question, item.text_content)
+            if question:
+                self.prerender(item.text_content)
+                self._save(question)
+            self._last_question = None
+
+    def _save(self, question: str):
+        """Keep a learned answer for later calls (off the event loop)."""
+        task = asyncio.ensure_future(asyncio.to_thread(self.cache.save_learned, self.system_prompt, question))
+        self._saves.add(task)
+        task.add_done_callback(self._saved)
+
+    def _saved(self, task):
+        self._saves.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Could not save learned answer: {task.exception()}")
+
+    async def load(self):
+        """At call start: pick up answers earlier calls learned under this call's prompt."""
+        try:
+            await asyncio.to_thread(self.cache.load_learned, self.system_prompt)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load learned answers: {e}")
+
+    async def flush(self):
+        """At call end: wait for learned answers still being written."""
+        if self._saves:
+            await asyncio.gather(*self._saves, return_exceptions=True)
+
+    def prerender(self, answer: str):
+        """Render the answer audio in the background so later hits skip TTS too."""
+        if self.audio_cache is None or self.tts_client is None:
+            return
+        task = asyncio.ensure_future(self.audio_cache.get_or_render(self.tts_client, self.tts_spec, answer))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def answer(self, session, question: str) -> bool:
+        """Speak a cached answer if there is one. Returns True on a hit."""
+        self._answered_from_cache = False
+        answer = self.cache.lookup(self.system_prompt, question or "")
+        if answer is None:
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        self._answered_from_cache = True
+        audio = await self.audio_cache.peek(self.tts_spec, answer) if self.audio_cache else None
+        if audio is not None:
+            async def _frames():
+                for frame in audio.frames():
+                    yield frame
+            session.say(answer, audio=_frames())
+        else:
+            # Skip the LLM; TTS still runs (and the audio gets cached for next time)
+            session.say(answer)
+            self.prerender(answer)
+        return True
+
+    def summary(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
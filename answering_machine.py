@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+from livekit import rtc
+from livekit.agents.voice import io
+
+from answer_cache import normalize
+
+logger = logging.getLogger("answering-machine")
+
+# Voicemail greetings and carrier announcements (English + Hindi)
+DEFAULT_KEYWORDS = (
+    "leave a message", "leave your message", "after the tone", "after the beep", "record your message",
+    "not available", "unavailable", "voicemail", "voice mail", "mailbox", "can't take your call",
+    "switched off", "not reachable", "does not exist",
+    "संदेश छोड़", "बीप के बाद", "उपलब्ध नहीं", "पहुंच से बाहर", "स्विच ऑफ",
+)
+
+HUMAN, MACHINE, UNKNOWN = "human", "machine", "unknown"
+
+
+class BeepDetector:
+    """
+    Finds the voicemail beep: a sustained pure tone between `low_hz` and `high_hz`.
+    PCM is analysed in 20 ms blocks; a block is tonal when the peak frequency holds
+    `tonality` of the block's energy (a sine holds ~99%, voiced speech well under 95%). `min_seconds` of tonal blocks at the same
+    pitch (within 5%) is a beep. Speech harmonics spread energy and never qualify.
+    """
+
+    def __init__(self, min_seconds: float = 0.15, low_hz: float = 300, high_hz: float = 2500,
+                 tonality: float = 0.95, min_rms: float = 300):
+        self.min_seconds = min_seconds
+        self.low_hz = low_hz
+        self.high_hz = high_hz
+        self.tonality = tonality
+        self.min_rms = min_rms
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._rate = None
+        self._run_seconds = 0.0
+        self._run_hz = 0.0
+
+    def push(self, pcm: np.ndarray, sample_rate: int) -> bool:
+        """Feed mono int16 PCM. Returns True when a beep has just been completed."""
+        if sample_rate != self._rate:
+            self._rate = sample_rate
+            self._buf = np.zeros(0, dtype=np.float32)
+        self._buf = np.concatenate([self._buf, pcm.astype(np.float32)])
+        block = sample_rate // 50
+        found = False
+        while len(self._buf) >= block:
+            found = self._block(self._buf[:block], sample_rate) or found
+            self._buf = self._buf[block:]
+        return found
+
+    def _block(self, x: np.ndarray, sample_rate: int) -> bool:
+        if np.sqrt(np.mean(x * x)) < self.min_rms:
+            self._run_seconds = 0.0
+            return False
+        power = np.abs(np.fft.rfft(x * np.hanning(len(x)))) ** 2
+        hz = np.fft.rfftfreq(len(x), 1.0 / sample_rate)
+        peak = int(np.argmax(power))
+        tone = power[max(peak - 2, 0):peak + 3].sum() / (power.sum() or 1.0)
+        if not (self.low_hz <= hz[peak] <= self.high_hz and tone >= self.tonality):
+            self._run_seconds = 0.0
+            return False
+        if self._run_seconds and abs(hz[peak] - self._run_hz) > 0.05 * self._run_hz:
+            self._run_seconds = 0.0
+        if not self._run_seconds:
+            self._run_hz = hz[peak]
+        before = self._run_seconds
+        self._run_seconds += len(x) / sample_rate
+        return before < self.min_seconds <= self._run_seconds
+
+
+class MachineClassifier:
+    """
+    Human vs answering machine from what happens in the first seconds after answer.
+    Times are seconds since answer; call decide() as time passes.
+
+    - machine: a voicemail keyword in the transcript, a beep, or more than
+      `machine_min_speech` seconds of speech (recorded greetings are long)
+    - human: a short greeting ("Hello?", at most `human_max_speech` seconds) followed by
+      `human_silence` seconds of silence - people wait for the caller to speak
+    - unknown: nothing said for `initial_silence` seconds
+    """
+
+    def __init__(self, human_max_speech: float = 2.4, human_silence: float = 0.8,
+                 machine_min_speech: float = 3.0, initial_silence: float = 3.0, keywords=DEFAULT_KEYWORDS):
+        self.human_max_speech = human_max_speech
+        self.human_silence = human_silence
+        self.machine_min_speech = machine_min_speech
+        self.initial_silence = initial_silence
+        self.keywords = [normalize(k) for k in keywords if normalize(k)]
+        self.speech = 0.0
+        self.segments = 0
+        self.transcript = ""
+        self._speaking_since = None
+        self._last_end = None
+        self._keyword = None
+        self._beep_at = None
+
+    def speech_started(self, t: float):
+        if self._speaking_since is None:
+            self._speaking_since = t
+
+    def speech_ended(self, t: float, duration: float = None):
+        if self._speaking_since is None:
+            return
+        self.speech += duration if duration is not None else t - self._speaking_since
+        self.segments += 1
+        self._speaking_since = None
+        self._last_end = t
+
+    def transcribed(self, text: str):
+        self.transcript = text
+        norm = f" {normalize(text)} "
+        for keyword in self.keywords:
+            if f" {keyword} " in norm:
+                self._keyword = keyword
+                return
+
+    def beep(self, t: float):
+        if self._beep_at is None:
+            self._beep_at = t
+
+    def speech_so_far(self, t: float) -> float:
+        return self.speech + (t - self._speaking_since if self._speaking_since is not None else 0.0)
+
+    def greeting_over(self, t: float) -> bool:
+        """The machine is recording: its beep was heard, or its greeting ended `human_silence` ago."""
+        if self._beep_at is not None:
+            return True
+        return (self._speaking_since is None and self._last_end is not None
+                and t - self._last_end >= self.human_silence)
+
+    def decide(self, t: float):
+        """Return (label, reason) once the evidence is conclusive, else None."""
+        if self._keyword:
+            return MACHINE, f"keyword:{self._keyword}"
+        if self._beep_at is not None:
+            return MACHINE, "beep"
+        speech = self.speech_so_far(t)
+        if speech >= self.machine_min_speech:
+            return MACHINE, "long_greeting"
+        if self._speaking_since is None and self._last_end is not None:
+            silence = t - self._last_end
+            if speech <= self.human_max_speech and silence >= self.human_silence:
+                return HUMAN, "short_greeting"
+            if silence >= 1.5 * self.human_silence:
+                return HUMAN, "greeting_then_pause"
+        if not self.segments and self._speaking_since is None and t >= self.initial_silence:
+            return UNKNOWN, "silence"
+        return None
+
+
+class _BeepTap(io.AudioInput):
+    def __init__(self, detector: "MachineDetector", source: io.AudioInput):
+        super().__init__(label="MachineDetector", source=source)
+        self._detector = detector
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        frame = await super().__anext__()
+        self._detector._on_frame(frame)
+        return frame
+
+
+class MachineDetector:
+    """
+    Answering-machine detection for one outbound call, run between answer and greeting.
+
+    Uses the session's own VAD (user_state_changed) and STT (user_input_transcribed)
+    plus a beep detector on the caller's audio; nothing extra is sent to a provider.
+    detect() returns within `budget` seconds; undecided calls come back "unknown" and
+    are treated as human. While screening, the agent doesn't reply to the callee.
+    """
+
+    def __init__(self, classifier: MachineClassifier, budget: float = 4.0, histograms=None):
+        self.classifier = classifier
+        self.budget = budget
+        self.histograms = histograms
+        self.screening = False
+        self.verdict = None
+        self.reason = None
+        self.decision_ms = None
+        self._t0 = None
+        self._listening = False
+        self._beeps = BeepDetector()
+        self._changed = asyncio.Event()
+
+    def attach(self, session):
+        """Hook the session's VAD, STT and caller audio (call after session.start)."""
+        if session.input.audio is not None:
+            session.input.audio = _BeepTap(self, session.input.audio)
+        session.on("user_state_changed", self._on_user_state)
+        session.on("user_input_transcribed", self._on_transcribed)
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def _on_user_state(self, ev):
+        if not self._listening:
+            return
+        if ev.new_state == "speaking":
+            self.classifier.speech_started(self._now())
+        elif ev.old_state == "speaking":
+            self.classifier.speech_ended(self._now())
+        self._changed.set()
+
+    def _on_transcribed(self, ev):
+        if self._listening:
+            self.classifier.transcribed(ev.transcript)
+            self._changed.set()
+
+    def _on_frame(self, frame: rtc.AudioFrame):
+        if not self._listening:
+            return
+        pcm = np.frombuffer(frame.data, dtype=np.int16)[::frame.num_channels]
+        if self._beeps.push(pcm, frame.sample_rate):
+            self.classifier.beep(self._now())
+            self._changed.set()
+
+    async def detect(self) -> str:
+        """Screen the callee. Returns "human", "machine" or "unknown"."""
+        self._t0 = time.perf_counter()
+        self._listening = self.screening = True
+        decision = None
+        while decision is None:
+            t = self._now()
+            if t >= self.budget:
+                decision = (UNKNOWN, "budget")
+                break
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), min(0.05, self.budget - t))
+            except asyncio.TimeoutError:
+                pass
+            decision = self.classifier.decide(self._now())
+
+        self.screening = False
+        self.verdict, self.reason = decision
+        self.decision_ms = round(self._now() * 1000, 1)
+        logger.info(f"Callee is {self.verdict} ({self.reason}) after {self.decision_ms:.0f} ms")
+        if self.histograms is not None:
+            self.histograms.observe("amd_decision", self.verdict, self.decision_ms)
+        if self.verdict != MACHINE:
+            self._listening = False
+        return self.verdict
+
+    async def wait_for_beep(self, timeout: float) -> bool:
+        """
+        Wait until the machine is ready to record: its beep, or the end of its greeting
+        followed by `human_silence` seconds of quiet. Returns False on timeout.
+        """
+        deadline = time.perf_counter() + timeout
+        try:
+            while time.perf_counter() < deadline:
+                if self.classifier.greeting_over(self._now()):
+                    return True
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), 0.05)
+                except asyncio.TimeoutError:
+                    pass
+            return False
+        finally:
+            self._listening = False
+
+    def summary(self) -> dict:
+        """Outcome for the transcript payload (campaign reporting)."""
+        return {
+            "verdict": self.verdict,
+            "reason": self.reason,
+            "decision_ms": self.decision_ms,
+            "speech_s": round(self.classifier.speech, 2),
+            "transcript": self.classifier.transcript,
+        }
@@ -0,0 +1,237 @@
+"""
+Offline accuracy / decision-latency benchmark for answering-machine detection.
+
+Replays the labeled fixtures in bench/amd_fixtures/manifest.json through the same
+MachineClassifier + BeepDetector the agent uses, with the session's VAD (Silero) run
+over the audio and the fixture's transcript revealed as the caller speaks (simulated
+STT). Runs in audio time, so it takes seconds, not the length of the recordings.
+
+Fixtures are either real recordings ("file", relative to the manifest) or synthesized
+("synth": silence / formant speech / beep parts; generated once into .cache/amd_fixtures).
+
+    python -m bench.amd
+    python -m bench.amd --human-silence 0.6 --machine-min-speech 2.2 --out amd_results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import wave
+import zlib
+
+import numpy as np
+from livekit import rtc
+from livekit.agents import vad as agents_vad
+
+import config
+from answering_machine import HUMAN, MACHINE, UNKNOWN, BeepDetector, MachineClassifier
+from bench.latency import percentiles
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(__file__), "amd_fixtures", "manifest.json")
+SYNTH_DIR = os.path.join(".cache", "amd_fixtures")
+BLOCK_MS = 20
+
+# Formants (Hz) of a few vowels, for speech-like test audio
+_VOWELS = ((730, 1090, 2440), (270, 2290, 3010), (300, 870, 2240), (530, 1840, 2480), (570, 840, 2410))
+
+
+# --- Fixture synthesis ---
+
+def _resonator(x: np.ndarray, hz: float, bandwidth: float, rate: int) -> np.ndarray:
+    r = np.exp(-np.pi * bandwidth / rate)
+    a1, a2 = 2 * r * np.cos(2 * np.pi * hz / rate), -r * r
+    y = np.zeros(len(x))
+    y1 = y2 = 0.0
+    for i, v in enumerate(x):
+        y0 = (1 - r) * v + a1 * y1 + a2 * y2
+        y[i] = y0
+        y2, y1 = y1, y0
+    return y
+
+
+def _speech(seconds: float, rate: int, rng: np.random.Generator) -> np.ndarray:
+    """Syllables of glottal pulses through vowel formants, with pitch movement and short gaps."""
+    parts, total = [], 0.0
+    f0 = rng.uniform(110, 220)
+    while total < seconds:
+        dur = min(rng.uniform(0.12, 0.28), seconds - total + 0.01)
+        n = int(dur * rate)
+        t = np.arange(n) / rate
+        pitch = f0 * rng.uniform(0.9, 1.1) * (1 + 0.1 * np.sin(2 * np.pi * 3 * t))
+        phase = np.cumsum(pitch / rate)
+        source = (np.diff(np.floor(phase), prepend=0) > 0).astype(float) + 0.02 * rng.standard_normal(n)
+        formants = _VOWELS[rng.integers(len(_VOWELS))]
+        y = sum(_resonator(source, hz, bw, rate) for hz, bw in zip(formants, (80, 100, 120)))
+        parts.append(y * np.sin(np.pi * np.arange(n) / n) ** 0.6)
+        total += dur
+        if rng.random() < 0.15 and total < seconds:
+            gap = min(rng.uniform(0.05, 0.15), seconds - total)
+            parts.append(np.zeros(int(gap * rate)))
+            total += gap
+    y = np.concatenate(parts)[:int(seconds * rate)]
+    return y / (np.abs(y).max() or 1.0) * 0.5
+
+
+def synthesize(fixture: dict, rate: int) -> np.ndarray:
+    rng = np.random.default_rng(zlib.crc32(fixture["name"].encode()))
+    parts = []
+    for part in fixture["synth"]:
+        kind, seconds = part[0], part[1]
+        n = int(seconds * rate)
+        if kind == "speech":
+            parts.append(_speech(seconds, rate, rng))
+        elif kind == "beep":
+            hz = part[2] if len(part) > 2 else 1000
+            parts.append(0.4 * np.sin(2 * np.pi * hz * np.arange(n) / rate))
+        else:
+            parts.append(np.zeros(n))
+    audio = np.concatenate(parts)
+    audio += fixture.get("noise", 0.002) * rng.standard_normal(len(audio))
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+
+def load_fixture(fixture: dict, base: str, rate: int):
+    """Return (mono int16 PCM, sample rate), synthesizing and caching generated fixtures."""
+    path = os.path.join(base, fixture["file"]) if "file" in fixture else os.path.join(SYNTH_DIR, f"{fixture['name']}.wav")
+    if "file" not in fixture and not os.path.exists(path):
+        os.makedirs(SYNTH_DIR, exist_ok=True)
+        with wave.open(path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(rate)
+            w.writeframes(synthesize(fixture, rate).tobytes())
+    with wave.open(path, "rb") as w:
+        pcm = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+        return pcm[::w.getnchannels()], w.getframerate()
+
+
+# --- Replay ---
+
+async def vad_events(vad, pcm: np.ndarray, rate: int) -> list:
+    """(time, "start"/"end") speech events from the session VAD over the whole recording."""
+    stream = vad.stream()
+    block = rate * BLOCK_MS // 1000
+    for i in range(0, len(pcm) - block + 1, block):
+        stream.push_frame(rtc.AudioFrame(pcm[i:i + block].tobytes(), rate, 1, block))
+    stream.end_input()
+    events = []
+    async for ev in stream:
+        if ev.type == agents_vad.VADEventType.START_OF_SPEECH:
+            events.append((ev.timestamp, "start"))
+        elif ev.type == agents_vad.VADEventType.END_OF_SPEECH:
+            events.append((ev.timestamp, "end"))
+    await stream.aclose()
+    return events
+
+
+def replay(fixture: dict, pcm: np.ndarray, rate: int, events: list, args) -> dict:
+    classifier = MachineClassifier(
+        human_max_speech=args.human_max_speech,
+        human_silence=args.human_silence,
+        machine_min_speech=args.machine_min_speech,
+        initial_silence=args.initial_silence,
+    )
+    beeps = BeepDetector()
+    words = fixture.get("transcript", "").split()
+    total_speech = sum(end - start for (start, _), (end, _) in zip(events[0::2], events[1::2])) or 1.0
+    block = rate * BLOCK_MS // 1000
+    pending = list(events)
+    shown = 0
+    decision, t = None, 0.0
+    for i in range(0, len(pcm) - block + 1, block):
+        t = (i + block) / rate
+        if t > args.budget:
+            break
+        if beeps.push(pcm[i:i + block], rate):
+            classifier.beep(t)
+        while pending and pending[0][0] <= t:
+            at, kind = pending.pop(0)
+            if kind == "start":
+                classifier.speech_started(at)
+            else:
+                classifier.speech_ended(at)
+        # Simulated streaming STT: words arrive in proportion to speech heard, `stt_latency` late
+        heard = classifier.speech_so_far(max(t - args.stt_latency, 0.0))
+        reveal = min(len(words), int(len(words) * heard / total_speech))
+        if reveal > shown:
+            shown = reveal
+            classifier.transcribed(" ".join(words[:shown]))
+        decision = classifier.decide(t)
+        if decision is not None:
+            break
+    label, reason = decision or (UNKNOWN, "budget")
+    # Unknown is treated as a human (the agent greets)
+    acted = MACHINE if label == MACHINE else HUMAN
+    return {
+        "name": fixture["name"],
+        "label": fixture["label"],
+        "verdict": label,
+        "reason": reason,
+        "correct": acted == fixture["label"],
+        "decision_ms": round(t * 1000, 1),
+    }
+
+
+async def run_benchmark(args) -> dict:
+    from livekit.plugins import silero
+
+    with open(args.manifest, encoding="utf-8") as f:
+        manifest = json.load(f)
+    base = os.path.dirname(args.manifest)
+    vad = silero.VAD.load()
+
+    results = []
+    for fixture in manifest["fixtures"]:
+        pcm, rate = load_fixture(fixture, base, manifest.get("sample_rate", 16000))
+        events = await vad_events(vad, pcm, rate)
+        results.append(replay(fixture, pcm, rate, events, args))
+
+    confusion = {}
+    for r in results:
+        key = f"{r['label']}->{r['verdict']}"
+        confusion[key] = confusion.get(key, 0) + 1
+    by_label = {
+        label: [r for r in results if r["label"] == label] for label in (HUMAN, MACHINE)
+    }
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "manifest")},
+        "fixtures": len(results),
+        "accuracy": round(sum(r["correct"] for r in results) / max(len(results), 1), 3),
+        "machine_recall": round(sum(r["correct"] for r in by_label[MACHINE]) / max(len(by_label[MACHINE]), 1), 3),
+        "human_false_positives": sum(1 for r in by_label[HUMAN] if r["verdict"] == MACHINE),
+        "confusion": confusion,
+        "decision_ms": {label: percentiles([r["decision_ms"] for r in rows]) for label, rows in by_label.items()},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline answering-machine detection benchmark.")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="Labeled fixture manifest (JSON)")
+    parser.add_argument("--budget", type=float, default=config.AMD_BUDGET)
+    parser.add_argument("--human-max-speech", type=float, default=config.AMD_HUMAN_MAX_SPEECH)
+    parser.add_argument("--human-silence", type=float, default=config.AMD_HUMAN_SILENCE)
+    parser.add_argument("--machine-min-speech", type=float, default=config.AMD_MACHINE_MIN_SPEECH)
+    parser.add_argument("--initial-silence", type=float, default=config.AMD_INITIAL_SILENCE)
+    parser.add_argument("--stt-latency", type=float, default=0.3, help="Seconds from speech to transcript")
+    parser.add_argument("--out", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    result = asyncio.run(run_benchmark(args))
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    if result["human_false_positives"]:
+        print(f"WARNING: {result['human_false_positives']} human fixture(s) classified as machine", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+"""
+Deterministic local stand-ins for LiveKit and the STT / LLM / TTS providers.
+
+They let the real `agent.entrypoint` run offline: a fake JobContext + room,
+a fake SIP API that "answers" after a configurable delay, LLM / TTS plugins
+(llm.LLM / tts.TTS subclasses) with configurable latency distributions, and a
+FakeAgentSession that replays scripted caller turns and hands each one to the real
+OutboundAssistant nodes, emitting the same session events as the real AgentSession
+(so TurnTracker and friends measure it exactly as they would in production).
+"""
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from livekit.agents import DEFAULT_API_CONNECT_OPTIONS, ModelSettings, StopResponse, llm, tts, utils
+from livekit.agents.voice.agent_session import SessionConnectOptions
+from livekit.api import TwirpError
+
+
+class LatencyDist:
+    """Gaussian latency (ms), clipped at zero. Parsed from "mean" or "mean:stddev"."""
+
+    def __init__(self, mean_ms: float, stddev_ms: float = 0.0):
+        self.mean_ms = mean_ms
+        self.stddev_ms = stddev_ms
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDist":
+        parts = [float(p) for p in str(spec).split(":")]
+        return cls(parts[0], parts[1] if len(parts) > 1 else 0.0)
+
+    def sample(self, rng: random.Random) -> float:
+        """Sampled latency in seconds."""
+        return max(0.0, rng.gauss(self.mean_ms, self.stddev_ms)) / 1000
+
+
+# --- Event emitter ---
+
+class _Emitter:
+    def __init__(self):
+        self._handlers = {}
+
+    def on(self, event: str, callback=None):
+        if callback is None:
+            def decorator(fn):
+                self._handlers.setdefault(event, []).append(fn)
+                return fn
+            return decorator
+        self._handlers.setdefault(event, []).append(callback)
+        return callback
+
+    def off(self, event: str, callback):
+        if callback in self._handlers.get(event, []):
+            self._handlers[event].remove(callback)
+
+    def emit(self, event: str, *args):
+        for callback in list(self._handlers.get(event, [])):
+            callback(*args)
+
+    def handler_count(self) -> int:
+        return sum(len(v) for v in self._handlers.values())
+
+
+# --- LiveKit stand-ins ---
+
+class FakeParticipant:
+    def __init__(self, identity: str):
+        self.identity = identity
+        self.track_publications = {}
+
+
+class FakeRoom(_Emitter):
+    def __init__(self, name: str, metadata: str = ""):
+        super().__init__()
+        self.name = name
+        self.metadata = metadata
+        self.remote_participants = {}
+        self.local_participant = FakeParticipant("agent")
+        self.session = None  # Set by FakeAgentSession.start()
+
+    def add_participant(self, identity: str):
+        p = FakeParticipant(identity)
+        self.remote_participants[identity] = p
+        self.emit("participant_connected", p)
+        return p
+
+
+class FakeSIP:
+    """Fake `ctx.api.sip`: dialing answers after `answer_delay`, or ends busy / unanswered."""
+
+    def __init__(self, room: FakeRoom, answer_delay: LatencyDist, rng: random.Random, fail_rate: float = 0.0,
+                 no_answer_rate: float = 0.0):
+        self.room = room
+        self.answer_delay = answer_delay
+        self.rng = rng
+        self.fail_rate = fail_rate
+        self.no_answer_rate = no_answer_rate
+        self.transfers = []
+
+    async def create_sip_participant(self, request):
+        await asyncio.sleep(self.answer_delay.sample(self.rng))
+        roll = self.rng.random()
+        if roll < self.fail_rate:
+            raise TwirpError("unavailable", "Busy Here", status=503, metadata={"sip_status_code": "486"})
+        if roll < self.fail_rate + self.no_answer_rate:
+            raise TwirpError("deadline_exceeded", "Temporarily Unavailable", status=504,
+                             metadata={"sip_status_code": "480"})
+        return self.room.add_participant(request.participant_identity)
+
+    async def list_outbound_trunk(self, request):
+        return SimpleNamespace(items=[SimpleNamespace(sip_trunk_id="ST_fake")])
+
+    async def transfer_sip_participant(self, request):
+        self.transfers.append(request)
+
+
+class FakeJobProcess:
+    def __init__(self, userdata: dict = None):
+        self.userdata = userdata if userdata is not None else {}
+
+
+class FakeJobContext:
+    """Just enough of agents.JobContext for entrypoint()."""
+
+    def __init__(self, room: FakeRoom, job_metadata: str, proc: FakeJobProcess, sip: FakeSIP):
+        self.room = room
+        self.job = SimpleNamespace(metadata=job_metadata, id=f"job-{room.name}")
+        self.proc = proc
+        self.api = SimpleNamespace(sip=sip)
+        self._shutdown_callbacks = []
+
+    def add_shutdown_callback(self, callback):
+        self._shutdown_callbacks.append(callback)
+
+    def shutdown(self, reason: str = ""):
+        # Like JobContext.shutdown(): returns immediately, callbacks run in the background
+        return asyncio.ensure_future(self._run_shutdown())
+
+    async def _run_shutdown(self):
+        callbacks, self._shutdown_callbacks = self._shutdown_callbacks, []
+        for callback in callbacks:
+            await callback()
+        self.room.emit("disconnected", "job shutdown")
+
+
+# --- Providers ---
+
+class FakeSTT:
+    def __init__(self, latency: LatencyDist, provider: str = "fake-stt"):
+        self.latency = latency
+        self.provider = provider
+
+    def prewarm(self):
+        pass
+
+
+class FakeLLM(llm.LLM):
+    """
+    An llm.LLM whose streams reply to the last user message: the scripted reply when
+    there is one (`replies`, keyed by the message text), else a short echo. First token
+    after `ttft`, then `tokens_per_sec`; LLMStream reports the metrics like a real plugin.
+    """
+
+    def __init__(self, ttft: LatencyDist, tokens_per_sec: float = 60.0, provider: str = "fake-llm",
+                 rng: random.Random = None, replies: dict = None):
+        super().__init__()
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.rng = rng or random.Random(0)
+        self.replies = replies or {}
+        self._provider = provider
+
+    @property
+    def provider(self) -> str:
+        return self._provider
+
+    def reply_for(self, chat_ctx: llm.ChatContext) -> str:
+        users = [m for m in chat_ctx.items if getattr(m, "role", None) == "user"]
+        text = (users[-1].text_content or "").strip() if users else ""
+        if text in self.replies:
+            return self.replies[text]
+        return " ".join(f"Sure, I can help with that. {text}".split()[:_ECHO_WORDS])
+
+    def chat(self, *, chat_ctx: llm.ChatContext, tools=None, conn_options=DEFAULT_API_CONNECT_OPTIONS,
+             **kwargs) -> "FakeLLMStream":
+        return FakeLLMStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+
+class FakeLLMStream(llm.LLMStream):
+    async def _run(self):
+        fake = self._llm
+        reply = fake.reply_for(self._chat_ctx)
+        request_id = utils.shortuuid("fake_")
+        await asyncio.sleep(fake.ttft.sample(fake.rng))
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(1.0 / fake.tokens_per_sec)
+            self._event_ch.send_nowait(llm.ChatChunk(
+                id=request_id, delta=llm.ChoiceDelta(role="assistant", content=word if i == 0 else " " + word),
+            ))
+        # Full history is resent every turn (~4 characters per token)
+        prompt_tokens = sum(len(m.text_content or "") for m in self._chat_ctx.items if m.type == "message") // 4
+        self._event_ch.send_nowait(llm.ChatChunk(id=request_id, usage=llm.CompletionUsage(
+            completion_tokens=len(words), prompt_tokens=prompt_tokens, total_tokens=prompt_tokens + len(words),
+        )))
+
+
+class FakeTTS(tts.TTS):
+    """A streaming tts.TTS that answers with silence: first audio after `ttfb`, 20 ms per word."""
+
+    def __init__(self, ttfb: LatencyDist, provider: str = "fake-tts", sample_rate: int = 24000,
+                 rng: random.Random = None):
+        super().__init__(capabilities=tts.TTSCapabilities(streaming=True), sample_rate=sample_rate, num_channels=1)
+        self.ttfb = ttfb
+        self.rng = rng or random.Random(0)
+        self._provider = provider
+
+    @property
+    def provider(self) -> str:
+        return self._provider
+
+    def synthesize(self, text: str, *, conn_options=DEFAULT_API_CONNECT_OPTIONS) -> "FakeChunkedStream":
+        return FakeChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+    def stream(self, *, conn_options=DEFAULT_API_CONNECT_OPTIONS) -> "FakeSynthesizeStream":
+        return FakeSynthesizeStream(tts=self, conn_options=conn_options)
+
+    def silence(self, text: str) -> bytes:
+        return bytes(2 * self.sample_rate // 50 * max(1, len(text.split())))
+
+
+class FakeChunkedStream(tts.ChunkedStream):
+    async def _run(self, output_emitter: tts.AudioEmitter):
+        fake = self._tts
+        output_emitter.initialize(request_id=utils.shortuuid("fake_"), sample_rate=fake.sample_rate,
+                                  num_channels=1, mime_type="audio/pcm")
+        await asyncio.sleep(fake.ttfb.sample(fake.rng))
+        output_emitter.push(fake.silence(self._input_text))
+        output_emitter.flush()
+
+
+class FakeSynthesizeStream(tts.SynthesizeStream):
+    async def _run(self, output_emitter: tts.AudioEmitter):
+        fake = self._tts
+        output_emitter.initialize(request_id=utils.shortuuid("fake_"), sample_rate=fake.sample_rate,
+                                  num_channels=1, mime_type="audio/pcm", stream=True)
+        started = False
+        async for data in self._input_ch:
+            if isinstance(data, self._FlushSentinel) or not data.strip():
+                continue
+            if not started:
+                self._mark_started()
+                await asyncio.sleep(fake.ttfb.sample(fake.rng))
+                output_emitter.start_segment(segment_id=utils.shortuuid("fake_"))
+                started = True
+            output_emitter.push(fake.silence(data))
+        if started:
+            output_emitter.end_segment()
+
+
+# --- Session ---
+
+# Echo replies (no scripted reply) are cut to this many words
+_ECHO_WORDS = 24
+
+
+class FakeAgentSession(_Emitter):
+    """
+    Stand-in for AgentSession without the room audio I/O. Caller turns (VAD / STT) are
+    replayed as session events; everything after the end of a turn runs the real agent:
+    on_user_turn_completed(), llm_node() and tts_node() over the session's LLM and TTS
+    plugins (whose metrics_collected are re-emitted on the session, like AgentActivity).
+    Emits user_state_changed / user_input_transcribed / metrics_collected /
+    agent_state_changed / conversation_item_added.
+    """
+
+    def __init__(self, vad=None, stt=None, llm=None, tts=None, rng: random.Random = None, **kwargs):
+        super().__init__()
+        self.stt = stt
+        self.llm = llm
+        self.tts = tts
+        self.rng = rng or random.Random(0)
+        self.conn_options = SessionConnectOptions()
+        self.agent = None
+        self.room = None
+        self.replies = []
+        self.closed = False
+        self._speech_lock = asyncio.Lock()
+        self._speeches = set()
+
+    async def start(self, room=None, agent=None, room_input_options=None, **kwargs):
+        self.room = room
+        self.agent = agent
+        room.session = self
+        # The bits of AgentActivity the agent's nodes read
+        agent._activity = SimpleNamespace(
+            session=self, llm=self.llm, tts=self.tts, stt=self.stt, realtime_llm_session=None,
+            _resolve_expressive_options=lambda: None,
+        )
+        agent._chat_ctx.add_message(role="system", content=agent.instructions)
+        for plugin in (self.llm, self.tts):
+            plugin.on("metrics_collected", self._on_metrics)
+
+    async def aclose(self):
+        if self.closed:
+            return
+        self.closed = True
+        for task in list(self._speeches):
+            task.cancel()
+        if self._speeches:
+            await asyncio.gather(*self._speeches, return_exceptions=True)
+        for plugin in (self.llm, self.tts):
+            plugin.off("metrics_collected", self._on_metrics)
+
+    def _on_metrics(self, m):
+        self.emit("metrics_collected", SimpleNamespace(metrics=m))
+
+    def _add_message(self, role: str, text: str):
+        message = llm.ChatMessage(role=role, content=[text])
+        self.agent._chat_ctx.insert(message)
+        self.emit("conversation_item_added", SimpleNamespace(item=message, created_at=time.time()))
+
+    def _agent_state(self, old: str, new: str):
+        self.emit("agent_state_changed", SimpleNamespace(old_state=old, new_state=new))
+
+    # --- Agent speech ---
+
+    def _speech(self, coro):
+        """Queue a speech (played one at a time, like the session's speech queue); returns an awaitable handle."""
+        task = asyncio.ensure_future(coro)
+        self._speeches.add(task)
+        task.add_done_callback(self._speeches.discard)
+        return task
+
+    def say(self, text: str, audio=None, **kwargs):
+        return self._speech(self._say(text, audio))
+
+    async def _say(self, text: str, audio):
+        async with self._speech_lock:
+            self._agent_state("listening", "thinking")
+            if audio is None:
+                audio = self.agent.tts_node(_aiter([text]), ModelSettings())
+            await self._play(audio)
+            self._add_message("assistant", text)
+
+    def generate_reply(self, instructions: str = None, **kwargs):
+        return self._speech(self._generate_reply(instructions))
+
+    async def _generate_reply(self, instructions: str):
+        chat_ctx = self.agent.chat_ctx.copy()
+        if instructions:
+            chat_ctx.add_message(role="system", content=instructions)
+        async with self._speech_lock:
+            await self._respond(chat_ctx)
+
+    async def _respond(self, chat_ctx: llm.ChatContext):
+        """llm_node -> tts_node -> "playout", as the session's reply pipeline runs them."""
+        self._agent_state("listening", "thinking")
+        text_ch = utils.aio.Chan()
+        parts = []
+
+        async def _generate():
+            try:
+                async for chunk in self.agent.llm_node(chat_ctx, list(self.agent.tools), ModelSettings()):
+                    delta = chunk if isinstance(chunk, str) else (chunk.delta.content if chunk.delta else None)
+                    if delta:
+                        parts.append(delta)
+                        text_ch.send_nowait(delta)
+            finally:
+                text_ch.close()
+
+        llm_task = asyncio.create_task(_generate())
+        try:
+            await self._play(self.agent.tts_node(text_ch, ModelSettings()))
+            await llm_task
+        finally:
+            await utils.aio.cancel_and_wait(llm_task)
+        text = "".join(parts)
+        self._add_message("assistant", text)
+        self.replies.append(text)
+
+    async def _play(self, frames):
+        speaking = False
+        async for _ in frames:
+            if not speaking:
+                self._agent_state("thinking", "speaking")
+                speaking = True
+        self._agent_state("speaking" if speaking else "thinking", "listening")
+
+    # --- Caller turns ---
+
+    async def user_turn(self, text: str, speech_seconds: float = 0.0):
+        """Replay one caller turn (speech, interim + final transcript), then let the agent answer it."""
+        self.emit("user_state_changed", SimpleNamespace(old_state="listening", new_state="speaking"))
+        if speech_seconds:
+            await asyncio.sleep(speech_seconds)
+        self.emit("user_input_transcribed", SimpleNamespace(transcript=text, is_final=False, language=None))
+        self.emit("user_state_changed", SimpleNamespace(old_state="speaking", new_state="listening"))
+
+        await asyncio.sleep(self.stt.latency.sample(self.rng))
+        self.emit("user_input_transcribed", SimpleNamespace(transcript=text, is_final=True, language=None))
+
+        async with self._speech_lock:
+            message = llm.ChatMessage(role="user", content=[text])
+            turn_ctx = self.agent.chat_ctx.copy()
+            try:
+                await self.agent.on_user_turn_completed(turn_ctx, message)
+            except StopResponse:
+                self._add_message("user", text)
+                return
+            self._add_message("user", text)
+            turn_ctx.insert(message)
+            await self._respond(turn_ctx)
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+class FakeDelivery:
+    """Stand-in for TranscriptDelivery that keeps payloads in memory (or only counts them)."""
+
+    def __init__(self, keep: bool = True):
+        self.keep = keep
+        self.payloads = []
+        self.delivered = 0
+
+    async def acquire(self):
+        pass
+
+    async def release(self, timeout: float = 0):
+        pass
+
+    def submit(self, payload: dict) -> bool:
+        self.delivered += 1
+        if self.keep:
+            self.payloads.append(payload)
+        return True
+
+    def metrics(self) -> dict:
+        return {"queue_depth": 0, "delivered": self.delivered, "dropped": 0}
@@ -0,0 +1,263 @@
+"""
+Offline end-to-end latency benchmark for agent.py.
+
+Runs the real `entrypoint` + `OutboundAssistant` against a fake JobContext / room and
+deterministic fake STT / LLM / TTS providers (see bench/fakes.py), replays a script of
+caller turns through the agent's own nodes (FAQ answer cache, speculation, greeting
+cache included) and reports turn-latency percentiles, event-loop lag and CPU time per
+call as JSON.
+
+    python -m bench.latency --calls 50 --concurrency 10 --out bench_results.json
+    python -m bench.latency --baseline bench_results.json --max-regression 10   # exit 1 on regression
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import wave
+
+import agent
+from answer_cache import AnswerCache
+from bench.fakes import (
+    FakeAgentSession, FakeDelivery, FakeJobContext, FakeJobProcess, FakeLLM, FakeRoom,
+    FakeSIP, FakeSTT, FakeTTS, LatencyDist,
+)
+from greeting_cache import GreetingCache
+from provider_pool import ProviderPool
+from trunk_pool import TrunkPool
+from turn_metrics import STAGES, LatencyHistograms, TurnTracker
+
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(__file__), "scripts", "receptionist.json")
+DEFAULT_FAQ = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faq.example.json")
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(pct):
+        return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 2)
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99), "max": round(ordered[-1], 2), "n": len(ordered)}
+
+
+def load_script(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        script = json.load(f)
+    base = os.path.dirname(path)
+    for turn in script["turns"]:
+        # Audio turns: use the recording's length as the caller's speech duration.
+        if "audio" in turn:
+            with wave.open(os.path.join(base, turn["audio"]), "rb") as w:
+                turn["speech_seconds"] = w.getnframes() / w.getframerate()
+    return script
+
+
+def install_fakes(args, rng: random.Random, cache_dir: str, replies: dict = None):
+    """Build the offline fakes wherever agent.py builds a plugin, and skip the LiveKit-only setup."""
+    agent.AgentSession = functools.partial(FakeAgentSession, rng=rng)
+    agent._build_stt = lambda cfg=None: FakeSTT(LatencyDist.parse(args.stt_latency))
+    agent._build_llm = lambda config_provider=None, cfg=None: FakeLLM(
+        LatencyDist.parse(args.llm_ttft), tokens_per_sec=args.llm_tokens_per_sec, rng=rng, replies=replies,
+    )
+    agent._build_tts = lambda config_provider=None, config_voice=None, cfg=None: FakeTTS(
+        LatencyDist.parse(args.tts_ttfb), rng=rng,
+    )
+    agent.RoomInputOptions = lambda **kwargs: None
+    install_settings(cache_dir)
+
+
+def install_settings(cache_dir: str):
+    """Give jobs the Dashboard settings the worker's refresher would have saved (FakeSIP's one trunk)."""
+    agent.config.CONFIG_CACHE_PATH = os.path.join(cache_dir, "config.json")
+    with open(agent.config.CONFIG_CACHE_PATH, "w", encoding="utf-8") as f:
+        json.dump({"version": "bench", "etag": None, "data": {"SIP_TRUNK_ID": "ST_fake"}}, f)
+    # Noise cancellation runs on LiveKit Cloud audio only
+    agent._noise_cancellation = lambda: None
+
+
+def script_replies(script: dict) -> dict:
+    """Caller text -> scripted reply, for FakeLLM."""
+    return {turn["text"]: turn["reply"] for turn in script["turns"] if turn.get("reply")}
+
+
+def new_process(delivery: FakeDelivery, cache_dir: str, faq: str = None) -> FakeJobProcess:
+    """Fake worker process state, as prewarm() would leave it (caches on disk under `cache_dir`)."""
+    userdata = {
+        "vad": object(),
+        "vad_load_ms": 0.0,
+        "provider_pool": ProviderPool(),
+        "turn_histograms": LatencyHistograms(),
+        "transcript_delivery": delivery,
+        "trunk_pool": TrunkPool(os.path.join(cache_dir, "trunks.json"), 10000),
+    }
+    if agent.config.ANSWER_CACHE_ENABLED:
+        answers = AnswerCache(
+            ttl=agent.config.ANSWER_CACHE_TTL,
+            max_entries=agent.config.ANSWER_CACHE_MAX_ENTRIES,
+            threshold=agent.config.ANSWER_CACHE_THRESHOLD,
+            learned_path=os.path.join(cache_dir, "answers.json"),
+        )
+        answers.load_faq(faq, agent.config.SYSTEM_PROMPT)
+        userdata["answer_cache"] = answers
+    if agent.config.GREETING_CACHE_ENABLED:
+        userdata["greeting_cache"] = GreetingCache(os.path.join(cache_dir, "greetings"), 50 * 1024 * 1024)
+    return FakeJobProcess(userdata)
+
+
+def new_job(index: int, script: dict, args, rng: random.Random, proc: FakeJobProcess = None):
+    """Build a fake job for one call (in a fresh fake process unless `proc` is given). Returns (ctx, delivery)."""
+    room = FakeRoom(f"bench-{index}")
+    if proc is None:
+        proc = new_process(FakeDelivery(), args.cache_dir, args.faq)
+    delivery = proc.userdata["transcript_delivery"]
+    metadata = json.dumps({
+        "phone_number": script.get("phone_number", "+910000000000"),
+        "call_id": f"bench-{index}",
+        "dispatched_at": time.time(),
+    })
+    sip = FakeSIP(room, LatencyDist.parse(args.answer_delay), rng, no_answer_rate=args.no_answer_rate)
+    return FakeJobContext(room, metadata, proc, sip), delivery
+
+
+async def run_call(index: int, script: dict, args, rng: random.Random) -> dict:
+    ctx, delivery = new_job(index, script, args, rng)
+
+    start = time.perf_counter()
+    await agent.entrypoint(ctx)
+    setup_ms = (time.perf_counter() - start) * 1000
+
+    session = ctx.room.session
+    tracker = TurnTracker(session, {"stt": "fake", "llm": "fake", "tts": "fake"}, LatencyHistograms())
+    answered = bool(ctx.room.remote_participants)
+    if answered:
+        for turn in script["turns"]:
+            await session.user_turn(turn["text"], turn.get("speech_seconds", 0.0) * args.speech_scale)
+            await asyncio.sleep(turn.get("pause", 0.0))
+    tracker.close()
+    await ctx.shutdown()
+
+    payload = delivery.payloads[-1] if delivery.payloads else {}
+    return {
+        "setup_ms": setup_ms,
+        "answer_cache": payload.get("answer_cache") or {},
+        "turns": tracker.turns,
+        "payloads": len(delivery.payloads),
+        "status": payload.get("status"),
+        "answer_to_first_audio_ms": (payload.get("latency") or {}).get("answer_to_first_audio_ms"),
+    }
+
+
+async def monitor_loop_lag(samples: list, interval: float = 0.01):
+    """Measure how late the event loop wakes us up (ms) - a proxy for blocking work."""
+    while True:
+        t = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - t - interval) * 1000)
+
+
+async def run_benchmark(args) -> dict:
+    script = load_script(args.script)
+    rng = random.Random(args.seed)
+    # Greeting / answer caches start cold every run, then warm up across its calls
+    args.cache_dir = tempfile.mkdtemp(prefix="bench-")
+    install_fakes(args, rng, args.cache_dir, script_replies(script))
+
+    lag_samples = []
+    lag_task = asyncio.create_task(monitor_loop_lag(lag_samples))
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(i):
+        async with semaphore:
+            return await run_call(i, script, args, rng)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    calls = await asyncio.gather(*(limited(i) for i in range(args.calls)))
+    wall_s = time.perf_counter() - wall_start
+    cpu_s = time.process_time() - cpu_start
+    lag_task.cancel()
+    shutil.rmtree(args.cache_dir, ignore_errors=True)
+
+    turns = [t for call in calls for t in call["turns"]]
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "cache_dir")},
+        "calls": len(calls),
+        "turns": len(turns),
+        "wall_s": round(wall_s, 3),
+        "cpu_ms_per_call": round(cpu_s * 1000 / max(len(calls), 1), 2),
+        "setup_ms": percentiles([c["setup_ms"] for c in calls]),
+        "answer_to_first_audio_ms": percentiles(
+            [c["answer_to_first_audio_ms"] for c in calls if c["answer_to_first_audio_ms"] is not None]
+        ),
+        "outcomes": {status: sum(1 for c in calls if c["status"] == status) for status in {c["status"] for c in calls}},
+        "turn_latency_ms": {stage: percentiles([t[stage] for t in turns if stage in t]) for stage in STAGES},
+        "answer_cache": {key: sum(c["answer_cache"].get(key, 0) for c in calls) for key in ("hits", "misses")},
+        "loop_lag_ms": percentiles(lag_samples),
+        "transcripts_delivered": sum(c["payloads"] for c in calls),
+    }
+
+
+def compare(result: dict, baseline: dict, max_regression_pct: float) -> list:
+    """Return a list of p95 regressions worse than `max_regression_pct`."""
+    problems = []
+    for stage, current in result["turn_latency_ms"].items():
+        before = baseline.get("turn_latency_ms", {}).get(stage, {})
+        if not current or not before.get("p95"):
+            continue
+        change = (current["p95"] - before["p95"]) / before["p95"] * 100
+        if change > max_regression_pct:
+            problems.append(f"{stage} p95 {before['p95']} -> {current['p95']} ms (+{change:.1f}%)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency benchmark for the voice agent.")
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="JSON script of caller turns")
+    parser.add_argument("--faq", default=DEFAULT_FAQ, help="FAQ file for the answer cache")
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--stt-latency", default="250:50", help="Final transcript delay, ms 'mean[:stddev]'")
+    parser.add_argument("--llm-ttft", default="400:100", help="LLM time to first token, ms 'mean[:stddev]'")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=60.0)
+    parser.add_argument("--tts-ttfb", default="200:50", help="TTS time to first byte, ms 'mean[:stddev]'")
+    parser.add_argument("--answer-delay", default="50", help="SIP answer delay, ms 'mean[:stddev]'")
+    parser.add_argument("--no-answer-rate", type=float, default=0.0, help="Share of dials that ring out (SIP 480)")
+    parser.add_argument("--speech-scale", type=float, default=0.0,
+                        help="Multiply scripted caller speech durations (0 = don't wait for speech)")
+    parser.add_argument("--out", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Previous results JSON to compare p95s against")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed p95 regression, percent")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    result = asyncio.run(run_benchmark(args))
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(result, json.load(f), args.max_regression)
+        for problem in problems:
+            print(f"REGRESSION: {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
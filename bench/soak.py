@@ -0,0 +1,359 @@
+"""
+Memory / leak soak test for agent.py.
+
+Runs the real `entrypoint` hundreds of times in one process with the real plugins
+(OpenAI LLM / TTS, Deepgram STT, Silero VAD) and the real AgentSession, over fake
+transports (bench/transports.py): a localhost OpenAI / Deepgram server, a scripted
+caller as the session's audio input and an instant sink as its output. One phase per
+`--concurrency` level, first back to back (1), then N calls at a time.
+
+All calls share one fake worker process (provider pool, histograms, trunk pool,
+transcript delivery). A production job process serves a single call, so this is not
+how a worker's memory behaves over time: it piles up whatever calls leave behind in
+process-wide state (listeners on the pooled plugins, caches, module globals), which
+one long call or a thread-executor worker would also carry, until it is plain to see.
+
+Leaks are judged on counts, not RSS (which moves in allocator-arena steps). Each phase
+runs `--warmup` calls (caches filling up, lazy imports, pooled connections), lets them
+drain and takes a tracemalloc snapshot, then runs the rest, drains again and compares:
+Python memory still allocated above `--max-bytes-per-call` is a leak, reported by
+allocation site. At both points and every `--sample-every` calls it also counts live
+objects by type (after a full GC), listeners on the pooled plugins, uncollectable
+garbage, open sockets / fds and pending asyncio tasks: an object type gaining more than
+`--max-objects-per-call` in most steps, or any of the others above its warmed-up count,
+is a leak too. Exits 1 on a leak or a failed call, so a release can be gated on it.
+
+Tracing every allocation makes calls several times slower than in the latency bench.
+
+    python -m bench.soak --calls 300 --concurrency 1,20 --out soak_report.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+import numpy as np
+import psutil
+from livekit.agents.utils import http_context
+
+import agent
+import provider_registry
+import telephony_audio
+from bench.fakes import FakeDelivery, LatencyDist
+from bench.latency import DEFAULT_SCRIPT, install_settings, load_script, new_job, new_process, script_replies
+from bench.transports import ProviderServer, TransportSession
+
+logger = logging.getLogger("bench-soak")
+
+# Allocations of the measuring itself (made in this file, or one call below it), left
+# out of the tracemalloc diff
+_TRACE_FRAMES = 2
+_TRACE_IGNORE = (
+    tracemalloc.Filter(False, __file__, all_frames=True),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def use_transports(server: ProviderServer):
+    """Point the real plugins at the fake provider server and run calls on TransportSession."""
+    os.environ.update({
+        "LLM_PROVIDER": "openai",
+        "TTS_PROVIDER": "openai",
+        "OPENAI_BASE_URL": f"{server.url}/v1",
+        "OPENAI_API_KEY": "soak",
+        "DEEPGRAM_API_KEY": "soak",
+    })
+    deepgram = provider_registry.get("stt", "deepgram")
+    build = deepgram.build
+
+    def build_local(module, *settings):
+        client = build(module, *settings)
+        # No constructor argument reaches it through the registry's settings
+        client._opts.endpoint_url = f"{server.url}/v1/listen"
+        return client
+
+    deepgram.build = build_local
+    agent.AgentSession = TransportSession
+
+
+def _type_name(obj) -> str:
+    t = type(obj)
+    return t.__qualname__ if t.__module__ == "builtins" else f"{t.__module__}.{t.__qualname__}"
+
+
+def _listeners(pool) -> int:
+    """Event listeners on the pooled plugin clients (and the TTS a StreamAdapter wraps)."""
+    count = 0
+    for client in pool._clients.values():
+        for emitter in (client, getattr(client, "_wrapped_tts", None)):
+            count += sum(len(callbacks) for callbacks in getattr(emitter, "_events", {}).values())
+    return count
+
+
+def take_sample(calls: int, process: psutil.Process, pool, server: ProviderServer) -> dict:
+    """Process-wide resource usage right now (after a full GC)."""
+    gc.collect()
+    objects = {}
+    # Counted here rather than with a Counter, so _TRACE_IGNORE leaves the counts out
+    for o in gc.get_objects():
+        name = _type_name(o)
+        objects[name] = objects.get(name, 0) + 1
+    current = asyncio.current_task()
+    return {
+        "calls": calls,
+        "rss_kb": process.memory_info().rss // 1024,
+        "traced_kb": tracemalloc.get_traced_memory()[0] // 1024,
+        "objects": sum(objects.values()),
+        "by_type": objects,
+        "garbage": len(gc.garbage),
+        "listeners": _listeners(pool),
+        "stt_streams": server.open_streams,
+        "sockets": len(process.net_connections(kind="all")),
+        "fds": process.num_fds(),
+        "tasks": sum(1 for t in asyncio.all_tasks() if t is not current and not t.done()),
+    }
+
+
+def per_call_slope(samples: list, key) -> float:
+    """Least-squares growth of `key` per call across the samples."""
+    if len(samples) < 2:
+        return 0.0
+    x = np.array([s["calls"] for s in samples], dtype=float)
+    y = np.array([key(s) for s in samples], dtype=float)
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def rising_share(values: list) -> float:
+    """Share of consecutive steps in which the value went up."""
+    steps = list(zip(values, values[1:]))
+    return sum(1 for a, b in steps if b > a) / max(len(steps), 1)
+
+
+def allocation_growth(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, calls: int, args) -> tuple:
+    """(bytes still allocated per call, top allocation sites by growth) between two snapshots."""
+    stats = after.filter_traces(_TRACE_IGNORE).compare_to(before.filter_traces(_TRACE_IGNORE), "lineno")
+    growth = sum(s.size_diff for s in stats)
+    sites = [
+        {"site": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+         "bytes": s.size_diff, "blocks": s.count_diff}
+        for s in stats[:args.top_types] if s.size_diff > 0
+    ]
+    return growth / max(calls, 1), sites
+
+
+def analyse(samples: list, warmed: dict, settled: dict, snapshots: tuple, args) -> dict:
+    """Growth figures for one phase (from the drained, warmed-up state to the end), and the leaks among them."""
+    window = [warmed] + [s for s in samples if warmed["calls"] < s["calls"] < settled["calls"]] + [settled]
+    calls = max(settled["calls"] - warmed["calls"], 1)
+    leaks = []
+
+    bytes_per_call, sites = allocation_growth(*snapshots, calls, args)
+    if bytes_per_call > args.max_bytes_per_call:
+        top = f" (most at {sites[0]['site']})" if sites else ""
+        leaks.append(f"{bytes_per_call:.0f} bytes/call still allocated after the phase drained{top}")
+
+    growing = []
+    for name in set(window[0]["by_type"]) | set(window[-1]["by_type"]):
+        series = [s["by_type"].get(name, 0) for s in window]
+        per_call = (series[-1] - series[0]) / calls
+        if per_call <= 0:
+            continue
+        growing.append((per_call, rising_share(series), {
+            "type": name, "start": series[0], "end": series[-1], "per_call": round(per_call, 3),
+        }))
+    growing.sort(key=lambda g: g[0], reverse=True)
+    for per_call, rising, g in growing:
+        if per_call > args.max_objects_per_call and rising >= 0.6:
+            leaks.append(f"{g['type']} grows {per_call:.2f} objects/call ({g['start']} -> {g['end']})")
+
+    # Compared with the warmed-up state: pooled plugins, keep-alive connections and their
+    # tasks are there from the first calls on, and every later call has to give its own back
+    for key, what in (("listeners", "plugin listeners"), ("garbage", "uncollectable objects"),
+                      ("stt_streams", "STT websockets"), ("sockets", "sockets"), ("fds", "fds"),
+                      ("tasks", "tasks")):
+        if settled[key] > warmed[key]:
+            leaks.append(f"{what} {warmed[key]} -> {settled[key]} after the phase drained")
+
+    return {
+        "bytes_per_call": round(bytes_per_call, 1),
+        "top_allocation_sites": sites,
+        "objects_per_call": round(per_call_slope(window, lambda s: s["objects"]), 3),
+        "top_growing_types": [g for _, _, g in growing[:args.top_types]],
+        "leaks": leaks,
+    }
+
+
+async def soak_call(index: int, script: dict, proc, args, rng: random.Random) -> int:
+    """One call through the real entrypoint. Returns the room's event handlers left after shutdown."""
+    ctx, _ = new_job(index, script, args, rng, proc=proc)
+    await agent.entrypoint(ctx)
+    session = ctx.room.session
+    try:
+        if ctx.room.remote_participants:
+            await session.wait_answer(1, args.turn_timeout)  # the greeting
+            for turn, line in enumerate(script["turns"], 1):
+                await session.caller_turn(turn, line.get("speech_seconds", 1.0), args.turn_timeout)
+    finally:
+        await ctx.shutdown()
+        await session.aclose()
+    return ctx.room.handler_count()
+
+
+async def run_phase(concurrency: int, offset: int, script: dict, proc, server: ProviderServer, args,
+                    rng: random.Random, process: psutil.Process) -> dict:
+    pool = proc.userdata["provider_pool"]
+    samples = [take_sample(0, process, pool, server)]
+    errors = Counter()
+    handlers = []
+    next_index = 0
+    done = 0
+
+    async def worker(until: int):
+        nonlocal next_index, done
+        while next_index < until:
+            index = next_index
+            next_index += 1
+            try:
+                handlers.append(await soak_call(offset + index, script, proc, args, rng))
+            except Exception as e:
+                errors[f"{type(e).__name__}: {e}"] += 1
+                logger.exception(f"Call {index} failed")
+            done += 1
+            if done % args.sample_every == 0:
+                samples.append(take_sample(done, process, pool, server))
+                logger.info(
+                    f"c={concurrency} calls={done} traced={samples[-1]['traced_kb'] / 1024:.1f} MB "
+                    f"objects={samples[-1]['objects']} listeners={samples[-1]['listeners']} "
+                    f"tasks={samples[-1]['tasks']}"
+                )
+
+    async def run_until(until: int) -> tuple:
+        """Run calls up to `until`, let them drain, then sample and snapshot the quiet process."""
+        await asyncio.gather(*(worker(until) for _ in range(concurrency)))
+        # Let shutdown callbacks and background work of the last calls finish
+        await asyncio.sleep(args.drain)
+        sample = take_sample(done, process, pool, server)
+        return sample, tracemalloc.take_snapshot()
+
+    start = time.perf_counter()
+    # Warm-up: caches filling up, lazy imports, pooled connections
+    warmed, before = await run_until(args.warmup)
+    settled, after = await run_until(args.calls)
+    wall_s = time.perf_counter() - start
+
+    result = {
+        "concurrency": concurrency,
+        "calls": done,
+        "wall_s": round(wall_s, 2),
+        "calls_per_s": round(done / max(wall_s, 1e-9), 1),
+        "errors": dict(errors),
+        "room_handlers_after_shutdown": max(handlers, default=0),
+        "samples": [{k: v for k, v in s.items() if k != "by_type"} for s in samples],
+        "warmed": {k: v for k, v in warmed.items() if k != "by_type"},
+        "settled": {k: v for k, v in settled.items() if k != "by_type"},
+    }
+    result.update(analyse(samples, warmed, settled, (before, after), args))
+    return result
+
+
+async def run_soak(args) -> dict:
+    script = load_script(args.script)
+    rng = random.Random(args.seed)
+    cache_dir = tempfile.mkdtemp(prefix="soak-")
+    # The job process's shared HTTP session, which the Deepgram plugin streams over
+    http_context._new_session_ctx()
+    server = ProviderServer(
+        script["turns"], script_replies(script), rng,
+        stt_latency=LatencyDist.parse(args.stt_latency),
+        llm_ttft=LatencyDist.parse(args.llm_ttft),
+        tokens_per_sec=args.llm_tokens_per_sec,
+        tts_ttfb=LatencyDist.parse(args.tts_ttfb),
+    )
+    await server.start()
+    try:
+        use_transports(server)
+        install_settings(cache_dir)
+        proc = new_process(FakeDelivery(keep=False), cache_dir)
+        proc.userdata["vad"] = agent._load_vad(telephony_audio.sample_rate(agent.config))
+        process = psutil.Process()
+
+        tracemalloc.start(_TRACE_FRAMES)
+        phases = []
+        for i, concurrency in enumerate(int(c) for c in args.concurrency.split(",")):
+            phases.append(await run_phase(concurrency, i * args.calls, script, proc, server, args, rng, process))
+        tracemalloc.stop()
+    finally:
+        await server.aclose()
+        await http_context._close_http_ctx()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    leaks = [f"c={p['concurrency']}: {leak}" for p in phases for leak in p["leaks"]]
+    failed = sum(sum(p["errors"].values()) for p in phases)
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "provider_requests": dict(server.requests),
+        "phases": phases,
+        "leaks": leaks,
+        "failed_calls": failed,
+        "passed": not leaks and not failed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory / leak soak test for the voice agent.")
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="JSON script of caller turns")
+    parser.add_argument("--calls", type=int, default=300, help="Calls per phase (warm-up included)")
+    parser.add_argument("--concurrency", default="1,20", help="Comma-separated concurrency per phase")
+    parser.add_argument("--sample-every", type=int, default=25, help="Calls between resource samples")
+    parser.add_argument("--warmup", type=int, default=100, help="Calls per phase before growth counts")
+    parser.add_argument("--drain", type=float, default=1.0, help="Seconds to let a phase settle")
+    parser.add_argument("--turn-timeout", type=float, default=10.0, help="Seconds to wait for each agent answer")
+    parser.add_argument("--max-bytes-per-call", type=float, default=1024.0,
+                        help="Python memory a call may leave allocated (tracemalloc)")
+    parser.add_argument("--max-objects-per-call", type=float, default=0.2)
+    parser.add_argument("--top-types", type=int, default=10, help="Growing object types / sites to report per phase")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--stt-latency", default="1", help="Final transcript delay, ms 'mean[:stddev]'")
+    parser.add_argument("--llm-ttft", default="1", help="LLM time to first token, ms 'mean[:stddev]'")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=10000.0)
+    parser.add_argument("--tts-ttfb", default="1", help="TTS time to first byte, ms 'mean[:stddev]'")
+    parser.add_argument("--answer-delay", default="1", help="SIP answer delay, ms 'mean[:stddev]'")
+    parser.add_argument("--no-answer-rate", type=float, default=0.1, help="Share of dials that ring out (SIP 480)")
+    parser.add_argument("--out", help="Write the report JSON here (default: stdout)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # Hundreds of calls: keep the agent's own per-call logging out of the way
+    logging.basicConfig(level=logging.ERROR)
+    logger.setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    result = asyncio.run(run_soak(args))
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    for leak in result["leaks"]:
+        print(f"LEAK: {leak}", file=sys.stderr)
+    if result["failed_calls"]:
+        print(f"FAILED: {result['failed_calls']} call(s) raised", file=sys.stderr)
+    if not result["passed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Per-stage call-setup latency from the span files written by call_tracing.py.
+
+Reads OTLP/JSON lines (TRACE_DIR/spans-*.jsonl from agent workers and make_call.py, or
+any OTel Collector file export), groups spans by trace and reports percentiles for each
+setup stage (dispatch, job_assignment, setup, room_connect, sip_dial, amd, greeting)
+plus dispatch-to-greeting per call.
+
+    python -m bench.traces
+    python -m bench.traces .cache/traces/spans-*.jsonl --since 3600 --out setup_latency.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import config
+from bench.latency import percentiles
+
+# Setup stages in call order (the "call" span covers the whole call, so it isn't a stage)
+STAGES = ("dispatch", "job_assignment", "setup", "room_connect", "sip_dial", "amd", "greeting")
+
+
+def _attributes(span: dict) -> dict:
+    out = {}
+    for attr in span.get("attributes", []):
+        value = attr.get("value", {})
+        out[attr["key"]] = next(iter(value.values()), None) if value else None
+    return out
+
+
+def read_spans(paths: list):
+    """Yield every span in the files, flattened from resourceSpans / scopeSpans."""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue  # Partially written last line
+                for resource_spans in request.get("resourceSpans", []):
+                    for scope_spans in resource_spans.get("scopeSpans", []):
+                        yield from scope_spans.get("spans", [])
+
+
+def build_report(paths: list, since: float = None) -> dict:
+    traces = {}
+    for span in read_spans(paths):
+        start_ns, end_ns = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+        if since is not None and start_ns < since * 1e9:
+            continue
+        trace = traces.setdefault(span["traceId"], {})
+        trace[span["name"]] = {"start_ns": start_ns, "end_ns": end_ns, "attributes": _attributes(span)}
+
+    stages = {stage: [] for stage in STAGES}
+    to_greeting = []
+    outcomes = {}
+    slowest = []
+    for trace_id, spans in traces.items():
+        for stage in STAGES:
+            if stage in spans:
+                stages[stage].append((spans[stage]["end_ns"] - spans[stage]["start_ns"]) / 1e6)
+        call = spans.get("call")
+        if call is not None:
+            status = call["attributes"].get("status") or "UNKNOWN"
+            outcomes[status] = outcomes.get(status, 0) + 1
+        if "greeting" in spans:
+            first = min(s["start_ns"] for s in spans.values())
+            total_ms = (spans["greeting"]["end_ns"] - first) / 1e6
+            to_greeting.append(total_ms)
+            slowest.append({
+                "trace_id": trace_id,
+                "call_id": (call or {}).get("attributes", {}).get("call.id"),
+                "room": (call or {}).get("attributes", {}).get("room.name"),
+                "total_ms": round(total_ms, 1),
+                "stages_ms": {
+                    stage: round((spans[stage]["end_ns"] - spans[stage]["start_ns"]) / 1e6, 1)
+                    for stage in STAGES if stage in spans
+                },
+            })
+    slowest.sort(key=lambda s: s["total_ms"], reverse=True)
+
+    return {
+        "files": len(paths),
+        "traces": len(traces),
+        "outcomes": outcomes,
+        "stage_ms": {stage: percentiles(values) for stage, values in stages.items() if values},
+        "dispatch_to_greeting_ms": percentiles(to_greeting),
+        "slowest": slowest[:10],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Call-setup latency percentiles from span files.")
+    parser.add_argument("files", nargs="*", help=f"OTLP/JSON lines files (default: {config.TRACE_DIR}/*.jsonl)")
+    parser.add_argument("--since", type=float, help="Only calls started in the last N seconds")
+    parser.add_argument("--out", help="Write the report JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    paths = args.files or sorted(glob.glob(os.path.join(config.TRACE_DIR, "*.jsonl")))
+    if not paths:
+        print(f"No span files found in {config.TRACE_DIR}", file=sys.stderr)
+        sys.exit(1)
+
+    report = build_report(paths, time.time() - args.since if args.since else None)
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Local stand-ins for the network and room audio under the real provider plugins.
+
+Where bench/fakes.py replaces the plugins themselves, these keep the real ones (OpenAI
+LLM / TTS, Deepgram STT, AgentSession) and fake what they talk to: a localhost server
+speaking the OpenAI chat-completions / speech and Deepgram live-listen protocols, and
+session audio I/O with a scripted caller on the input side and an instant sink on the
+output side. bench/soak.py runs the agent over them.
+
+The caller's speech is a constant, near-silent sample value: turn N of the script is
+sent as samples of value N * _MARKER_STEP, which the fake Deepgram transcribes as that
+turn's text. Silero hears silence, so each turn ends on the final transcript.
+"""
+import asyncio
+import json
+import random
+import time
+import uuid
+from array import array
+from collections import Counter
+
+from aiohttp import WSMsgType, web
+from livekit import rtc
+from livekit.agents import AgentSession
+from livekit.agents.voice import io
+
+from bench.fakes import _ECHO_WORDS, LatencyDist
+
+# Sample value per script turn (an amplitude VAD takes for silence)
+_MARKER_STEP = 8
+_FRAME_SECONDS = 0.02
+# OpenAI's speech endpoint answers with 24 kHz 16-bit mono PCM
+_SPEECH_RATE = 24000
+
+
+def _words_json(words: list) -> list:
+    return [
+        {"word": w, "punctuated_word": w, "start": i * 0.3, "end": i * 0.3 + 0.25, "confidence": 0.99}
+        for i, w in enumerate(words)
+    ]
+
+
+class ProviderServer:
+    """
+    OpenAI and Deepgram endpoints on localhost: /v1/chat/completions (SSE stream with a
+    usage chunk), /v1/audio/speech (silence, 20 ms per word) and /v1/listen (websocket).
+    The LLM answers the last caller message with its scripted reply, else echoes it.
+    HTTP connections close after each response, so a client socket still open once the
+    calls are over is one nobody closed; `open_streams` counts live STT websockets.
+    """
+
+    def __init__(self, turns: list, replies: dict, rng: random.Random, stt_latency: LatencyDist,
+                 llm_ttft: LatencyDist, tokens_per_sec: float, tts_ttfb: LatencyDist):
+        self.turns = turns
+        self.replies = replies
+        self.rng = rng
+        self.stt_latency = stt_latency
+        self.llm_ttft = llm_ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.tts_ttfb = tts_ttfb
+        self.url = None
+        self.requests = Counter()
+        self.open_streams = 0
+        self._runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._chat)
+        app.router.add_post("/v1/audio/speech", self._speech)
+        app.router.add_get("/v1/listen", self._listen)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def aclose(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # --- OpenAI ---
+
+    def _reply(self, messages: list) -> str:
+        users = [m for m in messages if m.get("role") == "user"]
+        content = users[-1].get("content") if users else ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        text = (content or "").strip()
+        if text in self.replies:
+            return self.replies[text]
+        return " ".join(f"Sure, I can help with that. {text}".split()[:_ECHO_WORDS])
+
+    async def _chat(self, request: web.Request) -> web.StreamResponse:
+        self.requests["chat"] += 1
+        body = await request.json()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        response.force_close()
+        await response.prepare(request)
+        try:
+            await self._stream_reply(response, body)
+        except ConnectionResetError:
+            pass  # the client dropped the stream (an interrupted or discarded generation)
+        return response
+
+    async def _stream_reply(self, response: web.StreamResponse, body: dict):
+        words = self._reply(body.get("messages", [])).split()
+
+        chunk = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                 "created": int(time.time()), "model": body.get("model", "fake")}
+
+        async def send(choices: list, **extra):
+            await response.write(f"data: {json.dumps({**chunk, 'choices': choices, **extra})}\n\n".encode())
+
+        await asyncio.sleep(self.llm_ttft.sample(self.rng))
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_sec)
+            delta = {"role": "assistant", "content": word if i == 0 else f" {word}"}
+            await send([{"index": 0, "delta": delta, "finish_reason": None}])
+        await send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        await send([], usage={"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                              "total_tokens": prompt_tokens + len(words)})
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+
+    async def _speech(self, request: web.Request) -> web.StreamResponse:
+        self.requests["speech"] += 1
+        body = await request.json()
+        words = max(len(body.get("input", "").split()), 1)
+        response = web.StreamResponse(headers={"Content-Type": "audio/pcm"})
+        response.force_close()
+        await response.prepare(request)
+        await asyncio.sleep(self.tts_ttfb.sample(self.rng))
+        frame = bytes(int(_SPEECH_RATE * _FRAME_SECONDS) * 2)
+        try:
+            for _ in range(words):
+                await response.write(frame)
+            await response.write_eof()
+        except ConnectionResetError:
+            pass
+        return response
+
+    # --- Deepgram ---
+
+    def _results(self, text: str, final: bool) -> str:
+        words = text.split()
+        if not final:
+            words = words[:max(len(words) // 2, 1)]
+        return json.dumps({
+            "type": "Results",
+            "is_final": final,
+            "speech_final": final,
+            "start": 0.0,
+            "duration": len(words) * 0.3,
+            "metadata": {"request_id": uuid.uuid4().hex},
+            "channel": {"alternatives": [
+                {"transcript": " ".join(words), "confidence": 0.99, "words": _words_json(words)}
+            ]},
+        })
+
+    async def _listen(self, request: web.Request) -> web.WebSocketResponse:
+        self.requests["listen"] += 1
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.open_streams += 1
+        try:
+            await self._transcribe(ws)
+        finally:
+            self.open_streams -= 1
+        return ws
+
+    async def _transcribe(self, ws: web.WebSocketResponse):
+        turn = 0
+        async for msg in ws:
+            if msg.type == WSMsgType.TEXT:
+                if json.loads(msg.data).get("type") == "CloseStream":
+                    break
+                continue
+            if msg.type != WSMsgType.BINARY:
+                continue
+            samples = array("h", msg.data[:len(msg.data) // 2 * 2])
+            marker = Counter(round(s / _MARKER_STEP) for s in samples).most_common(1)[0][0] if samples else 0
+            if 0 < marker <= len(self.turns) and marker != turn:
+                # Caller started a turn: speech start and a first interim result
+                turn = marker
+                await ws.send_str(json.dumps({"type": "SpeechStarted", "channel": [0], "timestamp": 0.0}))
+                await ws.send_str(self._results(self.turns[turn - 1]["text"], final=False))
+            elif marker == 0 and turn:
+                await asyncio.sleep(self.stt_latency.sample(self.rng))
+                await ws.send_str(self._results(self.turns[turn - 1]["text"], final=True))
+                turn = 0
+        await ws.close()
+
+
+# --- Session audio ---
+
+class CallerAudio(io.AudioInput):
+    """The caller's side of the call: script turns as marker audio, pushed as fast as it is read."""
+
+    def __init__(self, sample_rate: int):
+        super().__init__(label="bench-caller")
+        self.sample_rate = sample_rate
+        self._frames = asyncio.Queue()
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        frame = await self._frames.get()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    def _frame(self, value: int) -> rtc.AudioFrame:
+        n = int(self.sample_rate * _FRAME_SECONDS)
+        return rtc.AudioFrame(array("h", [value]).tobytes() * n, self.sample_rate, 1, n)
+
+    def say(self, turn: int, seconds: float, silence: float = 0.2):
+        """Speak script turn `turn` (1-based) for `seconds`, then go quiet."""
+        for _ in range(max(int(seconds / _FRAME_SECONDS), 1)):
+            self._frames.put_nowait(self._frame(turn * _MARKER_STEP))
+        for _ in range(max(int(silence / _FRAME_SECONDS), 1)):
+            self._frames.put_nowait(self._frame(0))
+
+    def close(self):
+        self._frames.put_nowait(None)
+
+
+class AudioSink(io.AudioOutput):
+    """Agent audio out: every segment "plays" as soon as it is flushed."""
+
+    def __init__(self):
+        super().__init__(label="bench-sink", capabilities=io.AudioOutputCapabilities(pause=False))
+        self._segment = None  # seconds pushed in the current segment
+        self.played = 0.0
+
+    async def capture_frame(self, frame: rtc.AudioFrame):
+        await super().capture_frame(frame)
+        if self._segment is None:
+            self._segment = 0.0
+            self.on_playback_started(created_at=time.time())
+        self._segment += frame.duration
+
+    def flush(self):
+        super().flush()
+        self._finish(interrupted=False)
+
+    def clear_buffer(self):
+        self._finish(interrupted=True)
+
+    def _finish(self, interrupted: bool):
+        if self._segment is None:
+            return
+        position, self._segment = self._segment, None
+        self.played += position
+        self.on_playback_finished(playback_position=position, interrupted=interrupted)
+
+
+class TransportSession(AgentSession):
+    """
+    The real AgentSession with the room's audio swapped for CallerAudio in and AudioSink
+    out. Turns end on the final transcript (no endpointing delay), closing doesn't wait
+    for a last transcript (the caller's last turn is already answered), and
+    `caller_turn()` waits for the agent to answer.
+    """
+
+    def __init__(self, turn_handling: dict = None, **kwargs):
+        turn_handling = dict(turn_handling or {})
+        turn_handling["endpointing"] = {"min_delay": 0.0}
+        super().__init__(turn_handling=turn_handling, session_close_transcript_timeout=0.0, **kwargs)
+        self.caller = None
+        self._answers = 0
+        self._answered = asyncio.Event()
+        self.on("conversation_item_added", self._on_item)
+        self.on("agent_state_changed", self._on_state)
+
+    async def start(self, agent, room=None, room_input_options=None, room_output_options=None, **kwargs):
+        self.caller = CallerAudio(getattr(room_input_options, "audio_sample_rate", None) or 24000)
+        self.input.audio = self.caller
+        self.output.audio = AudioSink()
+        room.session = self
+        await super().start(agent)
+
+    async def aclose(self):
+        if self.caller is not None:
+            self.caller.close()
+        await super().aclose()
+
+    def _on_item(self, ev):
+        if getattr(ev.item, "role", None) == "assistant":
+            self._answers += 1
+            self._answered.set()
+
+    def _on_state(self, ev):
+        if ev.new_state == "listening":
+            self._answered.set()
+
+    async def wait_answer(self, answers: int, timeout: float):
+        """Wait until the agent has said `answers` things in all and is listening again."""
+        async def _wait():
+            while self._answers < answers or self.agent_state != "listening":
+                self._answered.clear()
+                await self._answered.wait()
+        await asyncio.wait_for(_wait(), timeout)
+
+    async def caller_turn(self, turn: int, seconds: float, timeout: float):
+        """Say script turn `turn` (1-based) and wait for the agent's answer."""
+        answers = self._answers + 1
+        self.caller.say(turn, seconds)
+        await self.wait_answer(answers, timeout)
@@ -0,0 +1,188 @@
+"""
+Time-to-first-audio per language for the LLM -> TTS text chunking (text_chunker.py).
+
+Replays LLM token streams through each sentence tokenizer at their recorded timing and
+reports, per language, when the first chunk reaches the TTS and when its audio would
+start (first chunk + TTS first-byte time, which grows with the chunk's length for
+request-per-chunk TTS). Compared: the script-aware chunker the agent uses, the
+framework's blingfire tokenizer (OpenAI / Cartesia default) and its basic tokenizer
+(Sarvam's default). Runs in stream time, so it takes well under a second.
+
+Streams come from a JSON file: recorded ones ("tokens": [[ms since request, text], ...],
+written by --record from the configured LLM) or synthesized ones ("text" with "ttft_ms"
+and "tokens_per_sec", split into LLM-sized tokens; Devanagari splits finer, as real
+tokenizers do).
+
+    python -m bench.ttfa
+    python -m bench.ttfa --first-chars 8 --min-chars 30 --out ttfa.json
+    python -m bench.ttfa --record bench/scripts/llm_streams.json --out recorded_streams.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+from livekit.agents import llm, tokenize
+
+import config
+from bench.latency import percentiles
+from text_chunker import ScriptChunker, spoken_length
+
+DEFAULT_STREAMS = os.path.join(os.path.dirname(__file__), "scripts", "llm_streams.json")
+
+
+# --- Streams ---
+
+def synth_tokens(text: str, ttft_ms: float, tokens_per_sec: float, rng: random.Random) -> list:
+    """[[ms, token], ...] for `text`: words with their leading space, Devanagari in 2-3 letter pieces."""
+    pieces = []
+    for word in re.findall(r"\s*\S+", text):
+        if any("ऀ" <= c <= "ॿ" for c in word):
+            i = 0
+            while i < len(word):
+                step = rng.choice((2, 3))
+                pieces.append(word[i:i + step])
+                i += step
+        else:
+            pieces.append(word)
+    gap = 1000 / tokens_per_sec
+    t = ttft_ms
+    tokens = []
+    for piece in pieces:
+        tokens.append([round(t, 1), piece])
+        t += rng.uniform(0.5, 1.5) * gap
+    return tokens
+
+
+def load_streams(path: str, seed: int) -> list:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    rng = random.Random(seed)
+    streams = []
+    for entry in data["streams"]:
+        tokens = entry.get("tokens") or synth_tokens(
+            entry["text"], entry.get("ttft_ms", 400), entry.get("tokens_per_sec", 50), rng
+        )
+        streams.append({"language": entry["language"], "tokens": tokens})
+    return streams
+
+
+async def record_streams(prompts_path: str, out_path: str):
+    """Ask the configured LLM each stream's prompt and save the token timing."""
+    import agent  # Builds the LLM the agent would use (plugins import on demand)
+
+    with open(prompts_path, encoding="utf-8") as f:
+        entries = json.load(f)["streams"]
+    client = agent._build_llm(None, config)
+    recorded = []
+    for entry in entries:
+        prompt = entry.get("prompt") or entry.get("text")
+        chat_ctx = llm.ChatContext()
+        chat_ctx.add_message(role="system", content=config.SYSTEM_PROMPT)
+        chat_ctx.add_message(role="user", content=prompt)
+        start = time.perf_counter()
+        tokens = []
+        async with client.chat(chat_ctx=chat_ctx) as stream:
+            async for chunk in stream:
+                if chunk.delta and chunk.delta.content:
+                    tokens.append([round((time.perf_counter() - start) * 1000, 1), chunk.delta.content])
+        recorded.append({"language": entry["language"], "prompt": prompt, "tokens": tokens})
+        print(f"{entry['language']}: {len(tokens)} tokens, first at {tokens[0][0] if tokens else '-'} ms", file=sys.stderr)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"streams": recorded}, f, indent=2, ensure_ascii=False)
+
+
+# --- Replay ---
+
+def replay(tokenizer, tokens: list) -> list:
+    """[(ms, chunk), ...]: when each chunk left the tokenizer, in stream time."""
+    stream = tokenizer.stream()
+    chunks = []
+
+    def drain(at_ms):
+        while not stream._event_ch.empty():
+            chunks.append((at_ms, stream._event_ch.recv_nowait().token))
+
+    for at_ms, text in tokens:
+        stream.push_text(text)
+        drain(at_ms)
+    stream.end_input()
+    drain(tokens[-1][0] if tokens else 0.0)
+    return chunks
+
+
+def measure(tokenizer, streams: list, args) -> dict:
+    by_language = {}
+    for s in streams:
+        chunks = replay(tokenizer, s["tokens"])
+        if not chunks:
+            continue
+        first_ms, first = chunks[0]
+        ttfa = first_ms + args.tts_ttfb_ms + args.tts_ms_per_char * spoken_length(first)
+        row = by_language.setdefault(s["language"], {"first_chunk": [], "ttfa": [], "chunks": [], "chars": [], "first_chars": []})
+        row["first_chunk"].append(first_ms)
+        row["ttfa"].append(ttfa)
+        row["chunks"].append(len(chunks))
+        row["chars"] += [spoken_length(c) for _, c in chunks]
+        row["first_chars"].append(spoken_length(first))
+    return {
+        language: {
+            "streams": len(row["ttfa"]),
+            "first_chunk_ms": percentiles(row["first_chunk"]),
+            "ttfa_ms": percentiles(row["ttfa"]),
+            "first_chunk_chars": round(sum(row["first_chars"]) / len(row["first_chars"]), 1),
+            "chunks_per_reply": round(sum(row["chunks"]) / len(row["chunks"]), 1),
+            "mean_chunk_chars": round(sum(row["chars"]) / len(row["chars"]), 1),
+        }
+        for language, row in sorted(by_language.items())
+    }
+
+
+def run(args) -> dict:
+    streams = load_streams(args.streams, args.seed)
+    tokenizers = {
+        "script": ScriptChunker(args.first_chars, args.min_chars, args.max_chars),
+        "blingfire": tokenize.blingfire.SentenceTokenizer(retain_format=True),
+        "basic": tokenize.basic.SentenceTokenizer(),
+    }
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "record")},
+        "tokenizers": {name: measure(t, streams, args) for name, t in tokenizers.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-audio per language for TTS text chunking.")
+    parser.add_argument("--streams", default=DEFAULT_STREAMS, help="JSON file of recorded or synthesized LLM streams")
+    parser.add_argument("--first-chars", type=int, default=config.TTS_FIRST_CHUNK_CHARS)
+    parser.add_argument("--min-chars", type=int, default=config.TTS_MIN_CHUNK_CHARS)
+    parser.add_argument("--max-chars", type=int, default=config.TTS_MAX_CHUNK_CHARS)
+    parser.add_argument("--tts-ttfb-ms", type=float, default=150.0, help="TTS first-byte time for a short chunk")
+    parser.add_argument("--tts-ms-per-char", type=float, default=2.0, help="Extra first-byte time per chunk character")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", help="Record real token streams for these prompts with the configured LLM")
+    parser.add_argument("--out", help="Write the report (or recorded streams) here (default: stdout)")
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.out:
+            parser.error("--record needs --out")
+        asyncio.run(record_streams(args.record, args.out))
+        return
+
+    logging.getLogger().setLevel(logging.WARNING)
+    output = json.dumps(run(args), indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
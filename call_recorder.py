@@ -0,0 +1,366 @@
+import asyncio
+import logging
+import os
+import struct
+import threading
+import time
+import wave
+
+import numpy as np
+from livekit import rtc
+from livekit.agents.voice import io
+
+logger = logging.getLogger("call-recorder")
+
+CALLER, AGENT = 0, 1
+_CHANNELS = ("caller", "agent")
+
+# channel, num_channels (0 = playback-finished marker), sample_rate, timestamp, played seconds, payload bytes
+_HEADER = struct.Struct("<BBIddI")
+_MAX_INPUT_RATE = 48000
+
+
+class _Ring:
+    """
+    Preallocated byte ring. The event loop appends whole records, the writer thread
+    consumes them; the lock only guards the read position and size, never a copy.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._read = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self.high_water = 0
+
+    def _copy_in(self, at: int, data) -> int:
+        n = len(data)
+        first = min(n, self.capacity - at)
+        self._buf[at:at + first] = data[:first]
+        if first < n:
+            self._buf[:n - first] = data[first:]
+        return (at + n) % self.capacity
+
+    def put(self, header: bytes, payload) -> bool:
+        """Append one record (producer side). Returns False when it doesn't fit."""
+        n = len(header) + len(payload)
+        with self._lock:
+            if n > self.capacity - self._size:
+                return False
+            at = (self._read + self._size) % self.capacity
+        # The region past the committed size is ours until _size moves
+        at = self._copy_in(at, header)
+        self._copy_in(at, payload)
+        with self._lock:
+            self._size += n
+            self.high_water = max(self.high_water, self._size)
+        return True
+
+    def available(self) -> int:
+        with self._lock:
+            return self._size
+
+    def take(self, n: int) -> bytes:
+        """Remove and return the next `n` bytes (consumer side; n <= available())."""
+        at = self._read
+        first = min(n, self.capacity - at)
+        data = bytes(self._buf[at:at + first])
+        if first < n:
+            data += bytes(self._buf[:n - first])
+        with self._lock:
+            self._read = (at + n) % self.capacity
+            self._size -= n
+        return data
+
+
+class _WavSink:
+    def __init__(self, path: str, sample_rate: int):
+        self._file = wave.open(path, "wb")
+        self._file.setnchannels(2)
+        self._file.setsampwidth(2)
+        self._file.setframerate(sample_rate)
+
+    def write(self, pcm: np.ndarray):
+        # wave patches the header on every write, so the file is playable mid-call
+        self._file.writeframes(pcm.tobytes())
+
+    def close(self):
+        self._file.close()
+
+
+class _OggSink:
+    """Stereo Opus in Ogg (PyAV, installed with livekit-agents)."""
+
+    def __init__(self, path: str, sample_rate: int):
+        import av
+
+        self._sample_rate = sample_rate
+        self._container = av.open(path, "w", format="ogg")
+        self._stream = self._container.add_stream("libopus", rate=sample_rate)
+        self._stream.layout = "stereo"
+
+    def write(self, pcm: np.ndarray):
+        import av
+
+        frame = av.AudioFrame.from_ndarray(pcm.reshape(1, -1), format="s16", layout="stereo")
+        frame.sample_rate = self._sample_rate
+        for packet in self._stream.encode(frame):
+            self._container.mux(packet)
+
+    def close(self):
+        for packet in self._stream.encode(None):
+            self._container.mux(packet)
+        self._container.close()
+
+
+_SINKS = {"wav": _WavSink, "ogg": _OggSink}
+
+
+class _CallerTap(io.AudioInput):
+    def __init__(self, recorder: "CallRecorder", source: io.AudioInput):
+        super().__init__(label="CallRecorder", source=source)
+        self._recorder = recorder
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        frame = await super().__anext__()
+        self._recorder.push(CALLER, frame)
+        return frame
+
+
+class _AgentTap(io.AudioOutput):
+    def __init__(self, recorder: "CallRecorder", output: io.AudioOutput):
+        super().__init__(
+            label="CallRecorder",
+            next_in_chain=output,
+            capabilities=io.AudioOutputCapabilities(pause=True),
+        )
+        self._recorder = recorder
+
+    @property
+    def sample_rate(self):
+        return self.next_in_chain.sample_rate if self.next_in_chain else None
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await self.next_in_chain.capture_frame(frame)
+        await super().capture_frame(frame)
+        self._recorder.push(AGENT, frame)
+
+    def flush(self) -> None:
+        super().flush()
+        self.next_in_chain.flush()
+
+    def clear_buffer(self) -> None:
+        self.next_in_chain.clear_buffer()
+
+    def on_playback_finished(self, *, playback_position: float, interrupted: bool,
+                             synchronized_transcript: str = None) -> None:
+        super().on_playback_finished(
+            playback_position=playback_position,
+            interrupted=interrupted,
+            synchronized_transcript=synchronized_transcript,
+        )
+        # Interrupted replies were captured further than they played; cut them there
+        self._recorder.mark_played(playback_position if interrupted else -1.0)
+
+
+class CallRecorder:
+    """
+    Stereo call recording (left: caller, right: agent) written to local disk.
+
+    Frames are copied into a preallocated ring buffer on the event loop - nothing else
+    happens there. A writer thread resamples, lines both sides up on the call timeline
+    and appends `chunk_seconds` chunks to a WAV or Ogg/Opus file, so memory per call is
+    bounded by the ring (`buffer_seconds`) plus about two chunks. When the ring is full
+    (disk stalled) frames are dropped and counted rather than blocking live audio.
+    """
+
+    def __init__(self, path: str, fmt: str = "wav", sample_rate: int = 16000,
+                 buffer_seconds: float = 5.0, chunk_seconds: float = 5.0):
+        if fmt not in _SINKS:
+            raise ValueError(f"Unsupported recording format: {fmt}")
+        self.path = path
+        self.format = fmt
+        self.sample_rate = sample_rate
+        self.frames = [0, 0]
+        self.dropped = [0, 0]
+        self.error = None
+        self._ring = _Ring(int(buffer_seconds * _MAX_INPUT_RATE * 2 * len(_CHANNELS)))
+        self._chunk = max(1, int(chunk_seconds * sample_rate))
+        self._poll = 0.1
+        self._stop = threading.Event()
+        self._thread = None
+        self._closed = False
+        self._t0 = None
+
+        # Writer-thread state
+        self._window = np.zeros((self._chunk, 2), dtype=np.int16)
+        self._window_start = 0
+        self._pending = []  # (channel, position, samples) past the current chunk
+        self._pending_samples = 0
+        self._max_pending = self._chunk + 2 * sample_rate  # write slack + agent lead
+        self._cursor = [0, 0]
+        self._segment_start = None
+        self._resamplers = {}
+        self._resync = sample_rate // 5
+        self._sink = None
+        self._written_samples = 0
+        self._write_seconds = 0.0
+
+    def attach(self, session):
+        """Tap the session's audio (call after session.start) and start the writer thread."""
+        if session.input.audio is not None:
+            session.input.audio = _CallerTap(self, session.input.audio)
+        if session.output.audio is not None:
+            session.output.audio = _AgentTap(self, session.output.audio)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._t0 = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="call-recorder", daemon=True)
+        self._thread.start()
+        logger.info(f"Recording call to {self.path}")
+
+    # --- Event loop side ---
+
+    def push(self, channel: int, frame: rtc.AudioFrame):
+        if self._closed or self._t0 is None:
+            return
+        data = memoryview(frame.data).cast("B")
+        header = _HEADER.pack(channel, frame.num_channels, frame.sample_rate, time.monotonic(), 0.0, len(data))
+        self.frames[channel] += 1
+        if not self._ring.put(header, data):
+            self.dropped[channel] += 1
+
+    def mark_played(self, position: float):
+        if self._closed or self._t0 is None:
+            return
+        self._ring.put(_HEADER.pack(AGENT, 0, 0, time.monotonic(), position, 0), b"")
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._stop.set()
+            await asyncio.to_thread(self._thread.join)
+
+    # --- Writer thread ---
+
+    def _run(self):
+        try:
+            self._sink = _SINKS[self.format](self.path, self.sample_rate)
+            while True:
+                stopping = self._stop.wait(self._poll)
+                self._drain()
+                if stopping:
+                    break
+                # Caller audio arrives up to a frame late; keep a second of slack before writing
+                now = int((time.monotonic() - self._t0) * self.sample_rate)
+                while now - self.sample_rate >= self._window_start + self._chunk:
+                    self._write_chunk()
+            end = max(self._cursor)
+            while self._window_start < end:
+                self._write_chunk(limit=end - self._window_start)
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Recording failed: {e}")
+        finally:
+            if self._sink is not None:
+                self._sink.close()
+
+    def _drain(self):
+        while self._ring.available() >= _HEADER.size:
+            channel, num_channels, rate, ts, played, size = _HEADER.unpack(self._ring.take(_HEADER.size))
+            payload = self._ring.take(size) if size else b""
+            if num_channels == 0:
+                self._truncate(played)
+            else:
+                self._add(channel, num_channels, rate, ts, payload)
+
+    def _add(self, channel: int, num_channels: int, rate: int, ts: float, payload: bytes):
+        pcm = np.frombuffer(payload, dtype=np.int16)
+        if num_channels > 1:
+            pcm = pcm.reshape(-1, num_channels).mean(axis=1).astype(np.int16)
+        if rate != self.sample_rate:
+            pcm = self._resample(channel, rate, pcm)
+        if not len(pcm):
+            return
+
+        # Back-to-back frames stay contiguous; after a gap (silence, new reply) jump to the clock
+        at = int((ts - self._t0) * self.sample_rate)
+        pos = self._cursor[channel] if at < self._cursor[channel] + self._resync else at
+        if channel == AGENT and self._segment_start is None:
+            self._segment_start = pos
+        if not self._place(channel, pos, pcm):
+            self.dropped[channel] += 1
+        self._cursor[channel] = pos + len(pcm)
+
+    def _resample(self, channel: int, rate: int, pcm: np.ndarray) -> np.ndarray:
+        resampler = self._resamplers.get((channel, rate))
+        if resampler is None:
+            resampler = self._resamplers[(channel, rate)] = rtc.AudioResampler(rate, self.sample_rate, num_channels=1)
+        frame = rtc.AudioFrame(pcm.tobytes(), rate, 1, len(pcm))
+        out = [np.frombuffer(f.data, dtype=np.int16) for f in resampler.push(frame)]
+        return np.concatenate(out) if out else pcm[:0]
+
+    def _place(self, channel: int, pos: int, pcm: np.ndarray) -> bool:
+        start, end = self._window_start, self._window_start + self._chunk
+        lo, hi = max(pos, start), min(pos + len(pcm), end)
+        if hi > lo:
+            self._window[lo - start:hi - start, channel] = pcm[lo - pos:hi - pos]
+        if pos + len(pcm) > end:
+            tail_at = max(pos, end)
+            tail = pcm[tail_at - pos:]
+            if self._pending_samples + len(tail) > self._max_pending:
+                return False
+            self._pending.append((channel, tail_at, tail.copy()))
+            self._pending_samples += len(tail)
+        return True
+
+    def _truncate(self, played: float):
+        if self._segment_start is not None and played >= 0:
+            cut = self._segment_start + int(played * self.sample_rate)
+            if cut < self._cursor[AGENT]:
+                start = self._window_start
+                if cut < start + self._chunk:
+                    self._window[max(cut - start, 0):, AGENT] = 0
+                pending = []
+                for channel, pos, pcm in self._pending:
+                    if channel == AGENT and pos + len(pcm) > cut:
+                        pcm = pcm[:max(cut - pos, 0)]
+                    if len(pcm):
+                        pending.append((channel, pos, pcm))
+                self._pending = pending
+                self._pending_samples = sum(len(p) for _, _, p in pending)
+                self._cursor[AGENT] = cut
+        self._segment_start = None
+
+    def _write_chunk(self, limit: int = None):
+        pcm = self._window if limit is None or limit >= self._chunk else self._window[:limit]
+        started = time.perf_counter()
+        self._sink.write(pcm)
+        self._write_seconds += time.perf_counter() - started
+        self._written_samples += len(pcm)
+
+        self._window_start += self._chunk
+        self._window[:] = 0
+        pending, self._pending, self._pending_samples = self._pending, [], 0
+        for channel, pos, samples in pending:
+            self._place(channel, pos, samples)
+
+    # --- Reporting ---
+
+    def summary(self) -> dict:
+        """Recording stats for the transcript payload (call after aclose())."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {
+            "path": self.path,
+            "format": self.format,
+            "seconds": round(self._written_samples / self.sample_rate, 1),
+            "bytes": size,
+            "frames": dict(zip(_CHANNELS, self.frames)),
+            "dropped_frames": dict(zip(_CHANNELS, self.dropped)),
+            "buffer_high_water": round(self._ring.high_water / self._ring.capacity, 3),
+            "write_ms": round(self._write_seconds * 1000, 1),
+            "write_mb_s": round(size / self._write_seconds / 1e6, 2) if self._write_seconds else 0.0,
+            "error": self.error,
+        }
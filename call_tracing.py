@@ -0,0 +1,184 @@
+import atexit
+import base64
+import contextlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from google.protobuf import json_format
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import NoOpTracerProvider, Status, StatusCode, set_span_in_context
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+logger = logging.getLogger("call-tracing")
+
+_propagator = TraceContextTextMapPropagator()
+
+
+class OTLPFileExporter(SpanExporter):
+    """
+    Appends spans to a local file as OTLP/JSON lines (one ExportTraceServiceRequest per
+    line, the format of the OpenTelemetry Collector's file exporter / otlpjsonfile receiver).
+    Runs on the BatchSpanProcessor's thread, never on the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> SpanExportResult:
+        line = json.dumps(_hex_ids(json_format.MessageToDict(encode_spans(spans))), separators=(",", ":"))
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write spans to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def _hex_ids(value):
+    """OTLP/JSON writes trace and span ids as hex, not protobuf JSON's base64."""
+    if isinstance(value, dict):
+        return {
+            k: base64.b64decode(v).hex() if k in ("traceId", "spanId", "parentSpanId") and v else _hex_ids(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_hex_ids(v) for v in value]
+    return value
+
+
+def new_tracer_provider(trace_dir: str, service: str) -> TracerProvider:
+    """
+    Process-wide tracer provider writing to <trace_dir>/spans-<pid>.jsonl in the background.
+    Kept separate from the global OpenTelemetry provider the framework may use.
+    """
+    provider = TracerProvider(resource=Resource.create({"service.name": service}))
+    path = os.path.join(trace_dir, f"spans-{os.getpid()}.jsonl")
+    provider.add_span_processor(BatchSpanProcessor(OTLPFileExporter(path), schedule_delay_millis=2000))
+    return provider
+
+
+@contextlib.contextmanager
+def dispatch_span(tracer, room_name: str, metadata: dict):
+    """
+    Span around dispatching one call (make_call.py). Stamps `dispatched_at` and the
+    W3C `traceparent` into the dispatch metadata, so the agent's spans join the trace.
+    Build the metadata JSON inside the block.
+    """
+    metadata["dispatched_at"] = time.time()
+    if tracer is None:
+        yield None
+        return
+    attributes = {"room.name": room_name}
+    if metadata.get("call_id"):
+        attributes["call.id"] = str(metadata["call_id"])
+    with tracer.start_as_current_span("dispatch", attributes=attributes) as span:
+        _propagator.inject(metadata)
+        yield span
+
+
+class CallTrace:
+    """
+    Setup spans for one call, from dispatch to the first greeting, under one "call" span
+    carrying call_id and the room name. Joins the dispatcher's trace when the metadata
+    has a `traceparent`; `dispatched_at` (epoch seconds) adds a "job_assignment" span for
+    the time between dispatch and this job starting (across hosts, so clock skew applies).
+    """
+
+    def __init__(self, provider: TracerProvider, room_name: str, metadata: dict = None, job_start_ns: int = None):
+        metadata = metadata or {}
+        # Without a provider (tracing disabled) every span is a no-op; stage timings are still kept
+        self._tracer = (provider or NoOpTracerProvider()).get_tracer("outbound-agent")
+        self.stages = {}
+        now_ns = job_start_ns or time.time_ns()
+        parent = _propagator.extract(metadata) if metadata.get("traceparent") else None
+        attributes = {"room.name": room_name}
+        if metadata.get("call_id"):
+            attributes["call.id"] = str(metadata["call_id"])
+        if metadata.get("phone_number"):
+            attributes["call.phone_number"] = str(metadata["phone_number"])
+
+        dispatched_ns = None
+        try:
+            if metadata.get("dispatched_at"):
+                dispatched_ns = min(int(float(metadata["dispatched_at"]) * 1e9), now_ns)
+        except (TypeError, ValueError):
+            pass
+
+        self._root = self._tracer.start_span("call", context=parent, attributes=attributes,
+                                             start_time=dispatched_ns or now_ns)
+        self._context = set_span_in_context(self._root)
+        trace_id = self._root.get_span_context().trace_id
+        self.trace_id = format(trace_id, "032x") if trace_id else None
+        if dispatched_ns is not None:
+            self.record("job_assignment", dispatched_ns, now_ns)
+
+    def record(self, name: str, start_ns: int, end_ns: int = None, **attributes):
+        """A stage whose start (and end) already happened, in time.time_ns() units."""
+        end_ns = end_ns or time.time_ns()
+        span = self._tracer.start_span(name, context=self._context, attributes=attributes, start_time=start_ns)
+        span.end(end_time=end_ns)
+        self.stages[name] = round((end_ns - start_ns) / 1e6, 1)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **attributes):
+        """Time a setup stage as a child span of the call; exceptions are recorded and re-raised."""
+        start = time.perf_counter()
+        with self._tracer.start_as_current_span(name, context=self._context, attributes=attributes,
+                                                record_exception=True, set_status_on_exception=True) as span:
+            try:
+                yield span
+            finally:
+                self.stages[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def end(self, **attributes):
+        if not self._root.is_recording():
+            return
+        self._root.set_attributes({k: v for k, v in attributes.items() if v is not None})
+        if attributes.get("status") not in (None, "COMPLETED", "VOICEMAIL"):
+            self._root.set_status(Status(StatusCode.ERROR, str(attributes["status"])))
+        self._root.end()
+
+    def summary(self) -> dict:
+        """Trace id and stage durations (ms) for the transcript payload."""
+        return {"trace_id": self.trace_id, "stages_ms": dict(self.stages)}
+
+
+_log_listener = None
+
+
+def use_queue_logging():
+    """
+    Put the root logger's handlers (as the CLI set them up) behind a QueueHandler, so a
+    log call only enqueues the record and a listener thread does the formatting and I/O.
+    Adds no handler of its own; handlers attached since an earlier call join the listener.
+    """
+    global _log_listener
+    root = logging.getLogger()
+    handlers = [h for h in root.handlers if not isinstance(h, QueueHandler)]
+    if not handlers:
+        return
+    for handler in handlers:
+        root.removeHandler(handler)
+    if _log_listener is not None:
+        _log_listener.handlers += tuple(handlers)
+        return
+    log_queue = queue.SimpleQueue()
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    root.addHandler(QueueHandler(log_queue))
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
@@ -0,0 +1,89 @@
+import json
+import logging
+import time
+
+logger = logging.getLogger("call-transcript")
+
+# Tool arguments / outputs are kept short: the transcript records what happened, not payloads
+TOOL_TEXT_CHARS = 200
+
+
+def _clip(value, limit: int = TOOL_TEXT_CHARS) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class CallTranscript:
+    """
+    Structured transcript of one call, built from the session's conversation events.
+
+    One entry per turn: role ("user" / "assistant"), text, start and end in seconds from
+    the answer (from speech timestamps where the session has them, otherwise when the
+    message was committed), whether the agent was interrupted, and the tool calls the
+    agent made before speaking. Flags and empty fields are left out to keep it compact.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.answered_at = None
+        self._turns = []
+        self._tools = []  # tool calls waiting for the assistant message they led to
+
+    def attach(self, session):
+        session.on("conversation_item_added", self._on_item)
+        session.on("function_tools_executed", self._on_tools)
+
+    def answered(self):
+        if self.answered_at is None:
+            self.answered_at = time.time()
+
+    def _on_item(self, ev):
+        item = ev.item
+        if getattr(item, "type", None) != "message" or item.role not in ("user", "assistant"):
+            return
+        text = (item.text_content or "").strip()
+        if not text:
+            return
+        timing = item.metrics or {}
+        turn = {
+            "role": item.role,
+            "text": text,
+            "start": timing.get("started_speaking_at") or item.created_at,
+            "end": timing.get("stopped_speaking_at") or ev.created_at,
+        }
+        if item.interrupted:
+            turn["interrupted"] = True
+        if item.role == "assistant" and self._tools:
+            turn["tools"], self._tools = self._tools, []
+        self._turns.append(turn)
+
+    def _on_tools(self, ev):
+        for call, output in zip(ev.function_calls, ev.function_call_outputs):
+            tool = {"name": call.name, "args": _clip(call.arguments)}
+            if output is not None:
+                tool["output"] = _clip(output.output)
+                if output.is_error:
+                    tool["error"] = True
+            self._tools.append(tool)
+
+    def turns(self) -> list:
+        """Turns with times in seconds from the answer (from job start if never answered)."""
+        origin = self.answered_at or self.started_at
+        turns = [dict(t) for t in self._turns]
+        if self._tools:
+            # Tools run at the end of the call (e.g. a transfer) with no reply after them
+            turns.append({"role": "assistant", "text": "", "start": time.time(), "end": time.time(), "tools": self._tools})
+        for turn in turns:
+            turn["start"] = round(max(turn["start"] - origin, 0.0), 2)
+            turn["end"] = round(max(turn["end"] - origin, turn["start"]), 2)
+        return turns
+
+    def text(self) -> str:
+        """Plain "role: text" transcript (the Call.transcript column)."""
+        return "\n".join(f"{t['role']}: {t['text']}" for t in self._turns)
+
+    def duration(self) -> int:
+        """Seconds from the answer to now (0 if the call was never answered)."""
+        if self.answered_at is None:
+            return 0
+        return round(time.time() - self.answered_at)
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from livekit import api, rtc
+
+from trunk_pool import dial_outcome, sip_status
+
+logger = logging.getLogger("call-transfer")
+
+MODES = ("warm", "blind")
+
+# What the agent tells the caller when the destination didn't pick up
+_FAILURE_REASONS = {
+    "NO_ANSWER": "didn't answer",
+    "BUSY": "is busy",
+    "REJECTED": "declined the call",
+}
+
+
+def resolve(destination: str, sip_domain: str = None) -> dict:
+    """
+    Both forms of a transfer destination: the number (or SIP user) to dial out to for a
+    warm transfer, and the sip:/tel: URI a blind transfer REFERs the caller to.
+    """
+    number = destination.strip()
+    for prefix in ("sip:", "tel:"):
+        if number.startswith(prefix):
+            number = number[len(prefix):]
+    if "@" in destination:
+        uri = destination if destination.startswith("sip:") else f"sip:{destination}"
+        number = number.split("@", 1)[0]
+    elif sip_domain:
+        uri = f"sip:{number}@{sip_domain}"
+    else:
+        uri = destination if destination.startswith(("tel:", "sip:")) else f"tel:{destination}"
+    return {"number": number, "uri": uri}
+
+
+class CallTransfer:
+    """
+    Hands one call over to a person: the transfer_call tool.
+
+    "blind" (TRANSFER_MODE) REFERs the caller to the destination: they hear silence while
+    it rings, and the call is lost if nobody answers. "warm" dials the destination into
+    the call's room through the trunk pool while the agent tells the caller to hold;
+    SIP participants only publish audio once answered, so caller and destination are
+    bridged the moment it picks up, and the agent then announces the hand-off and stops
+    talking. The job (and both trunk channels it holds) lasts until one side hangs up.
+    On no answer, busy or a failed dial the agent stays on and tells the caller.
+
+    The default destination and the caller's identity are resolved when the call
+    starts, and prepare() lists the trunks, so a transfer only has to dial. Every
+    attempt is timed (request -> agent out of the call) and counted by outcome in the
+    process-wide histograms, which gives completion time and success rate per mode.
+    """
+
+    def __init__(self, ctx, caller_phone: str = None, cfg=None, trunk_pool=None, histograms=None):
+        self.ctx = ctx
+        self.cfg = cfg
+        self.trunk_pool = trunk_pool
+        self.histograms = histograms
+        self.mode = cfg.TRANSFER_MODE if cfg.TRANSFER_MODE in MODES else "warm"
+        self.session = None
+        self.attempts = []
+        self.transferred = False
+        self._destinations = {}
+        self._default = None
+        if cfg.DEFAULT_TRANSFER_NUMBER:
+            self._default = self._destination(cfg.DEFAULT_TRANSFER_NUMBER)
+        self._task = None
+        self._leg = None  # (participant identity, trunk) of the warm transfer's outbound leg
+
+        # Outbound calls know their SIP participant up front; inbound ones wait for it to join
+        self.caller_identity = f"sip_{caller_phone}" if caller_phone else None
+        if self.caller_identity is None:
+            for p in ctx.room.remote_participants.values():
+                self._on_participant(p)
+            ctx.room.on("participant_connected", self._on_participant)
+
+    def _on_participant(self, participant: rtc.RemoteParticipant):
+        if self.caller_identity is None and not participant.identity.startswith("transfer_"):
+            self.caller_identity = participant.identity
+
+    def _destination(self, destination: str) -> dict:
+        target = self._destinations.get(destination)
+        if target is None:
+            target = self._destinations[destination] = resolve(destination, self.cfg.SIP_DOMAIN)
+        return target
+
+    def prepare(self):
+        """Set up the trunks a warm transfer dials out on."""
+        if self.mode == "warm" and self.trunk_pool is not None:
+            self.trunk_pool.load(
+                self.ctx.api,
+                only_ids=[t.strip() for t in self.cfg.SIP_TRUNK_IDS.split(",") if t.strip()],
+                fallback_id=self.cfg.SIP_TRUNK_ID,
+            )
+
+    def attach(self, session):
+        self.session = session
+
+    async def transfer(self, destination: str = None) -> str:
+        """Start a transfer; returns the tool result for the LLM."""
+        target = self._destination(destination) if destination else self._default
+        if target is None:
+            return "Error: No default transfer number configured."
+        if self._task is not None and not self._task.done():
+            return "A transfer is already ringing. Ask the caller to keep holding."
+        if self.transferred:
+            return "The call has already been transferred."
+        if self.caller_identity is None:
+            logger.error("Could not determine participant identity for transfer")
+            return "Failed to transfer: could not identify the caller."
+
+        attempt = {"mode": self.mode, "destination": target["number"], "outcome": None,
+                   "ring_ms": None, "completion_ms": None}
+        self.attempts.append(attempt)
+        start = time.perf_counter()
+        if self.mode == "blind":
+            return await self._blind(target, attempt, start)
+
+        logger.info(f"Warm transfer of {self.caller_identity} to {target['number']}")
+        self._task = asyncio.create_task(self._warm(target, attempt, start))
+        return (
+            f"Calling {target['number']} now. Tell the caller in one short sentence that you're "
+            "connecting them and to stay on the line. They are connected automatically when it's answered."
+        )
+
+    # --- Blind ---
+
+    async def _blind(self, target: dict, attempt: dict, start: float) -> str:
+        logger.info(f"Transferring participant {self.caller_identity} to {target['uri']}")
+        try:
+            await self.ctx.api.sip.transfer_sip_participant(
+                api.TransferSIPParticipantRequest(
+                    room_name=self.ctx.room.name,
+                    participant_identity=self.caller_identity,
+                    transfer_to=target["uri"],
+                    play_dialtone=False,
+                )
+            )
+        except Exception as e:
+            logger.error(f"Transfer failed: {e}")
+            self._record(attempt, dial_outcome(e), start)
+            return f"Error executing transfer: {e}"
+        self.transferred = True
+        self._record(attempt, "TRANSFERRED", start)
+        return "Transfer initiated successfully."
+
+    # --- Warm ---
+
+    async def _warm(self, target: dict, attempt: dict, start: float):
+        identity = f"transfer_{len(self.attempts)}"
+        try:
+            if self.trunk_pool is None:
+                raise RuntimeError("No SIP trunk pool for the transfer leg")
+            trunk_id = await asyncio.wait_for(self.trunk_pool.dial(
+                self.ctx.api.sip,
+                lambda trunk_id: api.CreateSIPParticipantRequest(
+                    room_name=self.ctx.room.name,
+                    sip_trunk_id=trunk_id,
+                    sip_call_to=target["number"],
+                    participant_identity=identity,
+                    participant_name="Transfer",
+                    wait_until_answered=True,
+                    ringing_timeout=timedelta(seconds=self.cfg.TRANSFER_RING_TIMEOUT),
+                ),
+            ), timeout=self.cfg.TRANSFER_RING_TIMEOUT + self.cfg.DIAL_GRACE)
+        except asyncio.CancelledError:
+            await self._hang_up(identity)
+            self._record(attempt, "CANCELLED", start)
+            raise
+        except Exception as e:
+            attempt["ring_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            outcome = dial_outcome(e)
+            logger.warning(f"Transfer to {target['number']} not connected: {outcome} (SIP {sip_status(e) or '?'}: {e})")
+            await self._hang_up(identity)
+            self._record(attempt, outcome, start)
+            self._fall_back(target, outcome)
+            return
+
+        # Answered: the destination already hears the caller. Stop the hold message, announce, leave.
+        attempt["ring_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self._leg = (identity, trunk_id)
+        self.transferred = True
+        logger.info(f"Transfer to {target['number']} answered after {attempt['ring_ms']:.0f} ms; handing off")
+        try:
+            if self.session is not None:
+                self.session.interrupt(force=True)
+                if self.cfg.TRANSFER_ANNOUNCEMENT:
+                    await self.session.say(self.cfg.TRANSFER_ANNOUNCEMENT, allow_interruptions=False)
+        except Exception as e:
+            logger.warning(f"Transfer announcement failed: {e}")
+        self._record(attempt, "TRANSFERRED", start)
+        # The agent is done, but the bridged call still runs over both trunk channels, which
+        # are released when the job ends: keep the job until one side hangs up
+        if self.session is not None:
+            await self.session.aclose()
+        await self._bridged(identity)
+        self.ctx.shutdown(reason="TRANSFERRED")
+
+    async def _bridged(self, identity: str):
+        """Wait until the caller or the destination leaves the room, then hang up on the other."""
+        legs = {self.caller_identity, identity}
+        left = asyncio.Event()
+
+        def on_disconnected(participant: rtc.RemoteParticipant):
+            if participant.identity in legs:
+                left.set()
+
+        self.ctx.room.on("participant_disconnected", on_disconnected)
+        try:
+            if not legs <= set(self.ctx.room.remote_participants):
+                left.set()
+            await left.wait()
+        finally:
+            self.ctx.room.off("participant_disconnected", on_disconnected)
+        logger.info("Transferred call ended")
+        for leg in legs & set(self.ctx.room.remote_participants):
+            await self._hang_up(leg)
+
+    def _fall_back(self, target: dict, outcome: str):
+        """The destination didn't pick up: the agent carries on with the caller."""
+        if self.session is None:
+            return
+        reason = _FAILURE_REASONS.get(outcome, "couldn't be reached")
+        self.session.generate_reply(instructions=(
+            f"The transfer didn't go through: {target['number']} {reason}. Tell the caller briefly, "
+            "then offer to help them yourself or to take a message."
+        ))
+
+    async def _hang_up(self, identity: str):
+        """Drop a participant: a transfer leg still ringing, or what is left of a bridged call."""
+        try:
+            await self.ctx.api.room.remove_participant(
+                api.RoomParticipantIdentity(room=self.ctx.room.name, identity=identity)
+            )
+        except Exception:
+            pass  # Already gone: the dial failed before it reached the room
+
+    async def aclose(self):
+        """At shutdown: stop a transfer still ringing or bridged, and free the transfer leg's trunk channel."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._leg is not None:
+            await asyncio.to_thread(self.trunk_pool.release, self._leg[1])
+            self._leg = None
+
+    # --- Metrics ---
+
+    def _record(self, attempt: dict, outcome: str, start: float):
+        attempt["outcome"] = outcome
+        attempt["completion_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        if self.histograms is None:
+            return
+        self.histograms.count(outcome, "transfer", attempt["mode"])
+        if outcome == "TRANSFERRED":
+            self.histograms.observe("transfer_completion", attempt["mode"], attempt["completion_ms"])
+        self.histograms.dump_soon()
+
+    def summary(self) -> dict:
+        """Transfer attempts for the transcript payload (None if the call wasn't transferred)."""
+        if not self.attempts:
+            return None
+        done = [a["completion_ms"] for a in self.attempts if a["outcome"] == "TRANSFERRED"]
+        return {
+            "mode": self.mode,
+            "transferred": self.transferred,
+            "completion_ms": done[-1] if done else None,
+            "attempts": self.attempts,
+        }
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+
+from livekit.agents import llm, metrics
+
+logger = logging.getLogger("chat-compaction")
+
+_SUMMARY_PROMPT = (
+    "You maintain a running summary of a phone call between an assistant and a caller. "
+    "Update the summary with the new turns. Keep names, numbers, dates, the caller's requests, "
+    "answers already given, promises made and anything still unresolved. "
+    "Write plain sentences, at most {max_words} words. Reply with the summary only."
+)
+
+
+def estimate_tokens(item) -> int:
+    """Rough token count of a chat item (~4 characters per token, plus per-item overhead)."""
+    if item.type == "message":
+        text = item.text_content or ""
+    elif item.type == "function_call":
+        text = f"{item.name} {item.arguments}"
+    elif item.type == "function_call_output":
+        text = item.output or ""
+    else:
+        text = ""
+    return len(text) // 4 + 4
+
+
+def _line(item) -> str:
+    if item.type == "message":
+        return f"{item.role}: {item.text_content or ''}"
+    if item.type == "function_call":
+        return f"(looked up {item.name} {item.arguments})"
+    if item.type == "function_call_output":
+        return f"({item.name} result: {item.output})"
+    return ""
+
+
+class ChatCompactor:
+    """
+    Token-budgeted view of the chat history for one call.
+
+    The LLM gets the system instructions, a running summary of older turns and the most
+    recent turns that fit in `max_tokens` (at least `min_recent` items). Turns that fall
+    out of the window are folded into the summary by a background LLM call, so the prompt
+    stops growing with call length; until a fold finishes those turns are still sent in
+    full. The latest result of each tool stays in the window after its turn scrolls out,
+    since later answers usually depend on it (account details, availability...).
+    """
+
+    def __init__(self, llm_client, max_tokens: int = 2000, min_recent: int = 6, summary_words: int = 150):
+        self.llm_client = llm_client
+        self.max_tokens = max_tokens
+        self.min_recent = min_recent
+        self.summary_words = summary_words
+        self.running_summary = ""
+        self.prompt_tokens = []
+        self.folds = 0
+        self._folded_ids = set()
+        self._task = None
+
+    def attach(self, session):
+        session.on("metrics_collected", self._on_metrics)
+
+    def _on_metrics(self, ev):
+        m = ev.metrics
+        if isinstance(m, metrics.LLMMetrics) and m.prompt_tokens:
+            self.prompt_tokens.append(m.prompt_tokens)
+
+    # --- Window ---
+
+    def window(self, chat_ctx: llm.ChatContext) -> llm.ChatContext:
+        """Return the compacted context for this LLM request (never blocks on summarizing)."""
+        items = chat_ctx.items
+        history = [i for i in items if i.type in ("message", "function_call", "function_call_output")
+                   and not (i.type == "message" and i.role in ("system", "developer"))]
+
+        keep_from, used = len(history), 0
+        for idx in range(len(history) - 1, -1, -1):
+            cost = estimate_tokens(history[idx])
+            if used + cost > self.max_tokens and len(history) - idx > self.min_recent:
+                break
+            used += cost
+            keep_from = idx
+        # Don't separate a tool output from the call that produced it
+        while 0 < keep_from < len(history) and history[keep_from].type == "function_call_output":
+            keep_from -= 1
+
+        older = history[:keep_from]
+        if not older:
+            return chat_ctx
+
+        pending = [i for i in older if i.id not in self._folded_ids]
+        if pending and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._fold(pending))
+
+        # Latest call + output of each tool, even once its turn has scrolled out
+        latest_call = {}
+        for item in older:
+            if item.type == "function_call":
+                latest_call[item.name] = item.call_id
+        pinned_calls = set(latest_call.values())
+
+        drop = {
+            i.id for i in older
+            if i.id in self._folded_ids and not (i.type != "message" and i.call_id in pinned_calls)
+        }
+        kept = [i for i in items if i.id not in drop]
+        if self.running_summary:
+            summary = llm.ChatMessage(role="system", content=[f"Summary of the call so far: {self.running_summary}"])
+            insert_at = next((n for n, i in enumerate(kept)
+                              if not (i.type == "message" and i.role in ("system", "developer"))), len(kept))
+            kept.insert(insert_at, summary)
+        return llm.ChatContext(kept)
+
+    # --- Background summary ---
+
+    async def _fold(self, items: list):
+        start = time.perf_counter()
+        transcript = "\n".join(line for line in (_line(i) for i in items) if line)
+        chat_ctx = llm.ChatContext()
+        chat_ctx.add_message(role="system", content=_SUMMARY_PROMPT.format(max_words=self.summary_words))
+        chat_ctx.add_message(
+            role="user",
+            content=f"Current summary:\n{self.running_summary or '(none)'}\n\nNew turns:\n{transcript}",
+        )
+        try:
+            parts = []
+            async with self.llm_client.chat(chat_ctx=chat_ctx) as stream:
+                async for chunk in stream:
+                    if chunk.delta and chunk.delta.content:
+                        parts.append(chunk.delta.content)
+        except Exception as e:
+            # Items stay in the window in full; the next turn retries
+            logger.warning(f"Could not summarize older turns: {e}")
+            return
+        summary = "".join(parts).strip()
+        if summary:
+            self.running_summary = summary
+            self._folded_ids.update(i.id for i in items)
+            self.folds += 1
+            logger.info(f"Folded {len(items)} items into the summary in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def summary(self) -> dict:
+        """Prompt tokens per LLM request, for the transcript payload."""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "max_prompt_tokens": max(self.prompt_tokens, default=0),
+            "folds": self.folds,
+            "summarized_items": len(self._folded_ids),
+        }
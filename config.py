@@ -35,6 +35,24 @@ INITIAL_GREETING = "The user has picked up the call. Introduce yourself as the S
 fallback_greeting = "Greet the user immediately."
 WEB_GREETING = "Hello! I am the AI Assistant. How can I help you today?"
 
+# Left on answering machines when AMD_ACTION = "message" (pre-rendered while the phone rings).
+VOICEMAIL_MESSAGE = "Hello, this is the receptionist from Rapid X High School returning your enquiry. Please call us back at your convenience. Thank you!"
+
+# Greeting audio is rendered once per (voice, text) and replayed from cache on pickup.
+GREETING_CACHE_ENABLED = os.getenv("GREETING_CACHE_ENABLED", "true").lower() == "true"
+GREETING_CACHE_DIR = os.getenv("GREETING_CACHE_DIR", ".cache/greetings")
+GREETING_CACHE_MAX_MB = int(os.getenv("GREETING_CACHE_MAX_MB", "50"))
+
+# Repeated FAQ turns (admissions, fees, timings) are answered from cache, skipping LLM + TTS.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_FAQ_PATH = os.getenv("ANSWER_CACHE_FAQ_PATH", "faq.json")  # for SYSTEM_PROMPT calls only; see faq.example.json
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.8"))  # question similarity (0-1)
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))  # seconds, for learned answers
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+# Also learn from live calls (tool-free LLM answers). Off by default: answers can depend on context.
+ANSWER_CACHE_LEARN = os.getenv("ANSWER_CACHE_LEARN", "false").lower() == "true"
+ANSWER_CACHE_LEARNED_PATH = os.getenv("ANSWER_CACHE_LEARNED_PATH", ".cache/answers.json")  # shared by all job processes
+
 
 # --- 2. SPEECH-TO-TEXT (STT) SETTINGS ---
 # We use Deepgram for high-speed transcription.
@@ -56,6 +74,20 @@ SARVAM_LANGUAGE = "en-IN" # or hi-IN
 CARTESIA_MODEL = "sonic-2"
 CARTESIA_VOICE = "f786b574-daa5-4673-aa0c-cbe3e8534c02"
 
+# Fallback voices, e.g. "cartesia,openai": if the primary has no audio by the deadline,
+# the next provider is raced against it (fallbacks use their default voice)
+TTS_CHAIN = os.getenv("TTS_CHAIN", "")
+TTS_FIRST_AUDIO_DEADLINE = float(os.getenv("TTS_FIRST_AUDIO_DEADLINE", "1.0"))  # seconds
+
+# How streamed LLM text is cut into TTS requests (text_chunker.py): at sentence and clause
+# boundaries for English, Hinglish and Devanagari Hindi (danda). The first chunk of a reply
+# goes out after TTS_FIRST_CHUNK_CHARS, later ones grow toward TTS_MIN_CHUNK_CHARS, and no
+# chunk waits for punctuation past TTS_MAX_CHUNK_CHARS. Tune with `python -m bench.ttfa`.
+TTS_CHUNKING_ENABLED = os.getenv("TTS_CHUNKING_ENABLED", "true").lower() == "true"
+TTS_FIRST_CHUNK_CHARS = int(os.getenv("TTS_FIRST_CHUNK_CHARS", "12"))
+TTS_MIN_CHUNK_CHARS = int(os.getenv("TTS_MIN_CHUNK_CHARS", "40"))
+TTS_MAX_CHUNK_CHARS = int(os.getenv("TTS_MAX_CHUNK_CHARS", "160"))
+
 
 # --- 4. LARGE LANGUAGE MODEL (LLM) SETTINGS ---
 # Choose "openai" or "groq"
@@ -66,48 +98,353 @@ DEFAULT_LLM_MODEL = "gpt-4o-mini" # OpenAI default
 GROQ_MODEL = "llama3-8b-8192"
 GROQ_TEMPERATURE = 0.7
 
+# Fallback LLMs, e.g. "openai,groq": if the primary has no first token by the deadline,
+# the next provider is raced against it and the loser is cancelled
+LLM_CHAIN = os.getenv("LLM_CHAIN", "")
+LLM_FIRST_TOKEN_DEADLINE = float(os.getenv("LLM_FIRST_TOKEN_DEADLINE", "1.5"))  # seconds
+# Circuit breaker (LLM and TTS chains): consecutive failures before a provider is skipped, and for how long
+PROVIDER_BREAKER_FAILURES = int(os.getenv("PROVIDER_BREAKER_FAILURES", "3"))
+PROVIDER_BREAKER_COOLDOWN = float(os.getenv("PROVIDER_BREAKER_COOLDOWN", "30"))  # seconds
+PROVIDER_STATE_PATH = os.getenv("PROVIDER_STATE_PATH", ".cache/providers.json")  # shared by all job processes
+
+# Long calls: send a running summary of older turns plus the recent turns that fit the budget
+CONTEXT_COMPACTION_ENABLED = os.getenv("CONTEXT_COMPACTION_ENABLED", "true").lower() == "true"
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2000"))  # history budget, excluding the system prompt
+CONTEXT_MIN_RECENT = int(os.getenv("CONTEXT_MIN_RECENT", "6"))  # chat items always sent in full
+CONTEXT_SUMMARY_WORDS = int(os.getenv("CONTEXT_SUMMARY_WORDS", "150"))
+
+# Speculative generation: start the LLM on stable interim transcripts instead of waiting
+# for the final one. Costs extra LLM calls when the caller changes course; opt-in.
+SPECULATIVE_ENABLED = os.getenv("SPECULATIVE_ENABLED", "false").lower() == "true"
+SPECULATIVE_THRESHOLD = float(os.getenv("SPECULATIVE_THRESHOLD", "0.9"))  # interim vs final word similarity (0-1)
+SPECULATIVE_MIN_WORDS = int(os.getenv("SPECULATIVE_MIN_WORDS", "2"))
+SPECULATIVE_MAX_ATTEMPTS = int(os.getenv("SPECULATIVE_MAX_ATTEMPTS", "3"))  # restarts per turn
+SPECULATIVE_TTS = os.getenv("SPECULATIVE_TTS", "false").lower() == "true"  # also start TTS before end of turn
+
 
 # --- 5. TELEPHONY & TRANSFERS ---
+# LiveKit outbound SIP trunk used for dial-out (overridden by the Dashboard's SIP_TRUNK_ID setting).
+SIP_TRUNK_ID = os.getenv("VOBIZ_SIP_TRUNK_ID") or os.getenv("OUTBOUND_TRUNK_ID")
+# Vobiz SIP domain, used to build sip: URIs for transfers.
+SIP_DOMAIN = os.getenv("VOBIZ_SIP_DOMAIN")
+
+# Trunk pool: dial-out spreads calls over these outbound trunks (comma-separated, see
+# list_trunks.py) and fails over between them. Empty = dial on SIP_TRUNK_ID only.
+SIP_TRUNK_IDS = os.getenv("SIP_TRUNK_IDS", "")
+TRUNK_MAX_CONCURRENT = int(os.getenv("TRUNK_MAX_CONCURRENT", "30"))  # channels per trunk
+TRUNK_LIMITS = os.getenv("TRUNK_LIMITS", "")  # per-trunk overrides, e.g. "ST_abc:50,ST_def:10"
+TRUNK_MIN_HEALTH = float(os.getenv("TRUNK_MIN_HEALTH", "0.5"))  # success-rate EWMA below this = unhealthy
+TRUNK_COOLDOWN = float(os.getenv("TRUNK_COOLDOWN", "60"))  # seconds out of rotation after 3 failures in a row
+TRUNK_STATE_PATH = os.getenv("TRUNK_STATE_PATH", ".cache/trunks.json")  # shared by all job processes
+# Dial-out: give up after ringing this long (reported as NO_ANSWER); the grace covers a stuck SIP request
+RING_TIMEOUT = float(os.getenv("RING_TIMEOUT", "30"))  # seconds
+DIAL_GRACE = float(os.getenv("DIAL_GRACE", "15"))  # seconds
+# While the phone rings, open connections to every STT/LLM/TTS provider of the call, and
+# (WARMUP_PRIME_LLM) send each LLM the system prompt + tools so its prompt cache is warm.
+PIPELINE_WARMUP_ENABLED = os.getenv("PIPELINE_WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_PRIME_LLM = os.getenv("WARMUP_PRIME_LLM", "true").lower() == "true"
+# Telephony audio: run the whole call at one narrowband rate (room audio in and out, VAD,
+# STT, and TTS where the provider supports it) instead of resampling between 24 and 16 kHz.
+TELEPHONY_AUDIO = os.getenv("TELEPHONY_AUDIO", "true").lower() == "true"
+AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", "16000"))  # 8000 or 16000
+
 # Default number to transfer calls to if no specific destination is asked.
 DEFAULT_TRANSFER_NUMBER = os.getenv("DEFAULT_TRANSFER_NUMBER")
+# Transfers (see call_transfer.py): "warm" dials the destination while the caller holds and
+# bridges on answer (the agent takes the call back if nobody answers); "blind" is a SIP REFER.
+TRANSFER_MODE = os.getenv("TRANSFER_MODE", "warm")
+TRANSFER_RING_TIMEOUT = float(os.getenv("TRANSFER_RING_TIMEOUT", "25"))  # seconds
+TRANSFER_ANNOUNCEMENT = os.getenv("TRANSFER_ANNOUNCEMENT", "You're connected now. Thanks for holding!")  # empty = none
+
+# Answering-machine detection: screen the first seconds after answer (VAD, STT, beep) before greeting.
+# Humans who stay silent are greeted after AMD_INITIAL_SILENCE; tune with `python -m bench.amd`.
+AMD_ENABLED = os.getenv("AMD_ENABLED", "false").lower() == "true"
+AMD_BUDGET = float(os.getenv("AMD_BUDGET", "4.0"))  # seconds; undecided calls are treated as human
+AMD_ACTION = os.getenv("AMD_ACTION", "hangup")  # on a machine: "hangup", or "message" (VOICEMAIL_MESSAGE, then hang up)
+AMD_BEEP_TIMEOUT = float(os.getenv("AMD_BEEP_TIMEOUT", "10"))  # seconds to wait for the beep before leaving the message
+AMD_HUMAN_MAX_SPEECH = float(os.getenv("AMD_HUMAN_MAX_SPEECH", "2.4"))  # "Hello?" is short (VAD pads speech by ~0.5s)...
+AMD_HUMAN_SILENCE = float(os.getenv("AMD_HUMAN_SILENCE", "0.8"))  # ...and followed by silence (after VAD end of speech)
+AMD_MACHINE_MIN_SPEECH = float(os.getenv("AMD_MACHINE_MIN_SPEECH", "3.0"))  # recorded greetings are long
+AMD_INITIAL_SILENCE = float(os.getenv("AMD_INITIAL_SILENCE", "3.0"))
+AMD_KEYWORDS = os.getenv("AMD_KEYWORDS", "")  # extra comma-separated phrases, on top of answering_machine.DEFAULT_KEYWORDS
+
+
+# --- 6. DATA RETURN (Agent -> Dashboard) ---
+# Default to localhost because agent runs in network_mode: host and dashboard ports are mapped to host
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "http://localhost:3000/api/hooks/transcript")
+# Undelivered transcripts are spooled here and replayed after outages/restarts.
+TRANSCRIPT_SPOOL_DIR = os.getenv("TRANSCRIPT_SPOOL_DIR", ".cache/transcripts")
+TRANSCRIPT_BATCH_SIZE = int(os.getenv("TRANSCRIPT_BATCH_SIZE", "20"))
+TRANSCRIPT_BATCH_INTERVAL = float(os.getenv("TRANSCRIPT_BATCH_INTERVAL", "0.5"))  # seconds
+TRANSCRIPT_DRAIN_TIMEOUT = float(os.getenv("TRANSCRIPT_DRAIN_TIMEOUT", "10"))  # seconds
+# Stereo call recordings for QA (left: caller, right: agent), written to local disk off the event loop
+RECORDING_ENABLED = os.getenv("RECORDING_ENABLED", "false").lower() == "true"
+RECORDING_DIR = os.getenv("RECORDING_DIR", ".cache/recordings")
+RECORDING_FORMAT = os.getenv("RECORDING_FORMAT", "wav")  # "wav" or "ogg" (Opus, ~10x smaller)
+RECORDING_SAMPLE_RATE = int(os.getenv("RECORDING_SAMPLE_RATE", "16000"))
+RECORDING_BUFFER_SECONDS = float(os.getenv("RECORDING_BUFFER_SECONDS", "5"))  # ring buffer; frames are dropped past it
+RECORDING_CHUNK_SECONDS = float(os.getenv("RECORDING_CHUNK_SECONDS", "5"))  # audio appended to the file per write
+
+
+# --- 7. OBSERVABILITY ---
+# Prometheus-style /metrics endpoint served by the worker (0 disables it).
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+# Job processes write their per-turn latency histograms here and fold them into one total
+# when the call ends; the endpoint merges the total with the calls still running.
+METRICS_DIR = os.getenv("METRICS_DIR", ".cache/metrics")
+# Call-setup spans (dispatch -> job -> room -> dial -> greeting) as OTLP/JSON lines, one file
+# per process; summarise with `python -m bench.traces`, or ship them with an OTel Collector.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_DIR = os.getenv("TRACE_DIR", ".cache/traces")
+
+
+# --- 8. WORKER CAPACITY ---
+# Max concurrent calls per worker process; further jobs are passed to other workers.
+WORKER_MAX_CALLS = int(os.getenv("WORKER_MAX_CALLS", "10"))
+# Worker reports itself full at this share of system CPU (0-1)...
+WORKER_CPU_LIMIT = float(os.getenv("WORKER_CPU_LIMIT", "0.85"))
+# ...or when any call's event loop lags by this much (hurts audio quality).
+WORKER_LAG_BUDGET_MS = float(os.getenv("WORKER_LAG_BUDGET_MS", "100"))
+# On SIGTERM: stop taking jobs and give live calls this long to finish (seconds).
+WORKER_DRAIN_TIMEOUT = int(os.getenv("WORKER_DRAIN_TIMEOUT", "1800"))
+
+
+# --- 9. DASHBOARD SETTINGS (HOT RELOAD) ---
+DASHBOARD_URL = os.getenv("DASHBOARD_URL", "http://localhost:3000")
+# How often the worker's main process polls /api/settings (cheap: unchanged settings return 304).
+# It writes CONFIG_CACHE_PATH; each job re-reads that file when it starts.
+CONFIG_REFRESH_INTERVAL = float(os.getenv("CONFIG_REFRESH_INTERVAL", "15"))  # seconds
+# Last-known-good settings, so workers start instantly even when the Dashboard is down.
+CONFIG_CACHE_PATH = os.getenv("CONFIG_CACHE_PATH", ".cache/config.json")
+
+
+# --- 10. DASHBOARD TOOLS ---
+# Enabled rows of the Dashboard's Tool table, fetched once by the worker (see tool_runtime.py)
+TOOLS_CACHE_PATH = os.getenv("TOOLS_CACHE_PATH", ".cache/tools.json")
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "3"))  # seconds a tool call may hold up the reply
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "60"))  # seconds, worker-wide cache for GET tools
+TOOL_RESULTS_PATH = os.getenv("TOOL_RESULTS_PATH", ".cache/tool-results.json")  # shared by all job processes
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1000"))
+
+
+# --- 11. POST-CALL ANALYTICS (analytics_worker.py) ---
+# Summary, sentiment, intent and outcome for finished calls, run by a separate worker pool
+# (never in the voice workers). Each worker claims calls from the Dashboard in batches.
+ANALYTICS_LLM_PROVIDER = os.getenv("ANALYTICS_LLM_PROVIDER", "")  # empty = the agent's LLM
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "20"))  # calls claimed per request
+ANALYTICS_CONCURRENCY = int(os.getenv("ANALYTICS_CONCURRENCY", "4"))  # LLM requests in flight per worker
+ANALYTICS_POLL_INTERVAL = float(os.getenv("ANALYTICS_POLL_INTERVAL", "30"))  # seconds to wait when nothing is queued
+ANALYTICS_TIMEOUT = float(os.getenv("ANALYTICS_TIMEOUT", "60"))  # seconds per call
+ANALYTICS_MAX_CHARS = int(os.getenv("ANALYTICS_MAX_CHARS", "12000"))  # transcript sent to the LLM (head + tail)
 
 # ... (Existing constants)
 
+import asyncio
+import json
 import requests
 import logging
+import threading
+import time
 
 logger = logging.getLogger("config")
 
+# Settings the Dashboard can change at runtime (mapped onto module variables)
+_DYNAMIC_KEYS = (
+    "SYSTEM_PROMPT", "SIP_TRUNK_ID", "INITIAL_GREETING", "WEB_GREETING",
+    "DEFAULT_TTS_PROVIDER", "DEFAULT_TTS_VOICE",
+)
+# Sensitive keys are exported to os.environ so the plugin libraries pick them up
+_ENV_KEYS = ("OPENAI_API_KEY", "LIVEKIT_URL", "LIVEKIT_API_KEY", "LIVEKIT_API_SECRET")
+
+# Callbacks run after the Dashboard changes a setting.
+# Each callback receives the set of changed keys.
+_change_listeners = []
+
+
+def on_change(callback):
+    """Register a callback(changed_keys: set) for dynamic config updates."""
+    _change_listeners.append(callback)
+    return callback
+
+
+def _notify_change(changed: set):
+    for callback in _change_listeners:
+        try:
+            callback(changed)
+        except Exception as e:
+            logger.error(f"Config change listener failed: {e}")
+
+
+class ConfigSnapshot:
+    """
+    Immutable view of the configuration at one settings version.
+
+    Exposes the same UPPERCASE names as this module (snapshot.SYSTEM_PROMPT, ...),
+    so code can take either. Each job captures one at start, so a reload never
+    changes a call that is already running.
+    """
+    __slots__ = ("version", "_values")
+
+    def __init__(self, version: str, values: dict):
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "_values", dict(values))
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is immutable")
+
+
+def _module_values() -> dict:
+    return {
+        k: v for k, v in globals().items()
+        if k.isupper() and isinstance(v, (str, int, float, bool, type(None)))
+    }
+
+
+_version = "defaults"
+_etag = None
+_current = ConfigSnapshot(_version, _module_values())
+
+
+def snapshot() -> ConfigSnapshot:
+    """The current configuration. Capture it once per job."""
+    return _current
+
+
+def _apply_settings(data: dict, version: str, etag: str = None) -> set:
+    """Map Dashboard settings onto module variables / env vars and publish a new snapshot."""
+    global _current, _version, _etag
+
+    changed = set()
+    for key in _DYNAMIC_KEYS:
+        if key in data and data[key] != globals().get(key):
+            globals()[key] = data[key]
+            changed.add(key)
+    for key in _ENV_KEYS:
+        if key in data:
+            os.environ[key] = data[key]
+
+    _version = version
+    _etag = etag
+    _current = ConfigSnapshot(version, _module_values())
+    if changed:
+        _notify_change(changed)
+    return changed
+
+
+def _save_cache(data: dict, version: str, etag: str):
+    try:
+        os.makedirs(os.path.dirname(CONFIG_CACHE_PATH) or ".", exist_ok=True)
+        tmp = CONFIG_CACHE_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "etag": etag, "data": data}, f)
+        os.replace(tmp, CONFIG_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Could not write config cache: {e}")
+
+
+def _read_cache():
+    try:
+        with open(CONFIG_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_cached_config() -> bool:
+    """Apply the last-known-good settings from disk (instant, no network). Returns True if found."""
+    cached = _read_cache()
+    if cached is None:
+        return False
+    _apply_settings(cached["data"], cached.get("version") or "cached", cached.get("etag"))
+    logger.info(f"Loaded cached config (version {_version})")
+    return True
+
+
+async def reload_cached_config() -> bool:
+    """
+    Pick up settings the main process's refresher has written since this process
+    last looked (file read off the event loop). Returns True if they changed.
+    """
+    cached = await asyncio.to_thread(_read_cache)
+    if cached is None or (cached.get("version") or "cached", cached.get("etag")) == (_version, _etag):
+        return False
+    _apply_settings(cached["data"], cached.get("version") or "cached", cached.get("etag"))
+    logger.info(f"Reloaded cached config (version {_version})")
+    return True
+
+
+def _handle_response(status: int, headers, data):
+    """Shared by the blocking and async fetchers. Returns the set of changed keys."""
+    if status == 304:
+        return set()
+    version = headers.get("X-Config-Version") or (data or {}).pop("_version", None) or "unversioned"
+    etag = headers.get("ETag")
+    data.pop("_version", None)
+    changed = _apply_settings(data, version, etag)
+    _save_cache(data, version, etag)
+    logger.info(f"Configuration updated from Dashboard API (version {version}).")
+    return changed
+
+
 def load_dynamic_config(dashboard_url=None):
     """
-    Fetches configuration from the Dashboard API and updates globals.
+    Fetches configuration from the Dashboard API and updates globals (blocking).
+    Only needed on a first boot with no cached config - see load_cached_config() / start_refresher().
     """
     if not dashboard_url:
-        dashboard_url = os.getenv("DASHBOARD_URL", "http://localhost:3000")
+        dashboard_url = DASHBOARD_URL
     
     api_url = f"{dashboard_url}/api/settings"
     try:
         logger.info(f"Fetching config from {api_url}...")
         resp = requests.get(api_url, timeout=5)
         if resp.status_code == 200:
-            data = resp.json()
-            
-            # Map API keys to module variables
-            global SYSTEM_PROMPT, SIP_TRUNK_ID, SIP_DOMAIN, STT_PROVIDER, STT_MODEL, DEFAULT_LLM_PROVIDER
-            
-            if "SYSTEM_PROMPT" in data: SYSTEM_PROMPT = data["SYSTEM_PROMPT"]
-            if "SIP_TRUNK_ID" in data: SIP_TRUNK_ID = data["SIP_TRUNK_ID"]
-            # Add other mappings for API keys if they are stored in config module
-            # Note: Sensitive keys like OPENAI_API_KEY might need to be set in os.environ for libraries to pick them up
-            
-            if "OPENAI_API_KEY" in data: os.environ["OPENAI_API_KEY"] = data["OPENAI_API_KEY"]
-            if "LIVEKIT_URL" in data: os.environ["LIVEKIT_URL"] = data["LIVEKIT_URL"]
-            if "LIVEKIT_API_KEY" in data: os.environ["LIVEKIT_API_KEY"] = data["LIVEKIT_API_KEY"]
-            if "LIVEKIT_API_SECRET" in data: os.environ["LIVEKIT_API_SECRET"] = data["LIVEKIT_API_SECRET"]
-            
-            logger.info("Configuration updated from Dashboard API.")
+            _handle_response(resp.status_code, resp.headers, resp.json())
         else:
             logger.warning(f"Failed to fetch config: {resp.status_code} {resp.text}")
     except Exception as e:
         logger.error(f"Could not fetch dynamic config: {e}")
 
+
+def _refresh_forever(dashboard_url: str, interval: float):
+    api_url = f"{dashboard_url}/api/settings"
+    with requests.Session() as http:
+        while True:
+            headers = {"If-None-Match": _etag} if _etag else {}
+            try:
+                resp = http.get(api_url, headers=headers, timeout=5)
+                if resp.status_code in (200, 304):
+                    _handle_response(resp.status_code, resp.headers, resp.json() if resp.status_code == 200 else None)
+                else:
+                    logger.warning(f"Failed to refresh config: {resp.status_code}")
+            except Exception as e:
+                # Jobs keep serving the last-known-good cache file
+                logger.warning(f"Could not refresh config: {e}")
+            time.sleep(interval)
+
+
+_refresher_thread = None
+
+
+def start_refresher(dashboard_url: str = None, interval: float = None):
+    """
+    Poll the Dashboard in a background thread, keeping CONFIG_CACHE_PATH current.
+    Runs once, in the worker's main process (idempotent); job processes only read the file.
+    """
+    global _refresher_thread
+    if _refresher_thread is not None and _refresher_thread.is_alive():
+        return _refresher_thread
+    _refresher_thread = threading.Thread(
+        target=_refresh_forever,
+        args=(dashboard_url or DASHBOARD_URL, interval or CONFIG_REFRESH_INTERVAL),
+        name="config-refresher",
+        daemon=True,
+    )
+    _refresher_thread.start()
+    return _refresher_thread
@@ -0,0 +1,19 @@
+import { NextResponse } from 'next/server';
+import { prisma } from '@/lib/server-utils';
+import { claimCalls } from '@/lib/analytics-queue';
+
+// Claim the next finished calls for a post-call analytics worker (analytics_worker.py).
+// The worker posts its summaries / sentiment / intent back to /api/analytics/results.
+export async function POST(request: Request) {
+    const body = await request.json().catch(() => ({}));
+    const limit = Math.min(Math.max(Number(body.limit) || 20, 1), 200);
+    const worker = String(body.worker || "external");
+
+    try {
+        const calls = await claimCalls(prisma, limit, worker);
+        return NextResponse.json({ calls });
+    } catch (error: any) {
+        console.error("Analytics claim error:", error);
+        return NextResponse.json({ error: error.message }, { status: 500 });
+    }
+}
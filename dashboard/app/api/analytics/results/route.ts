@@ -0,0 +1,21 @@
+import { NextResponse } from 'next/server';
+import { prisma } from '@/lib/server-utils';
+import { saveResults, AnalysisResult } from '@/lib/analytics-queue';
+
+// POST /api/analytics/results - Store a batch of post-call analyses
+// Body: { worker, results: [{ call_id, summary, sentiment, intent, outcome, model, ms } | { call_id, error }] }
+export async function POST(request: Request) {
+    const body = await request.json().catch(() => null);
+    const results: AnalysisResult[] | undefined = body?.results;
+    if (!results || !Array.isArray(results)) {
+        return NextResponse.json({ error: "results array is required" }, { status: 400 });
+    }
+
+    try {
+        const counts = await saveResults(prisma, results, String(body.worker || "external"));
+        return NextResponse.json({ success: true, ...counts });
+    } catch (error: any) {
+        console.error("Error saving analyses:", error);
+        return NextResponse.json({ error: error.message }, { status: 500 });
+    }
+}
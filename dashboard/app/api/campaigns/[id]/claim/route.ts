@@ -0,0 +1,28 @@
+import { NextResponse } from 'next/server';
+import { prisma } from '@/lib/server-utils';
+import { claimContacts } from '@/lib/dial-queue';
+
+// Claim the next due contacts for an external dispatcher (make_call.py --campaign).
+// The caller dials them and reports each outcome to /api/hooks/transcript with the call_id.
+export async function POST(request: Request, { params }: { params: Promise<{ id: string }> }) {
+    const { id: campaignId } = await params;
+    const body = await request.json().catch(() => ({}));
+    const limit = Math.min(Math.max(Number(body.limit) || 10, 1), 500);
+    const worker = String(body.worker || "external");
+
+    try {
+        const claim = await claimContacts(prisma, campaignId, limit, worker);
+        if (!claim) {
+            return NextResponse.json({ error: "Campaign not found" }, { status: 404 });
+        }
+        return NextResponse.json({
+            contacts: claim.contacts,
+            prompt: claim.campaign.promptTemplate || "",
+            done: claim.done,
+            nextAttemptAt: claim.nextAttemptAt,
+        });
+    } catch (error: any) {
+        console.error("Claim error:", error);
+        return NextResponse.json({ error: error.message }, { status: 500 });
+    }
+}
@@ -1,5 +1,6 @@
 import { NextResponse } from 'next/server';
-import { sipClient, roomService, prisma } from '@/lib/server-utils';
+import { roomService, prisma, getTrunkIds, createSipParticipantWithFailover } from '@/lib/server-utils';
+import { claimContacts, settleAttempt } from '@/lib/dial-queue';
 
 // Fix for Next.js 15: params is a Promise
 export async function POST(request: Request, { params }: { params: Promise<{ id: string }> }) {
@@ -8,64 +9,44 @@ export async function POST(request: Request, { params }: { params: Promise<{ id:
     const { batchSize = 10 } = body; // Dispatch 10 calls at a time by default
 
     // Ensure Trunk ID exists
-    if (!process.env.VOBIZ_SIP_TRUNK_ID) {
+    if (getTrunkIds().length === 0) {
         return NextResponse.json({ error: "SIP Trunk ID not configured" }, { status: 500 });
     }
 
     try {
-        // 1. Fetch pending contacts using generic query
-        const campaign = await prisma.campaign.findUnique({
-            where: { id: campaignId },
-            include: {
-                contacts: {
-                    include: { calls: true }
-                }
-            }
-        });
+        // 1. Claim the next due contacts from the dial queue (creates their DISPATCHED calls)
+        const claim = await claimContacts(prisma, campaignId, batchSize, `dashboard-${process.pid}`);
 
-        if (!campaign) {
+        if (!claim) {
             return NextResponse.json({ error: "Campaign not found" }, { status: 404 });
         }
 
-        // Filter for contacts who haven't been called successfully
-        const pendingContacts = campaign.contacts.filter(c => {
-            const hasSuccessfulCall = c.calls.some(call =>
-                ['DISPATCHED', 'ACTIVE', 'COMPLETED'].includes(call.status)
-            );
-            return !hasSuccessfulCall;
-        }).slice(0, batchSize);
-
-        if (pendingContacts.length === 0) {
-            return NextResponse.json({ message: "No pending contacts to dial.", completed: true });
+        if (claim.contacts.length === 0) {
+            return NextResponse.json({
+                message: claim.done ? "No pending contacts to dial." : "No contacts due yet.",
+                completed: claim.done,
+                nextAttemptAt: claim.nextAttemptAt,
+            });
         }
 
         const results = [];
         const errors = [];
 
         // 2. Dispatch Calls Loop
-        for (const contact of pendingContacts) {
+        for (const contact of claim.contacts) {
             try {
-                // A. Create Call Record (Status: DISPATCHED)
-                const call = await prisma.call.create({
-                    data: {
-                        campaignId: campaignId,
-                        contactId: contact.id,
-                        direction: "OUTBOUND",
-                        status: "DISPATCHED"
-                    }
-                });
-
-                // B. Create Room & SIP Participant
-                const roomName = `camp-${campaignId.slice(-4)}-${call.id}`;
+                // A. Create Room & SIP Participant
+                const roomName = `camp-${campaignId.slice(-4)}-${contact.callId}`;
                 const participantIdentity = `sip_${contact.phone}`;
 
                 // Metadata for the agent
                 const metadata = JSON.stringify({
-                    call_id: call.id,      // Critical for Data Return
+                    call_id: contact.callId,      // Critical for Data Return
                     phone_number: contact.phone,
                     campaign_id: campaignId,
-                    user_prompt: campaign.promptTemplate || "",
-                    user_data: contact.attributes
+                    user_prompt: claim.campaign.promptTemplate || "",
+                    user_data: contact.attributes,
+                    dispatched_at: Date.now() / 1000 // Start of the call's setup trace
                 });
 
                 // 1. Create/Ensure Room exists with Metadata first
@@ -77,8 +58,7 @@ export async function POST(request: Request, { params }: { params: Promise<{ id:
                 });
 
                 // 2. Dial SIP
-                await sipClient.createSipParticipant(
-                    process.env.VOBIZ_SIP_TRUNK_ID!,
+                await createSipParticipantWithFailover(
                     contact.phone,
                     roomName,
                     {
@@ -87,12 +67,14 @@ export async function POST(request: Request, { params }: { params: Promise<{ id:
                     }
                 );
 
-                results.push({ callId: call.id, phone: contact.phone, status: "DISPATCHED" });
+                results.push({ callId: contact.callId, phone: contact.phone, attempt: contact.attempts, status: "DISPATCHED" });
 
             } catch (err: any) {
                 console.error(`Failed to dispatch ${contact.phone}:`, err);
                 errors.push({ phone: contact.phone, error: err.message });
-                // We could update the call status to FAILED here if created
+                // Close the attempt so the contact is retried (or exhausted) instead of staying claimed
+                await prisma.call.update({ where: { id: contact.callId }, data: { status: "FAILED", endedAt: new Date() } });
+                await settleAttempt(prisma, contact.id, "FAILED");
             }
         }
 
@@ -11,8 +11,6 @@ export async function GET(request: Request, { params }: { params: Promise<{ id:
         const campaign = await prisma.campaign.findUnique({
             where: { id },
             include: {
-                // We want aggregated stats, so getting all contacts might be heavy if massive.
-                // But for V1 it's fine.
                 calls: {
                     orderBy: { createdAt: 'desc' },
                     take: 20, // Only last 20 calls for the list
@@ -25,37 +23,54 @@ export async function GET(request: Request, { params }: { params: Promise<{ id:
             return NextResponse.json({ error: "Campaign not found" }, { status: 404 });
         }
 
-        // Calculate Stats
-        // Use aggregate queries for performance in real app, but filter here for V1
-        const total = await prisma.contact.count({ where: { campaignId: campaign.id } });
-        const calls = await prisma.call.findMany({
-            where: { campaignId: campaign.id },
-            select: { status: true } // minimal select
-        });
-
-        const pending = total - calls.length; // Approximate (contacts without a call record)
-        // Wait, logic check: A contact might have multiple failed calls.
-        // Better: Pending = Contact.count where NO call exists.
-        // Let's stick to simple Call stats for now.
-
-        const completed = calls.filter(c => c.status === 'COMPLETED').length;
-        const failed = calls.filter(c => c.status === 'FAILED').length;
-        // active/dispatched
-        const active = calls.filter(c => ['ACTIVE', 'DISPATCHED'].includes(c.status)).length;
-
-        // Revised Pending Logic:
-        // Total Contacts - Contacts with at least one call that is NOT 'PENDING'?
-        // Let's just say Pending = Total - (Completed + Failed + Active) is rough but okay?
-        // No, simplest for UI:
-        // Total = Total Contacts
-        // Processed = Calls created
+        // Calculate Stats: grouped counts straight from the (campaignId, ...) indexes,
+        // so this stays cheap however many contacts and calls the campaign has
+        const [contactStates, callStatuses, talkTime, analysed] = await Promise.all([
+            prisma.contact.groupBy({ by: ['dialState'], where: { campaignId: campaign.id }, _count: { _all: true } }),
+            prisma.call.groupBy({ by: ['status'], where: { campaignId: campaign.id }, _count: { _all: true } }),
+            prisma.call.aggregate({
+                where: { campaignId: campaign.id, status: { in: ['COMPLETED', 'TRANSFERRED'] } },
+                _sum: { duration: true }, _avg: { duration: true },
+            }),
+            // Outcome / sentiment from the post-call analytics workers (analytics_worker.py)
+            prisma.$queryRaw<{ outcome: string | null; sentiment: string | null; n: bigint }[]>`
+                SELECT "analysis"->>'outcome' AS outcome, "analysis"->>'sentiment' AS sentiment, COUNT(*) AS n
+                FROM "Call"
+                WHERE "campaignId" = ${campaign.id} AND "analyzedAt" IS NOT NULL
+                GROUP BY 1, 2`,
+        ]);
+        const tally = (key: 'outcome' | 'sentiment') => analysed.reduce((out: Record<string, number>, row) => {
+            const label = row[key] || 'unknown';
+            out[label] = (out[label] || 0) + Number(row.n);
+            return out;
+        }, {});
+        const contactsIn = (...states: string[]) =>
+            contactStates.filter(g => states.includes(g.dialState)).reduce((n, g) => n + g._count._all, 0);
+        const callsIn = (...statuses: string[]) =>
+            callStatuses.filter(g => statuses.includes(g.status)).reduce((n, g) => n + g._count._all, 0);
 
         const stats = {
-            total,
-            pending: total - calls.length, // Rough estimate of verified untouched contacts
-            completed,
-            failed,
-            active
+            total: contactStates.reduce((n, g) => n + g._count._all, 0),
+            // Contacts waiting in the dial queue (never dialed, or due for a retry)
+            pending: contactsIn('PENDING'),
+            // Contacts that ran out of attempts (or can't be reached: rejected, invalid number)
+            exhausted: contactsIn('EXHAUSTED'),
+            completed: callsIn('COMPLETED', 'TRANSFERRED'),
+            // Handed over to a person (see call_transfer.py); also counted in completed
+            transferred: callsIn('TRANSFERRED'),
+            failed: callsIn('FAILED'),
+            // Answering machine detected; retried per the campaign's retry policy
+            voicemail: callsIn('VOICEMAIL'),
+            // Rang out or busy; also retried
+            unanswered: callsIn('NO_ANSWER', 'BUSY'),
+            // active/dispatched
+            active: callsIn('ACTIVE', 'DISPATCHED'),
+            // Connected time (answer to hang-up, seconds)
+            talkSeconds: talkTime._sum.duration || 0,
+            avgDuration: Math.round(talkTime._avg.duration || 0),
+            analysed: analysed.reduce((n, row) => n + Number(row.n), 0),
+            outcomes: tally('outcome'),
+            sentiment: tally('sentiment'),
         };
 
         return NextResponse.json({
@@ -20,7 +20,7 @@ if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prismaClient
 export async function POST(request: Request) {
     try {
         const body = await request.json();
-        const { name, contacts } = body;
+        const { name, contacts, maxAttempts, retryDelayMinutes, callWindowStart, callWindowEnd, timezone } = body;
 
         if (!contacts || !Array.isArray(contacts) || contacts.length === 0) {
             return NextResponse.json({ error: "No contacts provided" }, { status: 400 });
@@ -31,6 +31,11 @@ export async function POST(request: Request) {
             data: {
                 name: name || `Campaign ${new Date().toISOString()}`,
                 status: "DRAFT",
+                // Retry policy and calling hours for the dial queue (schema defaults otherwise)
+                ...(maxAttempts ? { maxAttempts: Number(maxAttempts) } : {}),
+                ...(retryDelayMinutes ? { retryDelayMinutes: Number(retryDelayMinutes) } : {}),
+                ...(callWindowStart && callWindowEnd ? { callWindowStart, callWindowEnd } : {}),
+                ...(timezone ? { timezone } : {}),
             }
         });
 
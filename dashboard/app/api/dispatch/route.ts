@@ -1,5 +1,5 @@
 import { NextResponse } from 'next/server';
-import { sipClient, roomService } from '@/lib/server-utils';
+import { roomService, getTrunkIds, createSipParticipantWithFailover } from '@/lib/server-utils';
 
 export async function POST(request: Request) {
     try {
@@ -10,8 +10,8 @@ export async function POST(request: Request) {
             return NextResponse.json({ error: "Phone number is required" }, { status: 400 });
         }
 
-        const trunkId = process.env.VOBIZ_SIP_TRUNK_ID;
-        if (!trunkId) {
+        const trunkIds = getTrunkIds();
+        if (trunkIds.length === 0) {
             console.error("VOBIZ_SIP_TRUNK_ID is missing in env");
             return NextResponse.json({ error: "SIP Trunk not configured" }, { status: 500 });
         }
@@ -20,7 +20,7 @@ export async function POST(request: Request) {
         const roomName = `call-${phoneNumber.replace(/\+/g, '')}-${Math.floor(Math.random() * 10000)}`;
         const particpantIdentity = `sip_${phoneNumber}`;
 
-        console.log(`Dispatching call to ${phoneNumber} in room ${roomName} via trunk ${trunkId}`);
+        console.log(`Dispatching call to ${phoneNumber} in room ${roomName} via trunks ${trunkIds.join(", ")}`);
 
         // Create the SIP Participant
         // This triggers the SIP Trunk to dial the number and connect it to the room.
@@ -43,7 +43,8 @@ export async function POST(request: Request) {
             phone_number: phoneNumber,
             user_prompt: prompt || "",
             model_provider: modelProvider || "openai",
-            voice_id: voice || "alloy"
+            voice_id: voice || "alloy",
+            dispatched_at: Date.now() / 1000 // Start of the call's setup trace (see call_tracing.py)
         });
 
         // 1. Create/Ensure Room exists with Metadata first
@@ -54,8 +55,7 @@ export async function POST(request: Request) {
         });
 
         // 2. Dial SIP
-        const info = await sipClient.createSipParticipant(
-            trunkId,
+        const info = await createSipParticipantWithFailover(
             phoneNumber,
             roomName,
             {
@@ -0,0 +1,54 @@
+import { NextResponse } from 'next/server';
+import { PrismaClient } from "@prisma/client";
+import { gunzipSync } from 'zlib';
+import { saveTranscript, TranscriptRecord } from '@/lib/transcripts';
+
+const globalForPrisma = global as unknown as { prisma: PrismaClient };
+const prisma = globalForPrisma.prisma || new PrismaClient();
+if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
+
+// POST /api/hooks/transcript/bulk - Save many call records in one request
+// Body: { records: [...] } - the agent sends it gzipped (Content-Encoding: gzip)
+// Reply: { saved, failed, results: [{ record_id, ok, call_id | error }] }
+export async function POST(request: Request) {
+    let body: { records?: TranscriptRecord[] };
+    try {
+        const raw = Buffer.from(await request.arrayBuffer());
+        const encoding = request.headers.get('content-encoding') || '';
+        const text = encoding.includes('gzip') ? gunzipSync(raw).toString('utf-8') : raw.toString('utf-8');
+        body = JSON.parse(text);
+    } catch (error: any) {
+        // Malformed payloads are a permanent failure (4xx) so the agent doesn't retry them forever
+        return NextResponse.json({ error: `Invalid payload: ${error.message}` }, { status: 400 });
+    }
+
+    const records = body.records;
+    if (!records || !Array.isArray(records)) {
+        return NextResponse.json({ error: "records array is required" }, { status: 400 });
+    }
+
+    try {
+        // Each record is saved on its own; the response says which ones failed so the agent
+        // resends only those (saves are idempotent per record_id)
+        const settled = await Promise.allSettled(records.map(r => saveTranscript(prisma, r)));
+        const results = settled.map((r, i) => {
+            if (r.status === 'fulfilled') {
+                return { record_id: records[i].record_id, ok: true, call_id: r.value };
+            }
+            console.error("Error saving transcript:", r.reason);
+            return { record_id: records[i].record_id, ok: false, error: String(r.reason?.message || r.reason) };
+        });
+        const failed = results.filter(r => !r.ok).length;
+
+        if (failed === records.length) {
+            // Nothing saved (database down?): 5xx so the agent retries the whole batch
+            return NextResponse.json({ error: `${failed} of ${records.length} records failed`, results }, { status: 500 });
+        }
+
+        return NextResponse.json({ success: failed === 0, saved: records.length - failed, failed, results });
+
+    } catch (error: any) {
+        console.error("Error saving transcripts:", error);
+        return NextResponse.json({ error: error.message }, { status: 500 });
+    }
+}
@@ -1,5 +1,6 @@
 import { NextResponse } from 'next/server';
 import { PrismaClient } from "@prisma/client";
+import { saveTranscript } from '@/lib/transcripts';
 
 // Re-use the global prisma instance or import from lib/db
 // For brevity in this artifact, I'll use the check-and-create pattern again
@@ -11,67 +12,7 @@ if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
 export async function POST(request: Request) {
     try {
         const body = await request.json();
-        const {
-            call_id,      // matches Call.id if we passed it, or we find by other means
-            phone,
-            transcript,
-            status,
-            duration,
-            analysis
-        } = body;
-
-        console.log(`Received transcript for ${phone}: ${status}`);
-
-        // If we have a call_id (passed via metadata), update it.
-        // If not, we might need to find the latest active call for this phone.
-
-        let callRecord;
-
-        if (call_id) {
-            callRecord = await prisma.call.findUnique({ where: { id: call_id } });
-        }
-
-        if (!callRecord && phone) {
-            // Find the most recent PENDING or ACTIVE call for this number
-            callRecord = await prisma.call.findFirst({
-                where: {
-                    contact: { phone: phone },
-                    // status: { in: ['DISPATCHED', 'ACTIVE'] } // optional filter
-                },
-                orderBy: { createdAt: 'desc' }
-            });
-        }
-
-        if (!callRecord) {
-            // If no record exists (e.g. inbound call or manual testing), create a new one?
-            // Or just log it. Let's create one for data completeness.
-            console.log("No existing call record found. Creating new log.");
-            // We need to find the contact first to link it?
-            let contact = await prisma.contact.findFirst({ where: { phone } });
-            if (!contact) {
-                contact = await prisma.contact.create({ data: { phone, name: "Unknown" } });
-            }
-
-            callRecord = await prisma.call.create({
-                data: {
-                    contactId: contact.id,
-                    direction: "INBOUND", // Assumption if not dispatched
-                    status: "COMPLETED"
-                }
-            });
-        }
-
-        // Update the record
-        await prisma.call.update({
-            where: { id: callRecord.id },
-            data: {
-                status: status || "COMPLETED",
-                transcript: transcript || "",
-                analysis: analysis || {},
-                duration: duration || 0,
-                endedAt: new Date(),
-            }
-        });
+        await saveTranscript(prisma, body);
 
         return NextResponse.json({ success: true });
 
@@ -1,5 +1,5 @@
 import { NextResponse } from 'next/server';
-import { roomService, sipClient } from '@/lib/server-utils';
+import { roomService, getTrunkIds, createSipParticipantWithFailover } from '@/lib/server-utils';
 
 export async function POST(request: Request) {
     try {
@@ -10,8 +10,7 @@ export async function POST(request: Request) {
             return NextResponse.json({ error: "List of phone numbers is required" }, { status: 400 });
         }
 
-        const trunkId = process.env.VOBIZ_SIP_TRUNK_ID;
-        if (!trunkId) {
+        if (getTrunkIds().length === 0) {
             return NextResponse.json({ error: "SIP Trunk not configured" }, { status: 500 });
         }
 
@@ -26,7 +25,8 @@ export async function POST(request: Request) {
 
                 const metadata = JSON.stringify({
                     phone_number: phoneNumber,
-                    user_prompt: prompt || ""
+                    user_prompt: prompt || "",
+                    dispatched_at: Date.now() / 1000 // Start of the call's setup trace
                 });
 
                 await roomService.createRoom({
@@ -35,8 +35,7 @@ export async function POST(request: Request) {
                     emptyTimeout: 60 * 5,
                 });
 
-                const info = await sipClient.createSipParticipant(
-                    trunkId,
+                const info = await createSipParticipantWithFailover(
                     phoneNumber,
                     roomName,
                     {
@@ -1,15 +1,24 @@
 
 import { NextRequest, NextResponse } from "next/server";
-import { getAllConfig, setConfig, ConfigKey } from "@/lib/config-manager";
+import { getAllConfig, getConfigVersion, setConfig, ConfigKey } from "@/lib/config-manager";
 
 // GET /api/settings - Retrieve all settings
-export async function GET() {
+// Versioned: returns ETag / X-Config-Version, and 304 if the caller's If-None-Match is current.
+export async function GET(req: NextRequest) {
     try {
+        const version = await getConfigVersion();
+        const etag = `"${version}"`;
+        const headers = { "ETag": etag, "X-Config-Version": version };
+
+        if (req.headers.get("if-none-match") === etag) {
+            return new NextResponse(null, { status: 304, headers });
+        }
+
         const config = await getAllConfig();
 
         // Mask sensitive keys (like secrets) if needed, but for an admin dashboard, showing them (or part of them) might be okay
         // For now, return everything so the admin can edit them.
-        return NextResponse.json(config);
+        return NextResponse.json({ ...config, _version: version }, { headers });
     } catch (error) {
         console.error("Failed to fetch settings:", error);
         return NextResponse.json({ error: "Failed to fetch settings" }, { status: 500 });
@@ -0,0 +1,22 @@
+import { NextResponse } from "next/server";
+import { PrismaClient } from "@prisma/client";
+
+const globalForPrisma = global as unknown as { prisma: PrismaClient };
+const prisma = globalForPrisma.prisma || new PrismaClient();
+if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
+
+// GET /api/tools - Enabled tools for the agent worker (fetched once per worker start)
+// See tool_runtime.py for the `config` format.
+export async function GET() {
+    try {
+        const tools = await prisma.tool.findMany({
+            where: { enabled: true },
+            select: { name: true, description: true, config: true },
+            orderBy: { name: "asc" },
+        });
+        return NextResponse.json(tools);
+    } catch (error) {
+        console.error("Failed to fetch tools:", error);
+        return NextResponse.json({ error: "Failed to fetch tools" }, { status: 500 });
+    }
+}
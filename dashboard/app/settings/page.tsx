@@ -24,8 +24,8 @@ export default function SettingsPage() {
 
     const fetchSettings = async () => {
         try {
-            const res = await fetch("/api/settings");
-            const data = await res.json();
+            const res = await fetch("/api/settings", { cache: "no-store" });
+            const { _version, ...data } = await res.json();
             setSettings(data);
         } catch (e) {
             console.error(e);
@@ -0,0 +1,90 @@
+import { Prisma, PrismaClient } from "@prisma/client";
+
+const CLAIM_LEASE_MINUTES = Number(process.env.ANALYTICS_CLAIM_LEASE_MINUTES || 15);
+const MAX_ATTEMPTS = Number(process.env.ANALYTICS_MAX_ATTEMPTS || 3);
+
+// Calls worth analysing: someone picked up and talked to the agent
+const ANALYSED_STATUSES = ['COMPLETED', 'TRANSFERRED'];
+
+export interface ClaimedCall {
+    id: string;
+    campaignId: string | null;
+    status: string;
+    duration: number | null;
+    transcript: string | null;
+    turns: any;
+}
+
+export interface AnalysisResult {
+    call_id: string;
+    summary?: string;
+    sentiment?: string;
+    intent?: string;
+    outcome?: string;
+    model?: string;
+    ms?: number;
+    error?: string;
+}
+
+// Atomically claim up to `limit` finished, unanalysed calls for an analytics worker.
+export async function claimCalls(prisma: PrismaClient, limit: number, worker: string): Promise<ClaimedCall[]> {
+    const now = new Date();
+    const leaseCutoff = new Date(now.getTime() - CLAIM_LEASE_MINUTES * 60000);
+
+    // Oldest first over the index. Rows another worker holds are skipped, not waited on;
+    // claims that outlived their lease (worker died) are up for grabs again.
+    return prisma.$queryRaw<ClaimedCall[]>`
+        UPDATE "Call" AS c
+        SET "analysisClaimedAt" = ${now}, "analysisClaimedBy" = ${worker},
+            "analysisAttempts" = c."analysisAttempts" + 1, "updatedAt" = ${now}
+        WHERE c."id" IN (
+            SELECT "id" FROM "Call"
+            WHERE "analyzedAt" IS NULL AND "endedAt" IS NOT NULL
+              AND "status" IN (${Prisma.join(ANALYSED_STATUSES)})
+              AND "analysisAttempts" < ${MAX_ATTEMPTS}
+              AND ("analysisClaimedAt" IS NULL OR "analysisClaimedAt" < ${leaseCutoff})
+              AND "transcript" <> ''
+            ORDER BY "endedAt", "id"
+            LIMIT ${limit}
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING c."id", c."campaignId", c."status", c."duration", c."transcript", c."turns"`;
+}
+
+// Store a batch of worker results. Failed calls are released for a retry (up to MAX_ATTEMPTS claims).
+export async function saveResults(prisma: PrismaClient, results: AnalysisResult[], worker: string) {
+    const now = new Date();
+    let saved = 0;
+    let failed = 0;
+    for (const result of results) {
+        if (!result.call_id) continue;
+        if (result.error) {
+            await prisma.call.updateMany({
+                where: { id: result.call_id, analysisClaimedBy: worker, analyzedAt: null },
+                data: { analysisClaimedAt: null, analysisClaimedBy: null },
+            });
+            failed++;
+            continue;
+        }
+        const call = await prisma.call.findUnique({ where: { id: result.call_id }, select: { analysis: true } });
+        if (!call) continue;
+        await prisma.call.update({
+            where: { id: result.call_id },
+            data: {
+                summary: result.summary || "",
+                analysis: {
+                    ...((call.analysis as object) || {}),
+                    sentiment: result.sentiment,
+                    intent: result.intent,
+                    outcome: result.outcome,
+                    analytics: { model: result.model, ms: result.ms, analyzedAt: now.toISOString() },
+                },
+                analyzedAt: now,
+                analysisClaimedAt: null,
+                analysisClaimedBy: null,
+            },
+        });
+        saved++;
+    }
+    return { saved, failed };
+}
@@ -33,3 +33,14 @@ export async function getAllConfig() {
         return acc;
     }, {} as Record<string, string>);
 }
+
+// Version token for the whole settings table: changes whenever a row is added, removed or updated.
+// Workers send it back as If-None-Match and get a cheap 304 when nothing changed.
+export async function getConfigVersion(): Promise<string> {
+    const agg = await prisma.config.aggregate({
+        _count: { _all: true },
+        _max: { updatedAt: true },
+    });
+    const latest = agg._max.updatedAt ? agg._max.updatedAt.getTime() : 0;
+    return `${agg._count._all}-${latest}`;
+}
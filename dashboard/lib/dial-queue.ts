@@ -0,0 +1,171 @@
+import { Campaign, PrismaClient } from "@prisma/client";
+
+// Campaign dial queue: every Contact carries its own queue state (dialState, attempts,
+// nextAttemptAt), indexed by (campaignId, dialState, nextAttemptAt, id). Dispatchers claim
+// the head of that index with FOR UPDATE SKIP LOCKED, so a batch costs the same for 100 or
+// 100k contacts and concurrent dispatchers (Dashboard, make_call.py --campaign) never
+// claim the same contact twice.
+
+// A claim whose call never reported back (dispatcher or agent died) is requeued after this
+const CLAIM_LEASE_MINUTES = Number(process.env.DIAL_CLAIM_LEASE_MINUTES || 60);
+const MAX_RETRY_DELAY_MINUTES = 24 * 60;
+
+// How a finished call moves its contact along the queue; other statuses (DISPATCHED, ACTIVE) are in flight
+const DONE_STATUSES = ['COMPLETED', 'TRANSFERRED'];
+const FINAL_STATUSES = ['REJECTED', 'INVALID_NUMBER'];
+const RETRY_STATUSES = ['VOICEMAIL', 'NO_ANSWER', 'BUSY', 'FAILED'];
+
+export interface ClaimedContact {
+    id: string;
+    phone: string;
+    name: string | null;
+    attributes: any;
+    attempts: number;
+    callId: string;
+}
+
+export interface ClaimResult {
+    campaign: Campaign;
+    contacts: ClaimedContact[];
+    done: boolean;               // nothing left to dial or in flight
+    nextAttemptAt: Date | null;  // when something becomes due, if nothing was claimable now
+}
+
+function minutesOfDay(hhmm: string): number {
+    const [h, m] = hhmm.split(':').map(Number);
+    return h * 60 + (m || 0);
+}
+
+function localMinutes(date: Date, timezone: string): number {
+    const parts = new Intl.DateTimeFormat('en-GB', {
+        timeZone: timezone, hour: '2-digit', minute: '2-digit', hourCycle: 'h23',
+    }).formatToParts(date);
+    const get = (type: string) => Number(parts.find(p => p.type === type)?.value || 0);
+    return get('hour') * 60 + get('minute');
+}
+
+// Earliest time at or after `after` inside the campaign's calling hours (overnight windows allowed)
+export function nextCallingTime(campaign: Campaign, after: Date): Date {
+    if (!campaign.callWindowStart || !campaign.callWindowEnd) return after;
+    const start = minutesOfDay(campaign.callWindowStart);
+    const end = minutesOfDay(campaign.callWindowEnd);
+    const now = localMinutes(after, campaign.timezone);
+    const open = start <= end ? now >= start && now < end : now >= start || now < end;
+    if (open) return after;
+    const minuteStart = Math.floor(after.getTime() / 60000) * 60000;
+    return new Date(minuteStart + ((start - now + 1440) % 1440) * 60000);
+}
+
+// Backoff for the next attempt: retryDelayMinutes, doubling per attempt made, within calling hours
+export function retryAt(campaign: Campaign, attempts: number, now: Date = new Date()): Date {
+    const delay = Math.min(campaign.retryDelayMinutes * 2 ** Math.max(attempts - 1, 0), MAX_RETRY_DELAY_MINUTES);
+    return nextCallingTime(campaign, new Date(now.getTime() + delay * 60000));
+}
+
+// Atomically claim up to `limit` due contacts and open a DISPATCHED Call for each.
+// Returns null if the campaign doesn't exist.
+export async function claimContacts(
+    prisma: PrismaClient, campaignId: string, limit: number, worker: string,
+): Promise<ClaimResult | null> {
+    const campaign = await prisma.campaign.findUnique({ where: { id: campaignId } });
+    if (!campaign) return null;
+    const now = new Date();
+
+    // Requeue claims that outlived their lease (counts as a failed attempt), and fail the
+    // in-flight Call each of them opened so it doesn't stay DISPATCHED next to the retry
+    const leaseCutoff = new Date(now.getTime() - CLAIM_LEASE_MINUTES * 60000);
+    await prisma.$executeRaw`
+        WITH requeued AS (
+            UPDATE "Contact"
+            SET "dialState" = CASE WHEN "attempts" >= ${campaign.maxAttempts} THEN 'EXHAUSTED' ELSE 'PENDING' END,
+                "nextAttemptAt" = ${now}, "claimedAt" = NULL, "claimedBy" = NULL,
+                "lastStatus" = 'FAILED', "updatedAt" = ${now}
+            WHERE "campaignId" = ${campaignId} AND "dialState" = 'DIALING' AND "claimedAt" < ${leaseCutoff}
+            RETURNING "id"
+        )
+        UPDATE "Call"
+        SET "status" = 'FAILED', "endedAt" = ${now}, "updatedAt" = ${now}
+        WHERE "contactId" IN (SELECT "id" FROM requeued)
+          AND "status" IN ('DISPATCHED', 'ACTIVE') AND "createdAt" < ${leaseCutoff}`;
+
+    let claimed: ClaimedContact[] = [];
+    if (nextCallingTime(campaign, now) <= now) {
+        // The claim and its Calls commit together: a dispatcher that dies in between leaves
+        // neither a DIALING contact without a Call nor a Call for an unclaimed contact
+        claimed = await prisma.$transaction(async tx => {
+            // Keyset order over the index: the next `limit` due rows after everything already claimed
+            // (claimed rows leave the PENDING range). Rows another dispatcher holds are skipped, not waited on.
+            const rows = await tx.$queryRaw<Omit<ClaimedContact, 'callId'>[]>`
+                UPDATE "Contact" AS c
+                SET "dialState" = 'DIALING', "attempts" = c."attempts" + 1,
+                    "claimedAt" = ${now}, "claimedBy" = ${worker}, "updatedAt" = ${now}
+                WHERE c."id" IN (
+                    SELECT "id" FROM "Contact"
+                    WHERE "campaignId" = ${campaignId} AND "dialState" = 'PENDING' AND "nextAttemptAt" <= ${now}
+                    ORDER BY "nextAttemptAt", "id"
+                    LIMIT ${limit}
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING c."id", c."phone", c."name", c."attributes", c."attempts"`;
+
+            const contacts: ClaimedContact[] = [];
+            for (const contact of rows) {
+                const call = await tx.call.create({
+                    data: { campaignId, contactId: contact.id, direction: "OUTBOUND", status: "DISPATCHED" },
+                });
+                contacts.push({ ...contact, callId: call.id });
+            }
+            return contacts;
+        });
+    }
+
+    if (claimed.length > 0) {
+        if (campaign.status !== 'RUNNING') {
+            await prisma.campaign.update({ where: { id: campaignId }, data: { status: 'RUNNING' } });
+        }
+        return { campaign, contacts: claimed, done: false, nextAttemptAt: null };
+    }
+
+    // Nothing due: report when the next contact is (both lookups are index probes)
+    const [pending, inFlight] = await Promise.all([
+        prisma.contact.findFirst({
+            where: { campaignId, dialState: 'PENDING' },
+            orderBy: [{ nextAttemptAt: 'asc' }, { id: 'asc' }],
+            select: { nextAttemptAt: true },
+        }),
+        prisma.contact.findFirst({ where: { campaignId, dialState: 'DIALING' }, select: { id: true } }),
+    ]);
+    const done = !pending && !inFlight;
+    if (done && campaign.status === 'RUNNING') {
+        await prisma.campaign.update({ where: { id: campaignId }, data: { status: 'COMPLETED' } });
+    }
+    return {
+        campaign,
+        contacts: [],
+        done,
+        nextAttemptAt: pending ? nextCallingTime(campaign, pending.nextAttemptAt > now ? pending.nextAttemptAt : now) : null,
+    };
+}
+
+// Move a contact along the queue once its call has an outcome: done, retry later, or give up.
+// Only a contact still DIALING is updated, so duplicate webhooks don't reschedule twice.
+export async function settleAttempt(prisma: PrismaClient, contactId: string, status: string) {
+    if (![...DONE_STATUSES, ...FINAL_STATUSES, ...RETRY_STATUSES].includes(status)) return;
+
+    const contact = await prisma.contact.findUnique({ where: { id: contactId }, include: { campaign: true } });
+    if (!contact || !contact.campaign || contact.dialState !== 'DIALING') return;
+
+    let next: { dialState: string; nextAttemptAt?: Date };
+    if (DONE_STATUSES.includes(status)) {
+        next = { dialState: 'DONE' };
+    } else if (FINAL_STATUSES.includes(status) || contact.attempts >= contact.campaign.maxAttempts) {
+        next = { dialState: 'EXHAUSTED' };
+    } else {
+        next = { dialState: 'PENDING', nextAttemptAt: retryAt(contact.campaign, contact.attempts) };
+    }
+
+    await prisma.contact.updateMany({
+        where: { id: contactId, dialState: 'DIALING' },
+        data: { ...next, lastStatus: status, claimedAt: null, claimedBy: null },
+    });
+}
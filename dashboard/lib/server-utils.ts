@@ -11,6 +11,43 @@ if (!LIVEKIT_URL || !LIVEKIT_API_KEY || !LIVEKIT_API_SECRET) {
 export const roomService = new RoomServiceClient(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET);
 export const sipClient = new SipClient(LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET);
 
+// Outbound trunks to dial through: VOBIZ_SIP_TRUNK_IDS (comma-separated) or the single VOBIZ_SIP_TRUNK_ID
+export function getTrunkIds(): string[] {
+  const ids = (process.env.VOBIZ_SIP_TRUNK_IDS || process.env.VOBIZ_SIP_TRUNK_ID || "")
+    .split(",")
+    .map(id => id.trim())
+    .filter(Boolean);
+  return ids;
+}
+
+let trunkCursor = 0;
+
+// Dial through the trunks round-robin, failing over to the next trunk if one errors.
+// (The agent's own dial-out uses the health-scored pool in trunk_pool.py.)
+export async function createSipParticipantWithFailover(
+  phoneNumber: string,
+  roomName: string,
+  options: Parameters<SipClient["createSipParticipant"]>[3],
+) {
+  const trunkIds = getTrunkIds();
+  if (trunkIds.length === 0) {
+    throw new Error("SIP Trunk not configured");
+  }
+
+  const start = trunkCursor++ % trunkIds.length;
+  let lastError: unknown;
+  for (let i = 0; i < trunkIds.length; i++) {
+    const trunkId = trunkIds[(start + i) % trunkIds.length];
+    try {
+      return await sipClient.createSipParticipant(trunkId, phoneNumber, roomName, options);
+    } catch (e) {
+      console.error(`Dial via trunk ${trunkId} failed, trying next trunk:`, e);
+      lastError = e;
+    }
+  }
+  throw lastError;
+}
+
 import { PrismaClient } from "@prisma/client";
 
 const globalForPrisma = global as unknown as { prisma: PrismaClient };
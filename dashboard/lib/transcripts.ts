@@ -0,0 +1,114 @@
+import { PrismaClient } from "@prisma/client";
+import { settleAttempt } from "./dial-queue";
+
+export interface TranscriptRecord {
+    record_id?: string;   // delivery record id; the agent resends a record until it is saved
+    call_id?: string;     // matches Call.id if we passed it, or we find by other means
+    phone?: string;
+    transcript?: string;
+    turns?: any[];        // per-turn role, text, start/end s, interruptions, tool calls (see call_transcript.py)
+    started_at?: number;  // answer time (epoch seconds)
+    status?: string;
+    duration?: number;
+    analysis?: any;
+    latency?: any;        // per-call turn latency summary (p50/p95 per stage)
+    recording_url?: string; // local path of the call recording, if recording is enabled
+    recording?: any;      // recorder stats (dropped frames, write throughput)
+    amd?: any;            // answering-machine detection outcome (verdict, reason, decision_ms)
+    dial?: any;           // dial-out outcome and ring time (NO_ANSWER, BUSY...)
+    trace?: any;          // call-setup trace id and per-stage ms (see call_tracing.py)
+    audio?: any;          // audio path sample rates, resampling steps and per-call CPU (see telephony_audio.py)
+    transfer?: any;       // transfer attempts: mode, outcome, ring and completion ms (see call_transfer.py)
+}
+
+// Shared by /api/hooks/transcript (one call) and /api/hooks/transcript/bulk (many calls).
+// Idempotent per record_id: a record saved before (and resent after a failed batch) changes nothing.
+export async function saveTranscript(prisma: PrismaClient, record: TranscriptRecord) {
+    const { record_id, call_id, phone, transcript, turns, started_at, status, duration, analysis, latency, recording_url, recording, amd, dial, trace, audio, transfer } = record;
+
+    console.log(`Received transcript for ${phone}: ${status}`);
+
+    if (record_id) {
+        const saved = await prisma.call.findUnique({ where: { deliveryId: record_id } });
+        if (saved) {
+            // Only the dial queue step may be missing (it is a no-op once the contact has moved on)
+            if (saved.campaignId && saved.contactId) {
+                await settleAttempt(prisma, saved.contactId, saved.status);
+            }
+            return saved.id;
+        }
+    }
+
+    // If we have a call_id (passed via metadata), update it.
+    // If not, we might need to find the latest active call for this phone.
+
+    let callRecord;
+
+    if (call_id) {
+        callRecord = await prisma.call.findUnique({ where: { id: call_id } });
+    }
+
+    if (!callRecord && phone) {
+        // Find the most recent PENDING or ACTIVE call for this number
+        callRecord = await prisma.call.findFirst({
+            where: {
+                contact: { phone: phone },
+                // status: { in: ['DISPATCHED', 'ACTIVE'] } // optional filter
+            },
+            orderBy: { createdAt: 'desc' }
+        });
+    }
+
+    if (!callRecord) {
+        // If no record exists (e.g. inbound call or manual testing), create a new one?
+        // Or just log it. Let's create one for data completeness.
+        console.log("No existing call record found. Creating new log.");
+        // We need to find the contact first to link it?
+        let contact = await prisma.contact.findFirst({ where: { phone } });
+        if (!contact) {
+            contact = await prisma.contact.create({ data: { phone: phone || "", name: "Unknown" } });
+        }
+
+        callRecord = await prisma.call.create({
+            data: {
+                contactId: contact.id,
+                direction: "INBOUND", // Assumption if not dispatched
+                status: "COMPLETED",
+                // Set on create: a retry after a failed update must find this row, not create another
+                ...(record_id ? { deliveryId: record_id } : {}),
+            }
+        });
+    }
+
+    // Update the record
+    await prisma.call.update({
+        where: { id: callRecord.id },
+        data: {
+            status: status || "COMPLETED",
+            transcript: transcript || "",
+            ...(turns ? { turns } : {}),
+            analysis: {
+                ...(analysis || {}),
+                ...(latency ? { latency } : {}),
+                ...(recording ? { recording } : {}),
+                ...(amd ? { amd } : {}),
+                ...(dial ? { dial } : {}),
+                ...(trace ? { trace } : {}),
+                ...(audio ? { audio } : {}),
+                ...(transfer ? { transfer } : {}),
+            },
+            duration: duration || 0,
+            ...(recording_url ? { recordingUrl: recording_url } : {}),
+            ...(started_at ? { startedAt: new Date(started_at * 1000) } : {}),
+            ...(record_id ? { deliveryId: record_id } : {}),
+            endedAt: callRecord.endedAt ?? new Date(),
+        }
+    });
+
+    // Campaign calls move their contact along the dial queue (done, retry later, exhausted)
+    if (callRecord.campaignId && callRecord.contactId) {
+        await settleAttempt(prisma, callRecord.contactId, status || "COMPLETED");
+    }
+
+    return callRecord.id;
+}
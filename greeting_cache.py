@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from livekit import rtc
+from livekit.agents import llm
+
+logger = logging.getLogger("greeting-cache")
+
+# Frame size used when replaying cached audio into the session (20ms, like WebRTC).
+FRAME_MS = 20
+
+
+class CachedGreeting:
+    """Pre-rendered greeting audio (16-bit PCM) plus the text it was rendered from."""
+
+    def __init__(self, text: str, pcm: bytes, sample_rate: int, num_channels: int):
+        self.text = text
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+
+    def frames(self):
+        """Split the PCM into 20ms rtc.AudioFrames for session.say()."""
+        samples_per_frame = self.sample_rate * FRAME_MS // 1000
+        frame_bytes = samples_per_frame * self.num_channels * 2
+        for offset in range(0, len(self.pcm), frame_bytes):
+            chunk = self.pcm[offset:offset + frame_bytes]
+            yield rtc.AudioFrame(
+                data=chunk,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(chunk) // (2 * self.num_channels),
+            )
+
+
+class GreetingCache:
+    """
+    Disk-backed LRU of pre-synthesized greeting audio.
+
+    Audio is keyed by (tts provider, model, voice, language, text), so the same
+    greeting is only ever sent to the TTS provider once. Outbound greetings are
+    written by the LLM from the system prompt + INITIAL_GREETING instruction; that
+    text is cached too (keyed by prompt and instruction), so a prompt change
+    produces a new greeting automatically.
+
+    Files live in `cache_dir` as <sha>.pcm + <sha>.json (audio) and <sha>.txt
+    (greeting text). File mtime is the LRU clock; the oldest entries, audio and text
+    alike, are deleted once their files add up to more than `max_bytes`.
+    Recently used audio is also kept in memory. File reads, writes and eviction run in
+    a worker thread, never on the event loop: lookups happen mid-call (peek() from
+    on_user_turn_completed).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, max_memory_entries: int = 32):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._texts = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # --- Keys ---
+
+    @staticmethod
+    def _digest(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.{ext}")
+
+    # --- Greeting text ---
+
+    async def greeting_text(self, llm_client, system_prompt: str, instructions: str) -> str:
+        """
+        Ask the LLM once for the opening line described by `instructions`
+        and cache the result (memory + disk) for this prompt.
+        """
+        digest = self._digest("text", system_prompt, instructions)
+        if digest in self._texts:
+            return self._texts[digest]
+
+        text = await asyncio.to_thread(self._read_text, self._path(digest, "txt"))
+        if text is None:
+            chat_ctx = llm.ChatContext()
+            chat_ctx.add_message(role="system", content=system_prompt)
+            chat_ctx.add_message(role="user", content=instructions)
+
+            parts = []
+            async with llm_client.chat(chat_ctx=chat_ctx) as stream:
+                async for chunk in stream:
+                    if chunk.delta and chunk.delta.content:
+                        parts.append(chunk.delta.content)
+            text = "".join(parts).strip()
+            self._forget(await asyncio.to_thread(self._store_text, digest, text))
+
+        self._texts[digest] = text
+        return text
+
+    @staticmethod
+    def _read_text(path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def _store_text(self, digest: str, text: str) -> list:
+        """Write a greeting text to disk (worker thread). Returns the digests evicted to make room."""
+        with open(self._path(digest, "txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        return self._evict()
+
+    # --- Audio ---
+
+    async def get_or_render(self, tts_client, tts_spec: tuple, text: str) -> CachedGreeting:
+        """Return cached audio for `text` in the voice described by `tts_spec`, rendering it if needed."""
+        digest = self._digest("audio", *tts_spec, text)
+
+        greeting = await self.peek(tts_spec, text)
+        if greeting is None:
+            start = time.perf_counter()
+            greeting = await self._render(tts_client, text)
+            self._remember(digest, greeting)
+            self._forget(await asyncio.to_thread(self._store, digest, greeting))
+            logger.info(f"Rendered greeting ({len(greeting.pcm)} bytes) in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return greeting
+
+    async def peek(self, tts_spec: tuple, text: str):
+        """Return already-rendered audio (memory or disk) without calling the TTS, or None."""
+        digest = self._digest("audio", *tts_spec, text)
+        greeting = self._memory.get(digest)
+        if greeting is not None:
+            self._memory.move_to_end(digest)
+            # Keep the file's LRU clock current; nothing waits for it
+            asyncio.get_running_loop().run_in_executor(None, self._touch, digest)
+            return greeting
+        greeting = await asyncio.to_thread(self._load, digest)
+        if greeting is not None:
+            self._remember(digest, greeting)
+        return greeting
+
+    def _remember(self, digest: str, greeting: CachedGreeting):
+        self._memory[digest] = greeting
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _forget(self, evicted: list):
+        for digest in evicted:
+            self._memory.pop(digest, None)
+            self._texts.pop(digest, None)
+
+    async def _render(self, tts_client, text: str) -> CachedGreeting:
+        pcm = bytearray()
+        sample_rate = tts_client.sample_rate
+        num_channels = tts_client.num_channels
+        async with tts_client.synthesize(text) as stream:
+            async for audio in stream:
+                pcm.extend(bytes(audio.frame.data))
+                sample_rate = audio.frame.sample_rate
+                num_channels = audio.frame.num_channels
+        return CachedGreeting(text, bytes(pcm), sample_rate, num_channels)
+
+    def _load(self, digest: str):
+        meta_path = self._path(digest, "json")
+        pcm_path = self._path(digest, "pcm")
+        if not (os.path.exists(meta_path) and os.path.exists(pcm_path)):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(pcm_path, "rb") as f:
+                pcm = f.read()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable greeting cache entry {digest}: {e}")
+            return None
+        self._touch(digest)
+        return CachedGreeting(meta["text"], pcm, meta["sample_rate"], meta["num_channels"])
+
+    def _store(self, digest: str, greeting: CachedGreeting) -> list:
+        """Write an entry to disk (worker thread). Returns the digests evicted to make room."""
+        # Write the audio first and the metadata last, so a half-written entry is never loaded.
+        with open(self._path(digest, "pcm"), "wb") as f:
+            f.write(greeting.pcm)
+        with open(self._path(digest, "json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "text": greeting.text,
+                "sample_rate": greeting.sample_rate,
+                "num_channels": greeting.num_channels,
+            }, f, ensure_ascii=False)
+        return self._evict()
+
+    def _touch(self, digest: str) -> None:
+        try:
+            os.utime(self._path(digest, "pcm"))
+        except OSError:
+            pass
+
+    def _evict(self) -> list:
+        """
+        Delete least-recently-used entries (an entry's .pcm, .json and .txt files count
+        together) until the cache fits in max_bytes. Returns the deleted digests.
+        """
+        entries = {}  # digest -> [last used, bytes]
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            digest, ext = os.path.splitext(name)
+            if ext not in (".pcm", ".json", ".txt"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entry = entries.setdefault(digest, [0.0, 0])
+            entry[0] = max(entry[0], st.st_mtime)
+            entry[1] += st.st_size
+            total += st.st_size
+
+        evicted = []
+        for digest, (_, size) in sorted(entries.items(), key=lambda e: e[1][0]):
+            if total <= self.max_bytes:
+                break
+            for ext in ("json", "pcm", "txt"):
+                try:
+                    os.remove(self._path(digest, ext))
+                except OSError:
+                    pass
+            evicted.append(digest)
+            total -= size
+            logger.info(f"Evicted greeting {digest} ({size} bytes)")
+        return evicted
+
+    def invalidate(self) -> None:
+        """
+        Forget in-memory greetings. Called when the prompt, greeting or voice
+        changes; new keys are rendered on the next call and old files age out of the LRU.
+        """
+        self._memory.clear()
+        self._texts.clear()
+        logger.info("Greeting cache invalidated")
+
+
+def play(session, greeting: CachedGreeting):
+    """Play a cached greeting into the session without touching the LLM or TTS."""
+    async def _frames():
+        for frame in greeting.frames():
+            yield frame
+
+    return session.say(greeting.text, audio=_frames())
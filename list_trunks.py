@@ -11,6 +11,13 @@ load_dotenv(".env")
 
 from livekit.protocol.sip import ListSIPOutboundTrunkRequest
 
+
+async def list_outbound_trunks(lkapi):
+    """Return every outbound SIP trunk on the LiveKit project (also used by the agent's trunk pool)."""
+    response_out = await lkapi.sip.list_outbound_trunk(ListSIPOutboundTrunkRequest())
+    return list(response_out.items)
+
+
 async def main():
     print("Connecting to LiveKit API...")
     url = os.getenv("LIVEKIT_URL")
@@ -25,8 +32,7 @@ async def main():
     
     try:
         print("Fetching SIP Trunks...")
-        response_out = await lkapi.sip.list_outbound_trunk(ListSIPOutboundTrunkRequest())
-        trunks_out = response_out.items
+        trunks_out = await list_outbound_trunks(lkapi)
         print(f"\nFound {len(trunks_out)} Outbound SIP Trunks:")
         for t in trunks_out:
             print(f"  ID: {t.sip_trunk_id}")
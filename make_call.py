@@ -6,26 +6,257 @@ os.environ['SSL_CERT_FILE'] = certifi.where()
 
 import argparse
 import asyncio
+import csv
 import random
 import json
 import logging
+import sys
+import time
+from datetime import datetime, timezone
+
+import aiohttp
 from dotenv import load_dotenv
 from livekit import api
 
+import call_tracing
+
 # Load environment variables
 load_dotenv(".env")
 
+
+class TokenBucket:
+    """
+    Simple token-bucket rate limiter (calls per second).
+    `burst` tokens can be spent at once; tokens refill at `rate` per second.
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class DialStats:
+    """Live throughput / error-rate counters for a bulk run."""
+    def __init__(self):
+        self.started = time.monotonic()
+        self.dispatched = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        done = self.dispatched + self.failed
+        error_rate = (self.failed / done * 100) if done else 0.0
+        return (f"[{elapsed:7.1f}s] dispatched={self.dispatched} failed={self.failed} "
+                f"skipped={self.skipped} rate={done / elapsed:.1f} calls/s errors={error_rate:.1f}%")
+
+
+def iter_numbers(source):
+    """
+    Stream phone numbers from a CSV file (or stdin) one row at a time,
+    so a 50k-row campaign is never loaded into memory.
+    Uses the 'phone' / 'Phone' / 'PhoneNumber' column if there is a header, otherwise the first column.
+    """
+    reader = csv.reader(source)
+    column = 0
+    for i, row in enumerate(reader):
+        if not row:
+            continue
+        if i == 0:
+            header = [c.strip() for c in row]
+            for name in ("phone", "Phone", "PhoneNumber", "phone_number"):
+                if name in header:
+                    column = header.index(name)
+                    break
+            if not row[column].strip().startswith("+"):
+                continue  # Header row
+        if column < len(row):
+            yield row[column].strip()
+
+
+async def dispatch_call(lk_api: api.LiveKitAPI, phone_number: str, sip_trunk_id: str = None, tracer=None,
+                        room_name: str = None, extra: dict = None):
+    """
+    Dispatch the 'outbound-caller' agent to a fresh room for one phone number.
+    `extra` is merged into the dispatch metadata (call_id, campaign_id, user_prompt, user_data).
+    """
+    # We use a random suffix to ensure room names are unique
+    room_name = room_name or f"call-{phone_number.replace('+', '')}-{random.randint(1000, 9999)}"
+
+    metadata = {"phone_number": phone_number, **(extra or {})}
+    if sip_trunk_id:
+        metadata["sip_trunk_id"] = sip_trunk_id
+
+    # The dispatch span's trace context travels in the metadata; the agent's setup spans join it
+    with call_tracing.dispatch_span(tracer, room_name, metadata):
+        # We explicitly tell LiveKit to send the 'outbound-caller' agent to this room.
+        # We pass the phone number in the 'metadata' field so the agent knows who to dial.
+        dispatch_request = api.CreateAgentDispatchRequest(
+            agent_name="outbound-caller", # Must match agent.py
+            room=room_name,
+            metadata=json.dumps(metadata)
+        )
+        dispatch = await lk_api.agent_dispatch.create_dispatch(dispatch_request)
+    return room_name, dispatch
+
+
+async def run_bulk(lk_api: api.LiveKitAPI, source, trunks: list, concurrency: int, cps: float, tracer=None):
+    """
+    Dial every number from `source` with up to `concurrency` dispatches in flight.
+    Each SIP trunk gets its own token bucket so we stay at (not over) the carrier's CPS limit.
+    """
+    stats = DialStats()
+    buckets = [(trunk, TokenBucket(cps)) for trunk in (trunks or [None])]
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            index, phone_number = item
+            trunk, bucket = buckets[index % len(buckets)]
+            try:
+                await bucket.acquire()
+                await dispatch_call(lk_api, phone_number, trunk, tracer)
+                stats.dispatched += 1
+            except Exception as e:
+                stats.failed += 1
+                print(f"❌ {phone_number}: {e}", file=sys.stderr)
+            finally:
+                queue.task_done()
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(1)
+            print(stats.line())
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    report_task = asyncio.create_task(reporter())
+
+    index = 0
+    for phone_number in iter_numbers(source):
+        if not phone_number.startswith("+"):
+            stats.skipped += 1
+            continue
+        await queue.put((index, phone_number))  # Blocks when workers fall behind (back-pressure)
+        index += 1
+
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    report_task.cancel()
+
+    print("-" * 40)
+    print(stats.line())
+
+
+async def run_campaign(lk_api: api.LiveKitAPI, campaign_id: str, trunks: list, concurrency: int, cps: float,
+                       tracer=None, dashboard_url: str = None):
+    """
+    Work through a Dashboard campaign's dial queue: claim due contacts in batches
+    (POST /api/campaigns/<id>/claim), dispatch each with its call_id, and sleep until the
+    next retry is due. Outcomes come back through the agent's transcript webhook, which
+    reschedules or closes each contact. Several dispatchers can share one campaign.
+    """
+    dashboard_url = (dashboard_url or os.getenv("DASHBOARD_URL", "http://localhost:3000")).rstrip("/")
+    worker_id = f"make-call-{os.getpid()}"
+    stats = DialStats()
+    buckets = [(trunk, TokenBucket(cps)) for trunk in (trunks or [None])]
+    limit = asyncio.Semaphore(concurrency)
+    index = 0
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as http:
+        async def report_failure(call_id: str):
+            # Same webhook the agent posts to; settles the attempt so the contact is retried
+            try:
+                async with http.post(f"{dashboard_url}/api/hooks/transcript",
+                                     json={"call_id": call_id, "status": "FAILED"}) as resp:
+                    resp.raise_for_status()
+            except Exception as e:
+                print(f"⚠️ Could not report failed call {call_id}: {e}", file=sys.stderr)
+
+        async def dial(contact: dict, prompt: str, trunk, bucket):
+            async with limit:
+                try:
+                    await bucket.acquire()
+                    await dispatch_call(
+                        lk_api, contact["phone"], trunk, tracer,
+                        room_name=f"camp-{campaign_id[-4:]}-{contact['callId']}",
+                        extra={
+                            "call_id": contact["callId"],
+                            "campaign_id": campaign_id,
+                            "user_prompt": prompt,
+                            "user_data": contact.get("attributes") or {},
+                        },
+                    )
+                    stats.dispatched += 1
+                except Exception as e:
+                    stats.failed += 1
+                    print(f"❌ {contact['phone']}: {e}", file=sys.stderr)
+                    await report_failure(contact["callId"])
+
+        while True:
+            async with http.post(f"{dashboard_url}/api/campaigns/{campaign_id}/claim",
+                                 json={"limit": concurrency, "worker": worker_id}) as resp:
+                resp.raise_for_status()
+                claim = await resp.json()
+
+            contacts = claim.get("contacts") or []
+            if contacts:
+                tasks = []
+                for contact in contacts:
+                    trunk, bucket = buckets[index % len(buckets)]
+                    index += 1
+                    tasks.append(dial(contact, claim.get("prompt", ""), trunk, bucket))
+                await asyncio.gather(*tasks)
+                print(stats.line())
+                continue
+
+            if claim.get("done"):
+                break
+
+            # Nothing due: wait for the next retry (or for calls in flight to report back)
+            wait = 30.0
+            if claim.get("nextAttemptAt"):
+                due = datetime.fromisoformat(claim["nextAttemptAt"].replace("Z", "+00:00"))
+                wait = min(max((due - datetime.now(timezone.utc)).total_seconds(), 1.0), 300.0)
+                print(f"Next contact due at {due.isoformat()}; waiting {wait:.0f}s")
+            await asyncio.sleep(wait)
+
+    print("-" * 40)
+    print(stats.line())
+    print("Campaign finished: every contact is done or out of attempts.")
+
+
 async def main():
     parser = argparse.ArgumentParser(description="Make an outbound call via LiveKit Agent.")
-    parser.add_argument("--to", required=True, help="The phone number to call (e.g., +91...)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--to", help="The phone number to call (e.g., +91...)")
+    target.add_argument("--csv", help="Bulk mode: CSV file of numbers to dial ('-' for stdin)")
+    target.add_argument("--campaign", help="Campaign mode: work through a Dashboard campaign's dial queue (campaign ID)")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("DIAL_CONCURRENCY", "20")),
+                        help="Bulk / campaign mode: max dispatches in flight")
+    parser.add_argument("--cps", type=float, default=float(os.getenv("DIAL_CPS_PER_TRUNK", "5")),
+                        help="Bulk / campaign mode: calls per second allowed on each SIP trunk")
+    parser.add_argument("--trunk", action="append", default=[],
+                        help="Bulk / campaign mode: SIP trunk ID to spread calls over (repeatable)")
     args = parser.parse_args()
 
-    # 1. Validation
-    phone_number = args.to.strip()
-    if not phone_number.startswith("+"):
-        print("Error: Phone number must start with '+' and country code.")
-        return
-
     url = os.getenv("LIVEKIT_URL")
     api_key = os.getenv("LIVEKIT_API_KEY")
     api_secret = os.getenv("LIVEKIT_API_SECRET")
@@ -34,27 +265,45 @@ async def main():
         print("Error: LiveKit credentials missing in .env.local")
         return
 
-    # 2. Setup API Client
-    lk_api = api.LiveKitAPI(url=url, api_key=api_key, api_secret=api_secret)
+    if args.to:
+        # 1. Validation
+        phone_number = args.to.strip()
+        if not phone_number.startswith("+"):
+            print("Error: Phone number must start with '+' and country code.")
+            return
 
-    # 3. Create a unique room for this call
-    # We use a random suffix to ensure room names are unique
-    room_name = f"call-{phone_number.replace('+', '')}-{random.randint(1000, 9999)}"
+    # 2. Setup API Client (one shared client for every dispatch)
+    lk_api = api.LiveKitAPI(url=url, api_key=api_key, api_secret=api_secret)
 
-    print(f"Initating call to {phone_number}...")
-    print(f"Session Room: {room_name}")
+    # Dispatch spans, joined by the agent's call-setup spans (same TRACE_DIR as agent.py)
+    tracer_provider = None
+    tracer = None
+    if os.getenv("TRACING_ENABLED", "true").lower() == "true":
+        tracer_provider = call_tracing.new_tracer_provider(os.getenv("TRACE_DIR", ".cache/traces"), "make-call")
+        tracer = tracer_provider.get_tracer("make-call")
 
     try:
-        # 4. Dispatch the Agent
-        # We explicitly tell LiveKit to send the 'outbound-caller' agent to this room.
-        # We pass the phone number in the 'metadata' field so the agent knows who to dial.
-        dispatch_request = api.CreateAgentDispatchRequest(
-            agent_name="outbound-caller", # Must match agent.py
-            room=room_name,
-            metadata=json.dumps({"phone_number": phone_number})
-        )
-        
-        dispatch = await lk_api.agent_dispatch.create_dispatch(dispatch_request)
+        if args.campaign:
+            print(f"Dialing campaign {args.campaign} "
+                  f"(concurrency={args.concurrency}, cps/trunk={args.cps}, trunks={args.trunk or ['agent default']})")
+            await run_campaign(lk_api, args.campaign, args.trunk, args.concurrency, args.cps, tracer)
+            return
+
+        if args.csv:
+            print(f"Bulk dialing from {'stdin' if args.csv == '-' else args.csv} "
+                  f"(concurrency={args.concurrency}, cps/trunk={args.cps}, trunks={args.trunk or ['agent default']})")
+            if args.csv == "-":
+                await run_bulk(lk_api, sys.stdin, args.trunk, args.concurrency, args.cps, tracer)
+            else:
+                with open(args.csv, newline="") as f:
+                    await run_bulk(lk_api, f, args.trunk, args.concurrency, args.cps, tracer)
+            return
+
+        print(f"Initating call to {phone_number}...")
+
+        # 3. Create a unique room for this call and dispatch the agent
+        room_name, dispatch = await dispatch_call(lk_api, phone_number, tracer=tracer)
+        print(f"Session Room: {room_name}")
 
         print("\n✅ Call Dispatched Successfully!")
         print(f"Dispatch ID: {dispatch.id}")
@@ -67,6 +316,8 @@ async def main():
     
     finally:
         await lk_api.aclose()
+        if tracer_provider is not None:
+            tracer_provider.shutdown()  # Flush the dispatch spans
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+
+from livekit.agents import llm
+
+logger = logging.getLogger("pipeline-warmup")
+
+# First thing a callee usually says; primes the same prompt prefix the first real turn uses
+_PRIME_UTTERANCE = "Hello?"
+
+
+class PipelineWarmup:
+    """
+    Uses the ringing period to get the first reply's connections hot.
+
+    The session prewarms its own STT/LLM/TTS when it starts, but not the fallback
+    providers of a chain, and a connection alone doesn't warm the provider side.
+    While the phone rings this opens connections for every client the call may use
+    and, with `prime_llm`, sends each LLM the call's system prompt and tools and
+    stops at the first token, so the provider's prompt cache is warm for the first
+    real turn. Priming costs one tiny completion per LLM per call; `primers` (same
+    order as `llm_clients`) lets the session's own LLM be primed through a side client,
+    so the priming request isn't counted as a turn in the session's metrics.
+    """
+
+    def __init__(self, stt_client, llm_clients: list, tts_clients: list, prime_llm: bool = True,
+                 timeout: float = 10.0, primers: list = None):
+        self.stt_client = stt_client
+        self.llm_clients = llm_clients  # [(name, client)]
+        self.primers = primers or llm_clients  # [(name, client)] the prime requests go to
+        self.tts_clients = tts_clients  # [(name, client)]
+        self.prime_llm = prime_llm
+        self.timeout = timeout
+        self.timings = {}
+        self._task = None
+
+    def start(self, system_prompt: str, tools: list):
+        """Start warming up in the background (call when dialing starts)."""
+        self._task = asyncio.create_task(self._run(system_prompt, tools))
+        self._task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _run(self, system_prompt: str, tools: list):
+        start = time.perf_counter()
+        for client in [self.stt_client] + [c for _, c in self.tts_clients] + [c for _, c in self.llm_clients]:
+            try:
+                client.prewarm()
+            except Exception as e:
+                logger.debug(f"prewarm() failed for {type(client).__name__}: {e}")
+        if self.prime_llm:
+            chat_ctx = llm.ChatContext()
+            chat_ctx.add_message(role="system", content=system_prompt)
+            chat_ctx.add_message(role="user", content=_PRIME_UTTERANCE)
+            await asyncio.gather(*(self._prime(name, client, chat_ctx, tools) for name, client in self.primers))
+        self.timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(f"Pipeline warm-up done: {self.timings}")
+
+    async def _prime(self, name: str, client, chat_ctx: llm.ChatContext, tools: list):
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with client.chat(chat_ctx=chat_ctx, tools=tools) as stream:
+                    async for _ in stream:
+                        break
+            self.timings[f"llm_{name}_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            logger.warning(f"Could not prime LLM {name}: {e}")
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def summary(self) -> dict:
+        return dict(self.timings, done=self._task is not None and self._task.done())
@@ -0,0 +1,365 @@
+import asyncio
+import dataclasses
+import fcntl
+import json
+import logging
+import os
+import time
+
+from livekit.agents import tokenize, tts
+
+logger = logging.getLogger("provider-chain")
+
+
+class CircuitBreaker:
+    """
+    Takes a provider out of rotation after `failures` consecutive failures (errors, or
+    missing the deadline and losing the race). After `cooldown` seconds one request is
+    let through again (half-open); success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failures: int = 3, cooldown: float = 30.0, streak: int = 0, open_until: float = 0.0):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.streak = streak
+        self.open_until = open_until
+
+    def available(self) -> bool:
+        return time.time() >= self.open_until
+
+    def record(self, ok: bool) -> bool:
+        """Record an outcome. Returns True if this failure opened the breaker."""
+        if ok:
+            self.streak = 0
+            self.open_until = 0.0
+            return False
+        self.streak += 1
+        if self.streak >= self.failures and self.available():
+            self.open_until = time.time() + self.cooldown
+            return True
+        return False
+
+    def state(self) -> dict:
+        return {"streak": self.streak, "open_until": self.open_until}
+
+
+class ProviderHealth:
+    """
+    Circuit breakers and win/loss/latency counters for provider chains.
+
+    Job processes run one call each, so breaker state lives in a small JSON file guarded
+    by an fcntl lock (like TrunkPool's), shared by every job process of the worker: a
+    provider that failed in earlier calls stays out of rotation for the next ones. Chains
+    read an in-memory copy (loaded at call start, refreshed by every write); outcomes are
+    written off the event loop. Counters and first-output latencies go to the shared
+    LatencyHistograms (/metrics).
+    """
+
+    def __init__(self, failures: int = 3, cooldown: float = 30.0, histograms=None, state_path: str = None):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.histograms = histograms
+        self.state_path = state_path
+        self._breakers = {}
+        self._writes = set()
+        if state_path:
+            os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+
+    def breaker(self, kind: str, name: str) -> CircuitBreaker:
+        key = f"{kind}|{name}"
+        if key not in self._breakers:
+            self._breakers[key] = CircuitBreaker(self.failures, self.cooldown)
+        return self._breakers[key]
+
+    def order(self, kind: str, names: list) -> list:
+        """Chain order with providers whose breaker is open left out (all of them if none is up)."""
+        up = [n for n in names if self.breaker(kind, n).available()]
+        return up or list(names)
+
+    def event(self, event: str, kind: str, name: str):
+        if self.histograms is not None:
+            self.histograms.count(event, kind, name)
+
+    def record(self, kind: str, name: str, ok: bool):
+        if not self.state_path:
+            self._opened(kind, name, self.breaker(kind, name).record(ok))
+            return
+        # Take effect for this call right away; the shared file decides whether it opened
+        self.breaker(kind, name).record(ok)
+        try:
+            task = asyncio.get_running_loop().create_task(self._write(kind, name, ok))
+        except RuntimeError:
+            return  # No loop (scripts): this process's breaker is all there is
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    def _opened(self, kind: str, name: str, opened: bool):
+        if opened:
+            logger.warning(f"{kind} provider {name} degraded; out of rotation for {self.cooldown:.0f}s")
+            self.event("breaker_open", kind, name)
+
+    def first_output(self, kind: str, name: str, ms: float):
+        if self.histograms is not None:
+            self.histograms.observe(f"{kind}_first_output", name, ms)
+
+    # --- Shared state ---
+
+    async def load(self):
+        """Pick up breaker state written by earlier calls (call start)."""
+        if self.state_path:
+            try:
+                _, state = await asyncio.to_thread(self._locked, lambda state: None)
+                self._apply(state)
+            except OSError as e:
+                logger.warning(f"Could not read provider health: {e}")
+
+    async def flush(self):
+        """Wait for outcome writes still in flight (call end, before the process exits)."""
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def _write(self, kind: str, name: str, ok: bool):
+        key = f"{kind}|{name}"
+
+        def mutate(state):
+            breaker = CircuitBreaker(self.failures, self.cooldown, **state.get(key, {}))
+            opened = breaker.record(ok)
+            state[key] = breaker.state()
+            return opened
+
+        try:
+            opened, state = await asyncio.to_thread(self._locked, mutate)
+        except OSError as e:
+            logger.warning(f"Could not write provider health: {e}")
+            return
+        self._opened(kind, name, opened)
+        self._apply(state)
+
+    def _apply(self, state: dict):
+        for key, entry in state.items():
+            breaker = self._breakers.setdefault(key, CircuitBreaker(self.failures, self.cooldown))
+            breaker.streak = entry.get("streak", 0)
+            breaker.open_until = entry.get("open_until", 0.0)
+
+    def _locked(self, mutate) -> tuple:
+        """Run mutate(state) under an exclusive file lock and persist; returns (result, state)."""
+        with open(self.state_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                result = mutate(state)
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+                return result, state
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class _Attempt:
+    def __init__(self, name: str, task: asyncio.Task, started_at: float):
+        self.name = name
+        self.task = task
+        self.started_at = started_at
+        self.missed_deadline = False
+
+
+class ProviderChain:
+    """
+    Ordered providers of one kind ("llm" or "tts") for one call, raced with a deadline.
+
+    The first available provider starts. If it has produced nothing by `deadline` seconds,
+    the next one is started as well (hedge); whichever yields first wins and the others
+    are cancelled. A provider that errors before producing output fails over to the next
+    one immediately. Errors after output has started are raised (the reply can't be spliced).
+    """
+
+    def __init__(self, kind: str, clients: list, health: ProviderHealth, deadline: float):
+        self.kind = kind
+        self.clients = dict(clients)  # name -> plugin client, in chain order
+        self.names = [name for name, _ in clients]
+        self.health = health
+        self.deadline = deadline
+        self.stats = {"requests": 0, "hedges": 0, "failovers": 0, "wins": {}}
+
+    def __len__(self):
+        return len(self.names)
+
+    async def race(self, open_stream):
+        """
+        Yield the items of the winning provider. `open_stream(name, client)` returns an
+        async iterator of output items (ChatChunks, audio frames) for that provider.
+        """
+        self.stats["requests"] += 1
+        pending = list(self.health.order(self.kind, self.names))
+        queue = asyncio.Queue()
+        attempts = {}
+        winner = None
+
+        async def run(name):
+            try:
+                async for item in open_stream(name, self.clients[name]):
+                    await queue.put((name, "item", item))
+                await queue.put((name, "done", None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await queue.put((name, "error", e))
+
+        def start_next() -> bool:
+            if not pending:
+                return False
+            name = pending.pop(0)
+            attempts[name] = _Attempt(name, asyncio.create_task(run(name)), time.perf_counter())
+            return True
+
+        start_next()
+        hedge_at = time.perf_counter() + self.deadline
+        try:
+            while True:
+                timeout = None
+                if winner is None and pending:
+                    timeout = max(0.0, hedge_at - time.perf_counter())
+                try:
+                    name, kind, payload = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    # Deadline passed with no output: hedge to the next provider
+                    for attempt in attempts.values():
+                        attempt.missed_deadline = True
+                    logger.info(f"No {self.kind} output after {self.deadline:.2f}s; hedging to {pending[0]}")
+                    self.stats["hedges"] += 1
+                    self.health.event("hedge", self.kind, pending[0])
+                    start_next()
+                    hedge_at = time.perf_counter() + self.deadline
+                    continue
+
+                if winner is not None and name != winner:
+                    continue  # Loser still draining before cancellation
+
+                if kind == "error":
+                    self.health.record(self.kind, name, False)
+                    self.health.event("error", self.kind, name)
+                    attempts.pop(name, None)
+                    if winner is not None:
+                        raise payload
+                    logger.warning(f"{self.kind} provider {name} failed: {payload}")
+                    if not attempts:
+                        if not start_next():
+                            raise payload
+                        self.stats["failovers"] += 1
+                        hedge_at = time.perf_counter() + self.deadline
+                    continue
+
+                if winner is None:
+                    winner = name
+                    self._decide(winner, attempts)
+                if kind == "done":
+                    return
+                yield payload
+        finally:
+            for attempt in attempts.values():
+                if not attempt.task.done():
+                    attempt.task.cancel()
+
+    def _decide(self, winner: str, attempts: dict):
+        attempt = attempts[winner]
+        self.health.first_output(self.kind, winner, (time.perf_counter() - attempt.started_at) * 1000)
+        self.health.record(self.kind, winner, True)
+        self.health.event("win", self.kind, winner)
+        self.stats["wins"][winner] = self.stats["wins"].get(winner, 0) + 1
+        for name, other in list(attempts.items()):
+            if name == winner:
+                continue
+            other.task.cancel()
+            self.health.event("loss", self.kind, name)
+            if other.missed_deadline:
+                self.health.record(self.kind, name, False)
+            del attempts[name]
+
+    def summary(self) -> dict:
+        return {"chain": self.names, **self.stats}
+
+
+# --- Stream openers used by OutboundAssistant.llm_node / tts_node ---
+
+def llm_opener(chat_ctx, tools, tool_choice, conn_options):
+    """open_stream() for LLM chains. No per-provider retries: the chain is the retry."""
+    conn_options = dataclasses.replace(conn_options, max_retry=0)
+
+    async def open_stream(name, client):
+        async with client.chat(chat_ctx=chat_ctx, tools=tools, tool_choice=tool_choice,
+                               conn_options=conn_options) as stream:
+            async for chunk in stream:
+                yield chunk
+
+    return open_stream
+
+
+class TextTee:
+    """Reads the LLM text stream once and replays it to every TTS attempt."""
+
+    def __init__(self, source):
+        self.chunks = []
+        self.done = False
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._changed.set()
+        finally:
+            self.done = True
+            self._changed.set()
+
+    async def replay(self):
+        i = 0
+        while True:
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.done:
+                return
+            self._changed.clear()
+            if i == len(self.chunks) and not self.done:
+                await self._changed.wait()
+
+    def close(self):
+        self._task.cancel()
+
+
+def tts_opener(text: TextTee, conn_options):
+    """open_stream() for TTS chains, mirroring Agent.default.tts_node for any TTS client."""
+    conn_options = dataclasses.replace(conn_options, max_retry=0)
+
+    async def open_stream(name, client):
+        adapter = None
+        if not client.capabilities.streaming:
+            adapter = client = tts.StreamAdapter(
+                tts=client, sentence_tokenizer=tokenize.blingfire.SentenceTokenizer(retain_format=True),
+            )
+        try:
+            async with client.stream(conn_options=conn_options) as stream:
+                async def forward():
+                    async for chunk in text.replay():
+                        stream.push_text(chunk)
+                    stream.end_input()
+
+                forward_task = asyncio.create_task(forward())
+                try:
+                    async for ev in stream:
+                        yield ev.frame
+                finally:
+                    forward_task.cancel()
+        finally:
+            if adapter is not None:
+                await adapter.aclose()
+
+    return open_stream
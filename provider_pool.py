@@ -0,0 +1,42 @@
+import logging
+import time
+
+logger = logging.getLogger("provider-pool")
+
+
+class ProviderPool:
+    """
+    Process-wide pool of ready-to-use STT / LLM / TTS plugin clients.
+
+    Plugin objects are safe to share between sessions (each session opens its
+    own streams on them), so we build each distinct (kind, provider, model, voice)
+    combination once per worker process and hand the same instance to every job.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        # How long it took to build each client the first time (ms).
+        # A later job that borrows the client "saves" this much setup time.
+        self._setup_ms = {}
+
+    def borrow(self, key: tuple, factory):
+        """
+        Get the client for `key`, building it with `factory()` on first use.
+
+        Returns:
+            (client, saved_ms) - saved_ms is 0 when the client had to be built now.
+        """
+        if key in self._clients:
+            return self._clients[key], self._setup_ms.get(key, 0.0)
+
+        start = time.perf_counter()
+        client = factory()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self._clients[key] = client
+        self._setup_ms[key] = elapsed_ms
+        logger.info(f"Built {key} in {elapsed_ms:.1f} ms")
+        return client, 0.0
+
+    def __len__(self):
+        return len(self._clients)
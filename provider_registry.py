@@ -0,0 +1,176 @@
+import importlib
+import logging
+import os
+import time
+
+import text_chunker
+from telephony_audio import sample_rate
+
+logger = logging.getLogger("provider-registry")
+
+# livekit.plugins.<name> modules imported so far, and how long each import took
+_modules = {}
+_import_ms = {}
+_providers = {}  # (kind, name) -> Provider
+
+
+class Provider:
+    """
+    A selectable STT / LLM / TTS backend.
+
+    `spec(cfg, voice)` reads the provider's settings (env vars, config.py) and returns
+    them as a tuple; the tuple is also the provider-pool key. `build(module, *settings)`
+    makes a client from the provider's plugin module, which is imported on first build.
+    `voices` are voice names that select this provider whatever the configured one is.
+    """
+
+    def __init__(self, kind: str, name: str, plugin: str, spec, build, voices=()):
+        self.kind = kind
+        self.name = name
+        self.plugin = plugin
+        self.spec = spec
+        self.build = build
+        self.voices = tuple(voices)
+
+    def create(self, settings: tuple):
+        return self.build(load_plugin(self.plugin), *settings)
+
+
+def register(kind: str, name: str, plugin: str, spec, build, voices=()) -> Provider:
+    """
+    Make a provider selectable by name (Dashboard `model_provider`, TTS_PROVIDER, the chains).
+
+        register("tts", "elevenlabs", "elevenlabs",
+                 spec=lambda cfg, voice: (voice or os.getenv("ELEVEN_VOICE"),),
+                 build=lambda elevenlabs, voice: elevenlabs.TTS(voice_id=voice))
+    """
+    provider = Provider(kind, name.lower(), plugin, spec, build, voices)
+    _providers[(kind, provider.name)] = provider
+    return provider
+
+
+def get(kind: str, name: str, default: str = None) -> Provider:
+    """The provider registered as `name`, else `default` (unknown names fall back, as before)."""
+    provider = _providers.get((kind, (name or "").lower()))
+    if provider is None and default is not None:
+        provider = _providers[(kind, default)]
+    return provider
+
+
+def for_voice(kind: str, voice: str):
+    """The provider that owns a voice name (e.g. Sarvam's "anushka"), if any."""
+    for (k, _), provider in _providers.items():
+        if k == kind and voice in provider.voices:
+            return provider
+    return None
+
+
+def load_plugin(name: str):
+    """
+    Import livekit.plugins.<name> on first use. Plugins register themselves with the
+    framework on import, which must happen on the main thread (prewarm / the job loop).
+    """
+    module = _modules.get(name)
+    if module is None:
+        start = time.perf_counter()
+        module = importlib.import_module(f"livekit.plugins.{name}")
+        _import_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+        _modules[name] = module
+        logger.info(f"Imported plugin {name} in {_import_ms[name]:.0f} ms")
+    return module
+
+
+def load_all():
+    """Import every registered plugin (for `download-files`, which only sees imported plugins)."""
+    for name in sorted({p.plugin for p in _providers.values()} | {"silero", "noise_cancellation"}):
+        load_plugin(name)
+
+
+def import_profile() -> dict:
+    """{plugin: import ms} for the plugins this process has imported."""
+    return dict(_import_ms)
+
+
+# --- Built-in providers ---
+
+register(
+    "tts", "openai", "openai",
+    spec=lambda cfg, voice: (
+        os.getenv("OPENAI_TTS_MODEL", "tts-1"),
+        voice or os.getenv("OPENAI_TTS_VOICE", cfg.DEFAULT_TTS_VOICE),
+        None,
+        sample_rate(cfg),
+        text_chunker.settings(cfg),
+    ),
+    # OpenAI only speaks 24 kHz: in telephony mode take raw PCM (no MP3 decode), resampled once on output.
+    # It has no streaming input, so the chunker comes with a StreamAdapter.
+    build=lambda openai, model, voice, language, rate, chunking: text_chunker.adapt(
+        openai.TTS(model=model, voice=voice, **({"response_format": "pcm"} if rate else {})), chunking
+    ),
+)
+register(
+    "tts", "cartesia", "cartesia",
+    spec=lambda cfg, voice: (
+        os.getenv("CARTESIA_TTS_MODEL", cfg.CARTESIA_MODEL),
+        os.getenv("CARTESIA_TTS_VOICE", cfg.CARTESIA_VOICE),
+        None,
+        sample_rate(cfg),
+        text_chunker.settings(cfg),
+    ),
+    build=lambda cartesia, model, voice, language, rate, chunking: cartesia.TTS(
+        model=model, voice=voice,
+        **({"sample_rate": rate} if rate else {}),
+        **({"tokenizer": text_chunker.tokenizer(chunking)} if chunking else {}),
+    ),
+)
+def _sarvam_tts(sarvam, model, voice, language, rate, chunking):
+    client = sarvam.TTS(
+        model=model, speaker=voice, target_language_code=language,
+        **({"speech_sample_rate": rate} if rate else {}),
+    )
+    if chunking:
+        # No constructor argument for it: streaming input otherwise goes through the
+        # framework's English-only basic sentence tokenizer
+        client._opts.word_tokenizer = text_chunker.tokenizer(chunking)
+    return client
+
+
+register(
+    "tts", "sarvam", "sarvam",
+    spec=lambda cfg, voice: (
+        os.getenv("SARVAM_TTS_MODEL", cfg.SARVAM_MODEL),
+        voice or os.getenv("SARVAM_VOICE", "anushka"),
+        os.getenv("SARVAM_LANGUAGE", cfg.SARVAM_LANGUAGE),
+        sample_rate(cfg),
+        text_chunker.settings(cfg),
+    ),
+    build=_sarvam_tts,
+    voices=("anushka", "aravind", "amartya", "dhruv"),
+)
+
+register(
+    "llm", "openai", "openai",
+    spec=lambda cfg, voice=None: (cfg.DEFAULT_LLM_MODEL,),
+    build=lambda openai, model: openai.LLM(model=model),
+)
+register(
+    "llm", "groq", "openai",
+    spec=lambda cfg, voice=None: (
+        os.getenv("GROQ_MODEL", cfg.GROQ_MODEL),
+        float(os.getenv("GROQ_TEMPERATURE", str(cfg.GROQ_TEMPERATURE))),
+    ),
+    build=lambda openai, model, temperature: openai.LLM(
+        base_url="https://api.groq.com/openai/v1",
+        api_key=os.getenv("GROQ_API_KEY"),
+        model=model,
+        temperature=temperature,
+    ),
+)
+
+register(
+    "stt", "deepgram", "deepgram",
+    spec=lambda cfg, voice=None: (cfg.STT_MODEL, cfg.STT_LANGUAGE, sample_rate(cfg)),
+    build=lambda deepgram, model, language, rate: deepgram.STT(
+        model=model, language=language, **({"sample_rate": rate} if rate else {})
+    ),
+)
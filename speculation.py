@@ -0,0 +1,284 @@
+import asyncio
+import difflib
+import logging
+import time
+
+from livekit.agents import NOT_GIVEN, llm, utils
+
+from answer_cache import normalize
+
+logger = logging.getLogger("speculation")
+
+
+def similarity(a: str, b: str) -> float:
+    """Word-level similarity (0-1) of two transcripts, ignoring case, punctuation and fillers."""
+    a_words, b_words = normalize(a).split(), normalize(b).split()
+    if not a_words or not b_words:
+        return 0.0
+    return difflib.SequenceMatcher(None, a_words, b_words).ratio()
+
+
+class _Speculation:
+    """One background LLM generation for an interim transcript, buffered so it can be replayed."""
+
+    def __init__(self, text: str, prefix_ids: list, tools: list, stream_factory):
+        self.text = text
+        self.prefix_ids = prefix_ids
+        self.tools = tools
+        self.started_at = time.perf_counter()
+        self.first_chunk_at = None
+        self.request_id = None
+        self.metrics = None  # LLMMetrics of the generation, once it has ended
+        self.chunks = []
+        self.done = False
+        self.committed = False
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._run(stream_factory))
+
+    async def _run(self, stream_factory):
+        try:
+            async with stream_factory() as stream:
+                async for chunk in stream:
+                    if self.first_chunk_at is None:
+                        self.first_chunk_at = time.perf_counter()
+                        self.request_id = chunk.id
+                    self.chunks.append(chunk)
+                    self._changed.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Speculative generation failed: {e}")
+        finally:
+            self.done = True
+            self._changed.set()
+
+    async def replay(self):
+        """Yield every chunk produced so far, then follow the live stream to the end."""
+        i = 0
+        while True:
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.done:
+                return
+            self._changed.clear()
+            if i == len(self.chunks) and not self.done:
+                await self._changed.wait()
+
+    def failed(self) -> bool:
+        return self.done and not self.chunks
+
+    def cancel(self):
+        self._task.cancel()
+
+
+class Speculator:
+    """
+    Speculative LLM generation from interim STT transcripts for one call.
+
+    When an interim transcript is stable (the same words twice in a row, or the caller
+    stops speaking), the LLM starts generating in the background. When the agent's
+    llm_node runs for the final transcript, the speculative output is used if the final
+    text is within `threshold` word similarity of the interim and the chat history is
+    unchanged; otherwise it is discarded and a normal generation runs. A newer stable
+    interim that diverges past the threshold restarts the speculation.
+
+    The framework's own preemptive generation (on final transcripts, before end of turn)
+    calls llm_node too, so the two compose: TTS can start preemptively on the committed
+    speculative output (SPECULATIVE_TTS).
+
+    `llm_client` is a side client, not the session's: discarded generations must not
+    show up in the turn's LLM metrics. A committed generation is the turn's reply, so its
+    metrics are passed on to the session's LLM as if it had made the request.
+    """
+
+    def __init__(self, llm_client, threshold: float = 0.9, min_words: int = 2,
+                 max_attempts: int = 3, histograms=None, language: str = "unknown", prepare=None):
+        self.llm_client = llm_client
+        self.prepare = prepare
+        self.threshold = threshold
+        self.min_words = min_words
+        self.max_attempts = max_attempts
+        self.histograms = histograms
+        self.language = language
+        self.agent = None
+        self.session = None
+        self.turns = []
+        self._current = None
+        self._committed = None
+        self._last_interim = ""
+        self._attempts = 0
+        self._measures = set()
+
+    def attach(self, session, agent):
+        self.session = session
+        self.agent = agent
+        session.on("user_input_transcribed", self._on_transcribed)
+        session.on("user_state_changed", self._on_user_state)
+        self.llm_client.on("metrics_collected", self._on_metrics)
+
+    # --- Triggers ---
+
+    def _on_transcribed(self, ev):
+        if ev.is_final:
+            return
+        if ev.language:
+            self.language = ev.language
+        text = ev.transcript.strip()
+        stable = normalize(text) == normalize(self._last_interim)
+        self._last_interim = text
+        if stable:
+            self._speculate(text)
+
+    def _on_user_state(self, ev):
+        if ev.new_state == "speaking":
+            current = self._current
+            if current is not None:
+                if current.committed:
+                    # Previous turn resolved; start fresh
+                    self._attempts = 0
+                else:
+                    # Never taken (the caller kept talking, or the turn ended without an LLM
+                    # reply): its text is stale, so stop the generation rather than let it run on
+                    current.cancel()
+                self._current = None
+            self._last_interim = ""
+        elif ev.old_state == "speaking" and self._last_interim:
+            # End of speech (VAD): the latest interim is as good as it gets before the final
+            self._speculate(self._last_interim)
+
+    def _speculate(self, text: str):
+        if self.agent is None or len(normalize(text).split()) < self.min_words:
+            return
+        current = self._current
+        if current is not None and not current.committed and similarity(current.text, text) >= self.threshold:
+            return  # Still on track
+        if self._attempts >= self.max_attempts:
+            return
+        if current is not None:
+            current.cancel()
+
+        chat_ctx = self.agent.chat_ctx.copy()
+        prefix_ids = [item.id for item in chat_ctx.items]
+        chat_ctx.add_message(role="user", content=text)
+        if self.prepare is not None:
+            chat_ctx = self.prepare(chat_ctx)
+        tools = list(self.agent.tools)
+        conn_options = self.session.conn_options.llm_conn_options
+
+        self._attempts += 1
+        self._current = _Speculation(
+            text, prefix_ids, tools,
+            lambda: self.llm_client.chat(chat_ctx=chat_ctx, tools=tools, conn_options=conn_options),
+        )
+        logger.debug(f"Speculating on interim '{text}' (attempt {self._attempts})")
+
+    # --- Commit ---
+
+    def take(self, chat_ctx: llm.ChatContext, tools: list, model_settings):
+        """
+        Return a chunk iterator for this llm_node call if the speculation matches, else None.
+        Called from OutboundAssistant.llm_node.
+        """
+        current = self._current
+        if current is None or current.failed():
+            return None
+
+        items = chat_ctx.items
+        final = items[-1].text_content if items and getattr(items[-1], "role", None) == "user" else None
+        tool_choice = getattr(model_settings, "tool_choice", NOT_GIVEN)
+        score = similarity(current.text, final or "")
+        matches = (
+            final is not None
+            and score >= self.threshold
+            and [item.id for item in items[:-1]] == current.prefix_ids
+            and list(tools) == current.tools
+            and not utils.is_given(tool_choice)
+        )
+
+        if not matches:
+            if not current.committed:
+                current.cancel()
+                self._current = None
+                self._record(hit=False, score=score)
+            return None
+
+        if not current.committed:
+            current.committed = True
+            self._committed = current
+            self._record(hit=True, score=score, called_at=time.perf_counter())
+            if current.metrics is not None:
+                self._forward(current.metrics)
+        return current.replay()
+
+    def _on_metrics(self, m):
+        for spec in (self._current, self._committed):
+            if spec is not None and spec.request_id and spec.request_id == m.request_id:
+                spec.metrics = m
+                if spec.committed:
+                    self._forward(m)
+                return
+
+    def _forward(self, m):
+        """Report a committed generation's metrics through the session's LLM (turn tallies, TurnTracker)."""
+        session_llm = getattr(self.session, "llm", None)
+        if session_llm is not None and hasattr(session_llm, "emit"):
+            session_llm.emit("metrics_collected", m)
+
+    def discard(self):
+        """The turn ended without a reply from the LLM (cached answer, answering machine): drop its speculation."""
+        if self._current is not None:
+            self._current.cancel()
+            self._current = None
+        self._attempts = 0
+
+    def _record(self, hit: bool, score: float, called_at: float = None):
+        current = self._current
+        turn = {"hit": hit, "similarity": round(score, 2), "attempts": self._attempts}
+        if hit:
+            # Without speculation the first token would arrive at called_at + ttft;
+            # with it, at max(called_at, started_at + ttft). Finish once the first token is in.
+            turn["saved_ms"] = None
+            task = asyncio.create_task(self._measure_saved(current, called_at, turn))
+            self._measures.add(task)
+            task.add_done_callback(self._measures.discard)
+        else:
+            self._attempts = 0
+        self.turns.append(turn)
+
+    async def _measure_saved(self, current: _Speculation, called_at: float, turn: dict):
+        while current.first_chunk_at is None and not current.done:
+            current._changed.clear()
+            if current.first_chunk_at is None and not current.done:
+                await current._changed.wait()
+        if current.first_chunk_at is None:
+            return
+        ttft = current.first_chunk_at - current.started_at
+        saved_ms = max(0.0, min(ttft, called_at - current.started_at)) * 1000
+        turn["saved_ms"] = round(saved_ms, 1)
+        if self.histograms is not None:
+            self.histograms.observe("speculation_saved", self.language, saved_ms)
+
+    # --- Reporting ---
+
+    def close(self):
+        if self._current is not None and not self._current.committed:
+            self._current.cancel()
+        self._current = None
+        # A reply whose first token never came saved nothing (its saved_ms stays None)
+        for task in list(self._measures):
+            task.cancel()
+        self.llm_client.off("metrics_collected", self._on_metrics)
+
+    def summary(self) -> dict:
+        """Per-call speculation stats for the transcript payload (tune threshold per language)."""
+        hits = [t for t in self.turns if t["hit"]]
+        saved = [t["saved_ms"] for t in hits if t.get("saved_ms") is not None]
+        return {
+            "language": self.language,
+            "turns": len(self.turns),
+            "hits": len(hits),
+            "hit_rate": round(len(hits) / len(self.turns), 3) if self.turns else 0.0,
+            "saved_ms": round(sum(saved) / len(saved), 1) if saved else 0.0,
+            "per_turn": self.turns,
+        }
@@ -0,0 +1,89 @@
+import logging
+import time
+
+logger = logging.getLogger("telephony-audio")
+
+# Silero VAD only runs at these rates, and SIP audio carries nothing above 8 kHz anyway
+SUPPORTED_RATES = (8000, 16000)
+DEFAULT_RATE = 16000
+
+
+def sample_rate(cfg) -> int:
+    """
+    The one sample rate a call's audio runs at in telephony mode (TELEPHONY_AUDIO), or
+    None to leave every component at its own default (24 kHz room audio, 16 kHz VAD/STT).
+    """
+    if not cfg.TELEPHONY_AUDIO:
+        return None
+    rate = int(cfg.AUDIO_SAMPLE_RATE)
+    if rate not in SUPPORTED_RATES:
+        logger.warning(f"AUDIO_SAMPLE_RATE={rate} is not one of {SUPPORTED_RATES}; using {DEFAULT_RATE}")
+        return DEFAULT_RATE
+    return rate
+
+
+def component_rate(component):
+    """Sample rate an STT / TTS / VAD instance works at, if it says (None otherwise)."""
+    rate = getattr(component, "sample_rate", None)
+    if rate is None:
+        rate = getattr(getattr(component, "_opts", None), "sample_rate", None)
+    return rate if isinstance(rate, int) else None
+
+
+class AudioPath:
+    """
+    Sample rates along one call's audio pipeline and the resampling steps between them.
+    Caller audio: room track -> noise cancellation -> VAD and STT. Agent audio: TTS -> room
+    track. Every rate change is a resampler running for the whole call.
+    """
+
+    def __init__(self, room_rate: int, output_rate: int, vad=None, stt=None, tts=None):
+        self.rates = {
+            "room": room_rate,
+            "vad": component_rate(vad),
+            "stt": component_rate(stt),
+            "tts": component_rate(tts),
+            "output": output_rate,
+        }
+
+    def resamples(self) -> list:
+        """["room->stt 24000->16000", ...] for each hop that converts (unknown rates are skipped)."""
+        r = self.rates
+        hops = [("room", "vad"), ("room", "stt"), ("tts", "output")]
+        return [
+            f"{a}->{b} {r[a]}->{r[b]}"
+            for a, b in hops
+            if r[a] and r[b] and r[a] != r[b]
+        ]
+
+    def summary(self) -> dict:
+        return {"sample_rates": dict(self.rates), "resamples": self.resamples()}
+
+
+class CallCPU:
+    """
+    CPU this job process spends on one call. Job processes run one call at a time, so the
+    process's CPU time over the call is the call's cost. Split into the event-loop thread
+    (Python pipeline, STT/TTS streaming) and everything off it: native audio decode,
+    resampling, noise cancellation and encode, and VAD inference. Create and summarise on
+    the event loop.
+    """
+
+    def __init__(self):
+        self._wall = time.perf_counter()
+        self._process = time.process_time()
+        self._loop = time.thread_time()
+
+    def summary(self) -> dict:
+        wall_s = time.perf_counter() - self._wall
+        total_s = time.process_time() - self._process
+        loop_s = min(time.thread_time() - self._loop, total_s)
+        return {
+            "wall_s": round(wall_s, 1),
+            "cpu_ms": round(total_s * 1000),
+            "event_loop_ms": round(loop_s * 1000),
+            "off_loop_ms": round((total_s - loop_s) * 1000),
+            # Share of one core while the call ran, and how many such calls one core holds
+            "core_share": round(total_s / wall_s, 4) if wall_s > 0 else None,
+            "calls_per_core": round(wall_s / total_s, 1) if total_s > 0 else None,
+        }
@@ -0,0 +1,221 @@
+import re
+import unicodedata
+
+from livekit.agents import tokenize
+from livekit.agents import tts as agents_tts
+from livekit.agents.tokenize.tokenizer import SentenceStream, TokenData
+from livekit.agents.utils import shortuuid
+
+# Sentence ends per script. Hindi in Devanagari ends sentences with the danda, often with no
+# Latin punctuation anywhere in the reply.
+SENTENCE_ENDS = {
+    "latin": ".!?",
+    "devanagari": "।॥.!?",
+}
+DANDAS = "।॥"  # unambiguous: no abbreviation or decimal ever ends in one
+CLAUSE_MARKS = ",;:—–"
+
+# Words a clause can start with; a long run without punctuation is split before them
+CLAUSE_WORDS = {
+    "latin": ("and", "but", "because", "so", "which", "or", "then",
+              # Hinglish
+              "aur", "lekin", "kyunki", "magar", "isliye"),
+    "devanagari": ("और", "लेकिन", "पर", "क्योंकि", "तो", "कि", "जो", "या", "फिर", "इसलिए", "अगर", "मगर"),
+}
+# "Rs. 500" or "Dr. Sharma" doesn't end a sentence
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "rs", "st", "no", "vs", "etc", "sr", "jr", "prof", "approx", "e.g", "i.e"}
+
+_CLAUSE_WORD_RE = {
+    script: re.compile(r"\s(?=(?:" + "|".join(map(re.escape, words)) + r")\s)", re.IGNORECASE)
+    for script, words in CLAUSE_WORDS.items()
+}
+
+
+def script_of(text: str) -> str:
+    """"devanagari" if Devanagari letters outnumber Latin ones, else "latin"."""
+    deva = sum(1 for c in text if "ऀ" <= c <= "ॿ")
+    latin = sum(1 for c in text if c.isascii() and c.isalpha())
+    return "devanagari" if deva > latin else "latin"
+
+
+def spoken_length(text: str) -> int:
+    """Length without combining marks, so a Devanagari syllable (letter + matra) counts once."""
+    return sum(1 for c in text if unicodedata.category(c) not in ("Mn", "Mc"))
+
+
+class ChunkRules:
+    """
+    When to hand buffered LLM text to the TTS.
+
+    The first chunk of a reply goes out at the first sentence or clause boundary once it
+    has `first_chars` (spoken length), so audio starts after a few words. Later chunks
+    need twice the previous target, up to `min_chars`: audio is already playing, and
+    longer chunks sound better and cost fewer TTS requests. After the first chunk, clause
+    boundaries only split runs of `min_chars` or more. Nothing waits for punctuation past
+    `max_chars` (1.5 x `min_chars` for the first chunk): the text is cut at the last word
+    boundary.
+    """
+
+    def __init__(self, first_chars: int = 12, min_chars: int = 40, max_chars: int = 160):
+        self.first_chars = first_chars
+        self.min_chars = max(min_chars, first_chars)
+        self.max_chars = max(max_chars, self.min_chars)
+
+    def target(self, index: int) -> int:
+        """Minimum spoken length of the `index`-th chunk of a reply."""
+        return min(self.first_chars * 2 ** index, self.min_chars)
+
+    def find_cut(self, text: str, index: int, final: bool = False):
+        """End offset of the next chunk in `text`, or None to wait for more text."""
+        script = script_of(text)
+        target = self.target(index)
+        clause_min = target if index == 0 else self.min_chars
+        ends = SENTENCE_ENDS[script]
+
+        lengths = []
+        n = 0
+        for c in text:
+            if unicodedata.category(c) not in ("Mn", "Mc"):
+                n += 1
+            lengths.append(n)
+
+        candidates = []
+        for i, c in enumerate(text):
+            nxt = text[i + 1] if i + 1 < len(text) else None
+            if c in DANDAS:
+                candidates.append((i + 1, target))
+            elif c in ends:
+                # Only once the next word has started: "3.5", "Rs.500" and a "." still
+                # waiting for its next token don't end anything
+                if nxt is None and not final:
+                    continue
+                if nxt is not None and not nxt.isspace():
+                    continue
+                if c == "." and self._abbreviation(text, i):
+                    continue
+                candidates.append((i + 1, target))
+            elif c in CLAUSE_MARKS and nxt is not None and nxt.isspace():
+                candidates.append((i + 1, clause_min))
+        candidates += [(m.start(), clause_min) for m in _CLAUSE_WORD_RE[script].finditer(text)]
+
+        # The first chunk waits at most 1.5 x `min_chars`, so an unpunctuated reply still starts early
+        max_chars = self.max_chars if index > 0 else min(self.min_chars * 3 // 2, self.max_chars)
+        for end, needed in sorted(candidates):
+            if end <= 0:
+                continue
+            if lengths[end - 1] > max_chars:
+                break
+            if lengths[end - 1] >= needed:
+                return end
+
+        # No usable boundary in time: cut at the last word break that fits
+        if n > max_chars:
+            limit = next(i for i, length in enumerate(lengths) if length > max_chars)
+            space = text.rfind(" ", 0, limit)
+            return space if space > 0 else limit
+        return None
+
+    @staticmethod
+    def _abbreviation(text: str, i: int) -> bool:
+        start = i
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+        word = text[start:i].lower().strip("(\"'")
+        return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+    def split(self, text: str) -> list:
+        """All chunks of a complete text (non-streaming)."""
+        chunks = []
+        text = text.strip()
+        while text:
+            cut = self.find_cut(text, len(chunks), final=True)
+            if cut is None:
+                cut = len(text)
+            chunk = text[:cut].strip()
+            if chunk:
+                chunks.append(chunk)
+            text = text[cut:].strip()
+        return chunks
+
+
+class ScriptChunkStream(SentenceStream):
+    """Streaming side of ScriptChunker: emits chunks as soon as ChunkRules allows."""
+
+    def __init__(self, rules: ChunkRules):
+        super().__init__()
+        self._rules = rules
+        self._buf = ""
+        self._index = 0
+        self._segment_id = shortuuid()
+
+    def push_text(self, text: str) -> None:
+        self._check_not_closed()
+        if not text:
+            return
+        self._buf += text
+        self._drain(final=False)
+
+    def flush(self) -> None:
+        self._check_not_closed()
+        self._drain(final=True)
+        if self._buf.strip():
+            self._emit(self._buf)
+        self._buf = ""
+        self._index = 0
+        self._segment_id = shortuuid()
+
+    def end_input(self) -> None:
+        self.flush()
+        self._do_close()
+
+    async def aclose(self) -> None:
+        self._do_close()
+
+    def _drain(self, final: bool):
+        while self._buf:
+            cut = self._rules.find_cut(self._buf, self._index, final=final)
+            if cut is None:
+                return
+            self._emit(self._buf[:cut])
+            self._buf = self._buf[cut:].lstrip()
+
+    def _emit(self, chunk: str):
+        chunk = chunk.strip()
+        if chunk:
+            self._event_ch.send_nowait(TokenData(segment_id=self._segment_id, token=chunk))
+            self._index += 1
+
+
+class ScriptChunker(tokenize.SentenceTokenizer):
+    """
+    Script-aware sentence tokenizer for TTS input (English, Hinglish and Devanagari Hindi).
+    A drop-in for the framework's tokenizers: TTS plugins take it as their sentence
+    tokenizer, and non-streaming TTS gets it through a StreamAdapter (see adapt()).
+    """
+
+    def __init__(self, first_chars: int = 12, min_chars: int = 40, max_chars: int = 160):
+        self.rules = ChunkRules(first_chars, min_chars, max_chars)
+
+    def tokenize(self, text: str, *, language: str = None) -> list:
+        return self.rules.split(text)
+
+    def stream(self, *, language: str = None) -> ScriptChunkStream:
+        return ScriptChunkStream(self.rules)
+
+
+def settings(cfg) -> tuple:
+    """(first, min, max) chunk lengths for the provider specs, or None to keep each TTS's own tokenizer."""
+    if not cfg.TTS_CHUNKING_ENABLED:
+        return None
+    return (cfg.TTS_FIRST_CHUNK_CHARS, cfg.TTS_MIN_CHUNK_CHARS, cfg.TTS_MAX_CHUNK_CHARS)
+
+
+def tokenizer(chunking: tuple):
+    return ScriptChunker(*chunking) if chunking else None
+
+
+def adapt(client, chunking: tuple):
+    """Wrap a non-streaming TTS so the text it is given is chunked by ScriptChunker."""
+    if not chunking or client.capabilities.streaming:
+        return client
+    return agents_tts.StreamAdapter(tts=client, sentence_tokenizer=tokenizer(chunking))
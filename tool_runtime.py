@@ -0,0 +1,417 @@
+"""
+Dynamic tools defined in the Dashboard's Tool table.
+
+Each enabled Tool row becomes an async function tool for the LLM. `Tool.config` (JSON):
+
+    {
+      "type": "http",                      # "http" (default) or "user_data"
+      "url": "https://crm.example.com/contacts?phone={phone}",
+      "method": "GET",
+      "headers": {"Authorization": "Bearer ${CRM_TOKEN}"},   # ${VAR} = environment variable
+      "body": {"phone": "{phone}"},        # optional JSON body (POST/PUT)
+      "parameters": {"phone": {"type": "string", "description": "Phone number to look up"}},
+      "required": ["phone"],
+      "result_path": "data.customer",      # optional dot path into the JSON response
+      "timeout": 3,                        # seconds before the LLM is told to carry on
+      "cache_ttl": 300,                    # seconds; defaults to TOOL_CACHE_TTL for GET, 0 otherwise
+      "prefetch": true                     # run while the phone rings ({phone} = the callee)
+    }
+
+"user_data" tools answer from the contact attributes the Dashboard puts in the call
+metadata (optionally limited to "fields": [...]) and never touch the network.
+
+{name} placeholders are filled from the tool arguments, then from the call context
+(phone, user_data keys).
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import time
+from urllib.parse import quote
+
+from livekit.agents import llm
+
+logger = logging.getLogger("tool-runtime")
+
+# ${VAR} (environment, from the Dashboard's template) or {name} (tool argument / call context)
+_PLACEHOLDER = re.compile(r"\$\{(\w+)\}|\{(\w+)\}")
+
+# Longest tool result handed back to the LLM (characters)
+_MAX_RESULT_CHARS = 2000
+
+
+def _fill(template, values: dict, url: bool = False):
+    """Substitute {name} placeholders in strings / nested dicts and lists."""
+    if isinstance(template, str):
+        # One pass over the template only: substituted values (LLM arguments, contact data)
+        # are never scanned again, so a "${SECRET}" inside them stays literal text
+        def sub(match):
+            if match.group(1) is not None:
+                return os.getenv(match.group(1), "")
+            value = values.get(match.group(2), "")
+            return quote(str(value), safe="") if url else str(value)
+        return _PLACEHOLDER.sub(sub, template)
+    if isinstance(template, dict):
+        return {k: _fill(v, values) for k, v in template.items()}
+    if isinstance(template, list):
+        return [_fill(v, values) for v in template]
+    return template
+
+
+def _dig(data, path: str):
+    for part in (path or "").split("."):
+        if not part:
+            continue
+        if isinstance(data, list) and part.isdigit():
+            data = data[int(part)] if int(part) < len(data) else None
+        elif isinstance(data, dict):
+            data = data.get(part)
+        else:
+            return None
+    return data
+
+
+def _format(result) -> str:
+    text = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+    return text[:_MAX_RESULT_CHARS]
+
+
+class ToolSpec:
+    """One Tool row from the Dashboard, validated."""
+
+    def __init__(self, name: str, description: str, config: dict, default_timeout: float, default_ttl: float):
+        self.name = name
+        self.description = description
+        self.kind = config.get("type", "http")
+        self.url = config.get("url", "")
+        self.method = config.get("method", "GET").upper()
+        self.headers = config.get("headers") or {}
+        self.body = config.get("body")
+        self.parameters = config.get("parameters") or {}
+        self.required = config.get("required", list(self.parameters))
+        self.result_path = config.get("result_path")
+        self.fields = config.get("fields")
+        self.timeout = float(config.get("timeout", default_timeout))
+        self.cache_ttl = float(config.get("cache_ttl", default_ttl if self.method == "GET" else 0))
+        self.prefetch = bool(config.get("prefetch", False))
+        if self.kind == "http" and not self.url:
+            raise ValueError("http tool needs a url")
+
+    def schema(self) -> dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "parameters": {
+                "type": "object",
+                "properties": self.parameters,
+                "required": [p for p in self.required if p in self.parameters],
+            },
+        }
+
+    def cache_key(self, args: dict) -> str:
+        return f"{self.name}:{json.dumps(args, sort_keys=True, default=str)}"
+
+
+class ToolRegistry:
+    """
+    Process-wide set of Dashboard tools plus a TTL result cache. Concurrent identical
+    lookups share one request.
+
+    Job processes serve one call each, so results are also kept in `results_path` (a JSON
+    file under an fcntl lock, like TrunkPool's state) where every job process of the
+    worker finds them until they expire; the in-memory copy only saves the file read.
+
+    The worker's main process fetches the tool list once (refresh()); job processes
+    read it from the cache file (load()), like the settings cache.
+    """
+
+    def __init__(self, cache_path: str, default_timeout: float = 3.0, default_ttl: float = 60.0,
+                 max_entries: int = 1000, results_path: str = None):
+        self.cache_path = cache_path
+        self.results_path = results_path
+        self.default_timeout = default_timeout
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.specs = {}
+        self._results = {}   # cache key -> (expires_at, text)
+        self._inflight = {}  # cache key -> asyncio.Future
+        self._http = None
+        self._http_loop = None
+
+    # --- Tool list ---
+
+    def refresh(self, dashboard_url: str) -> int:
+        """Fetch enabled tools from the Dashboard (blocking) and write the cache file."""
+        import requests
+
+        api_url = f"{dashboard_url}/api/tools"
+        try:
+            resp = requests.get(api_url, timeout=5)
+            if resp.status_code != 200:
+                logger.warning(f"Failed to fetch tools: {resp.status_code} {resp.text}")
+                return self.load()
+            rows = resp.json()
+        except Exception as e:
+            logger.warning(f"Could not fetch tools from {api_url}: {e}")
+            return self.load()
+
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            tmp = self.cache_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(rows, f)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write tool cache: {e}")
+        return self._compile(rows)
+
+    def load(self) -> int:
+        """Load the tool list from the cache file (no network)."""
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        return self._compile(rows)
+
+    def _compile(self, rows: list) -> int:
+        specs = {}
+        for row in rows:
+            try:
+                spec = ToolSpec(row["name"], row.get("description", ""), row.get("config") or {},
+                                self.default_timeout, self.default_ttl)
+            except (KeyError, ValueError, TypeError) as e:
+                logger.warning(f"Skipping tool {row.get('name')}: {e}")
+                continue
+            specs[spec.name] = spec
+        self.specs = specs
+        logger.info(f"Loaded {len(specs)} dashboard tools: {list(specs)}")
+        return len(specs)
+
+    # --- Results ---
+
+    def cached(self, key: str):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self._results[key]
+            return None
+        return entry[1]
+
+    def _store(self, key: str, text: str, ttl: float):
+        if ttl <= 0:
+            return
+        self._results[key] = (time.time() + ttl, text)
+        if len(self._results) > self.max_entries:
+            now = time.time()
+            for k in [k for k, (exp, _) in self._results.items() if exp < now]:
+                del self._results[k]
+            while len(self._results) > self.max_entries:
+                del self._results[next(iter(self._results))]
+
+    # --- Results shared by the worker's job processes (blocking: call via asyncio.to_thread) ---
+
+    def _shared_get(self, key: str):
+        entry = self._locked(lambda state: state.get(key))
+        if entry is None or entry[0] < time.time():
+            return None
+        self._results[key] = tuple(entry)
+        return entry[1]
+
+    def _shared_put(self, key: str, text: str, ttl: float):
+        def mutate(state):
+            now = time.time()
+            for k in [k for k, (exp, _) in state.items() if exp < now]:
+                del state[k]
+            state[key] = [now + ttl, text]
+            while len(state) > self.max_entries:
+                del state[next(iter(state))]
+
+        self._locked(mutate)
+
+    def _locked(self, mutate):
+        """Run mutate(state) on the shared results under an exclusive file lock; returns its result."""
+        os.makedirs(os.path.dirname(self.results_path) or ".", exist_ok=True)
+        with open(self.results_path, "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                result = mutate(state)
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f, ensure_ascii=False)
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def fetch(self, spec: ToolSpec, args: dict, context: dict) -> asyncio.Future:
+        """Start (or join) the request for spec(args). The future resolves to the result text."""
+        key = spec.cache_key(args)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(spec, args, context, key))
+            if spec.cache_ttl > 0 or spec.method == "GET":
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return future
+
+    async def _run(self, spec: ToolSpec, args: dict, context: dict, key: str) -> str:
+        values = {**context.get("user_data", {}), "phone": context.get("phone", ""), **args}
+        if spec.kind == "user_data":
+            data = context.get("user_data") or {}
+            if spec.fields:
+                data = {k: data[k] for k in spec.fields if k in data}
+            return _format(data) if data else "No details on file for this contact."
+
+        if self.results_path and spec.cache_ttl > 0:
+            try:
+                text = await asyncio.to_thread(self._shared_get, key)
+            except OSError as e:
+                text = None
+                logger.warning(f"Could not read shared tool results: {e}")
+            if text is not None:
+                return text
+
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.closed or self._http_loop is not loop:
+            self._http = aiohttp.ClientSession()
+            self._http_loop = loop
+        url = _fill(spec.url, values, url=True)
+        kwargs = {"headers": _fill(spec.headers, values)}
+        if spec.body is not None and spec.method != "GET":
+            kwargs["json"] = _fill(spec.body, values)
+
+        start = time.perf_counter()
+        async with self._http.request(spec.method, url, **kwargs) as resp:
+            if resp.status >= 400:
+                text = f"Lookup failed (HTTP {resp.status})."
+                logger.warning(f"Tool {spec.name}: HTTP {resp.status} from {url}")
+                return text
+            try:
+                data = await resp.json(content_type=None)
+            except ValueError:
+                data = await resp.text()
+        result = _dig(data, spec.result_path) if spec.result_path and not isinstance(data, str) else data
+        text = _format(result) if result not in (None, "", {}, []) else "No results."
+        self._store(key, text, spec.cache_ttl)
+        logger.info(f"Tool {spec.name} took {(time.perf_counter() - start) * 1000:.0f} ms")
+        if self.results_path and spec.cache_ttl > 0:
+            try:
+                await asyncio.to_thread(self._shared_put, key, text, spec.cache_ttl)
+            except OSError as e:
+                logger.warning(f"Could not write shared tool results: {e}")
+        return text
+
+    async def aclose(self):
+        """Close the HTTP session (job shutdown); a later request opens a new one."""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+
+
+class CallTools:
+    """
+    The Dashboard tools for one call: compiled function tools, a per-call result cache
+    (repeat lookups in a call are free, even for tools with no worker TTL) and
+    prefetching while the phone rings.
+
+    A tool call waits at most `timeout` for its result; after that the LLM is told the
+    lookup is still running and the request finishes in the background, filling the caches
+    so asking again later is instant. The voice loop never blocks on a slow backend.
+    """
+
+    def __init__(self, registry: ToolRegistry, phone: str = None, user_data: dict = None):
+        self.registry = registry
+        self.context = {"phone": phone or "", "user_data": user_data if isinstance(user_data, dict) else {}}
+        self._results = {}
+        self._pending = {}
+        self.stats = {"calls": 0, "cache_hits": 0, "prefetched": 0, "timeouts": 0, "errors": 0}
+
+    @property
+    def user_data(self) -> dict:
+        return self.context["user_data"]
+
+    def names(self) -> set:
+        return set(self.registry.specs)
+
+    def build(self) -> list:
+        """Compile the registry's specs into function tools for this call."""
+        return [self._compile(spec) for spec in self.registry.specs.values()]
+
+    def _compile(self, spec: ToolSpec):
+        async def call(raw_arguments: dict):
+            return await self.invoke(spec, raw_arguments or {})
+
+        return llm.function_tool(call, raw_schema=spec.schema())
+
+    def prefetch(self):
+        """Start every prefetchable tool whose arguments the call context can fill."""
+        values = {**self.user_data, "phone": self.context["phone"]}
+        for spec in self.registry.specs.values():
+            if not spec.prefetch:
+                continue
+            if any(values.get(p) in (None, "") for p in spec.required):
+                continue
+            args = {p: values[p] for p in spec.parameters if values.get(p) not in (None, "")}
+            self._start(spec, args)
+            self.stats["prefetched"] += 1
+
+    def _start(self, spec: ToolSpec, args: dict) -> asyncio.Future:
+        key = spec.cache_key(args)
+        future = self._pending.get(key)
+        if future is None:
+            future = self._pending[key] = self.registry.fetch(spec, args, self.context)
+            future.add_done_callback(lambda f: self._done(key, spec, f))
+        return future
+
+    def _done(self, key: str, spec: ToolSpec, future: asyncio.Future):
+        self._pending.pop(key, None)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.stats["errors"] += 1
+            logger.warning(f"Tool {spec.name} failed: {future.exception()}")
+            return
+        if spec.cache_ttl > 0 or spec.method == "GET" or spec.kind == "user_data":
+            self._results[key] = future.result()
+
+    async def invoke(self, spec: ToolSpec, args: dict) -> str:
+        self.stats["calls"] += 1
+        key = spec.cache_key(args)
+        text = self._results.get(key) or self.registry.cached(key)
+        if text is not None:
+            self.stats["cache_hits"] += 1
+            return text
+
+        future = self._start(spec, args)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=spec.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.warning(f"Tool {spec.name} exceeded {spec.timeout:.1f}s; continuing in background")
+            return "The system is still looking this up. Tell the caller you are checking and continue; ask again shortly."
+        except Exception as e:
+            return f"Lookup failed: {e}"
+
+    async def lookup_contact(self, phone: str = None) -> str:
+        """Contact details from the call metadata (the built-in lookup_user tool)."""
+        self.stats["calls"] += 1
+        caller = self.context["phone"]
+        if phone and caller and phone.lstrip("+") != caller.lstrip("+"):
+            return f"No details on file for {phone}."
+        return _format(self.user_data) if self.user_data else "No details on file for this contact."
+
+    def summary(self) -> dict:
+        return dict(self.stats)
@@ -0,0 +1,329 @@
+import asyncio
+import concurrent.futures
+import glob
+import gzip
+import json
+import logging
+import os
+import time
+import uuid
+
+import aiohttp
+
+logger = logging.getLogger("transcript-delivery")
+
+
+class TranscriptDelivery:
+    """
+    Per-process delivery engine for call transcripts (Agent -> Dashboard).
+
+    - One aiohttp session per process. Job processes serve one call each, so a batch is
+      usually that call's transcript plus any records replayed from dead processes'
+      spools; several records share a POST only when a process serves several calls.
+    - Records are batched (size or time based), gzipped and POSTed to the bulk webhook.
+    - Failed batches are retried with exponential backoff; when the Dashboard saved part
+      of a batch, only the records it reports as failed are resent (saves are idempotent
+      per record id).
+    - Every record is also written to an append-only spool file
+      (<spool_dir>/spool-<pid>.jsonl) and acked there once delivered, so records
+      survive dashboard outages and worker restarts. Spools left behind by dead
+      processes are claimed and replayed in the background once the engine starts.
+    - Spool file I/O runs on one dedicated thread (in submission order), never on the
+      event loop.
+    """
+
+    def __init__(self, webhook_url: str, spool_dir: str, batch_size: int = 20,
+                 batch_interval: float = 0.5, max_queue: int = 10000, max_backoff: float = 30.0):
+        self.webhook_url = webhook_url
+        self.bulk_url = webhook_url.rstrip("/") + "/bulk"
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_backoff = max_backoff
+
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._http = None
+        self._task = None
+        self._spool_path = os.path.join(spool_dir, f"spool-{os.getpid()}.jsonl")
+        self._spool = None  # Only touched on the spool thread
+        self._io = None  # Spool thread
+        self._pending = 0
+        self._users = 0
+
+        # Metrics
+        self.delivered = 0
+        self.dropped = 0
+        self.retries = 0
+        self.last_latency_ms = 0.0
+        self._latency_total_ms = 0.0
+
+    # --- Lifecycle ---
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        """Open the HTTP session and start the sender loop (which first replays orphaned spools)."""
+        if self._task is not None:
+            return
+        self._io = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcript-spool")
+        self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Transcript delivery started (spool: {self._spool_path})")
+
+    async def acquire(self):
+        """Called by each job that will submit transcripts. Starts the engine on first use."""
+        self._users += 1
+        await self.start()
+
+    async def release(self, timeout: float = 10.0):
+        """Called when a job ends. The last job out drains and stops the engine."""
+        self._users = max(0, self._users - 1)
+        if self._users == 0:
+            await self.drain(timeout=timeout)
+
+    async def drain(self, timeout: float = 10.0):
+        """
+        Try to deliver everything queued within `timeout` seconds, then stop.
+        Anything left undelivered stays in the spool and is replayed by the next process.
+        """
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain timed out with {self._queue.qsize()} records still queued (kept in spool)")
+        await self.aclose()
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+        if self._io is not None:
+            io, self._io = self._io, None
+            await asyncio.get_running_loop().run_in_executor(io, self._spool_close, self._pending == 0)
+            io.shutdown(wait=False)
+
+    # --- Producer side ---
+
+    def submit(self, payload: dict) -> bool:
+        """
+        Queue a transcript payload for delivery. Non-blocking; safe to call from
+        sync event handlers. Returns False if the record had to be dropped.
+        """
+        record = {"id": uuid.uuid4().hex, "queued_at": time.time(), "payload": payload}
+        spooled = self._spool_write([record])
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            if spooled:
+                # Still on disk - the next process will replay it.
+                logger.warning(f"Delivery queue full; record {record['id']} deferred to spool")
+                return True
+            self.dropped += 1
+            logger.error(f"Delivery queue full and spool unavailable; dropped record {record['id']}")
+            return False
+        return True
+
+    # --- Metrics ---
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "last_latency_ms": round(self.last_latency_ms, 1),
+            "avg_latency_ms": round(self._latency_total_ms / self.delivered, 1) if self.delivered else 0.0,
+        }
+
+    # --- Spool (file I/O runs on the spool thread, in call order) ---
+
+    def _spool_write(self, records: list) -> bool:
+        """Append records to the spool. Returns False if the engine is not running."""
+        if self._io is None:
+            return False
+        self._pending += len(records)
+        self._io.submit(self._spool_append, [json.dumps(r) for r in records])
+        return True
+
+    def _spool_ack(self, ids: list):
+        if self._io is None:
+            return
+        self._pending = max(0, self._pending - len(ids))
+        # Everything delivered - compact the spool so it doesn't grow forever.
+        self._io.submit(self._spool_append, [json.dumps({"ack": i}) for i in ids], self._pending == 0)
+
+    def _open_spool(self):
+        if self._spool is None:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._spool = open(self._spool_path, "a", encoding="utf-8")
+        return self._spool
+
+    def _spool_append(self, lines: list, compact: bool = False):
+        try:
+            spool = self._open_spool()
+            for line in lines:
+                spool.write(line + "\n")
+            if compact:
+                spool.truncate(0)
+            spool.flush()
+        except OSError as e:
+            logger.error(f"Spool write failed: {e}")
+
+    def _spool_close(self, acked: bool):
+        if self._spool is None:
+            return
+        self._spool.close()
+        self._spool = None
+        if acked:
+            # Everything was acked - nothing to replay.
+            try:
+                os.remove(self._spool_path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _read_unacked(path: str) -> list:
+        records = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from a crash
+                if "ack" in entry:
+                    records.pop(entry["ack"], None)
+                else:
+                    records[entry["id"]] = entry
+        return list(records.values())
+
+    def _claim_orphans(self) -> list:
+        """Claim spool files of processes that are no longer running; returns their unacked records."""
+        claimed_records = []
+        for path in glob.glob(os.path.join(self.spool_dir, "spool-*.jsonl")):
+            if path == self._spool_path:
+                continue
+            try:
+                pid = int(os.path.basename(path)[len("spool-"):-len(".jsonl")])
+                os.kill(pid, 0)
+                continue  # Owner still alive
+            except (ValueError, ProcessLookupError):
+                pass
+            except PermissionError:
+                continue
+
+            claimed = f"{path}.claimed-{os.getpid()}"
+            try:
+                os.rename(path, claimed)  # Atomic: only one process wins the claim
+            except OSError:
+                continue
+
+            try:
+                records = self._read_unacked(claimed)
+            except OSError as e:
+                logger.error(f"Could not read claimed spool {claimed}: {e}")
+                continue
+            # Into our own spool first, so a crash now doesn't lose them
+            self._spool_append([json.dumps(r) for r in records])
+            os.remove(claimed)
+            if records:
+                logger.info(f"Replaying {len(records)} undelivered transcripts from {os.path.basename(path)}")
+            claimed_records += records
+        return claimed_records
+
+    async def _replay_orphans(self):
+        """Re-queue the records of dead processes' spools (claimed and read on the spool thread)."""
+        records = await asyncio.get_running_loop().run_in_executor(self._io, self._claim_orphans)
+        self._pending += len(records)
+        for record in records:
+            try:
+                self._queue.put_nowait(record)
+            except asyncio.QueueFull:
+                break  # The rest stay in our spool for the next start
+
+    # --- Sender loop ---
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        await self._replay_orphans()
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._deliver(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, batch: list):
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        backoff = 0.5
+
+        while True:
+            # record_id lets the Dashboard recognise a record it already saved
+            records = [dict(r["payload"], record_id=r["id"]) for r in batch]
+            body = gzip.compress(json.dumps({"records": records}).encode("utf-8"))
+            try:
+                async with self._http.post(self.bulk_url, data=body, headers=headers) as resp:
+                    if resp.status < 300:
+                        batch = await self._unsaved(batch, resp)
+                        if not batch:
+                            return
+                        logger.warning(f"{len(batch)} transcripts not saved, retrying them in {backoff:.1f}s")
+                    elif 400 <= resp.status < 500 and resp.status not in (408, 429):
+                        # Permanent rejection - retrying won't help.
+                        text = await resp.text()
+                        logger.error(f"Dashboard rejected {len(batch)} transcripts: {resp.status} {text[:200]}")
+                        self.dropped += len(batch)
+                        self._spool_ack([r["id"] for r in batch])
+                        return
+                    else:
+                        logger.warning(f"Transcript delivery failed with {resp.status}, retrying in {backoff:.1f}s")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Transcript delivery error: {e}, retrying in {backoff:.1f}s")
+
+            self.retries += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _unsaved(self, batch: list, resp) -> list:
+        """Ack the records of an accepted batch the Dashboard saved; return the ones it reports as failed."""
+        try:
+            results = (await resp.json(content_type=None) or {}).get("results") or []
+        except (ValueError, AttributeError, aiohttp.ClientError):
+            results = []  # Older Dashboards: a 2xx means every record was saved
+        failed = {r.get("record_id") for r in results if isinstance(r, dict) and not r.get("ok")}
+        saved = [r for r in batch if r["id"] not in failed]
+        if saved:
+            self._record_success(saved)
+        return [r for r in batch if r["id"] in failed]
+
+    def _record_success(self, batch: list):
+        now = time.time()
+        for record in batch:
+            latency_ms = (now - record["queued_at"]) * 1000
+            self.last_latency_ms = latency_ms
+            self._latency_total_ms += latency_ms
+        self.delivered += len(batch)
+        self._spool_ack([r["id"] for r in batch])
+        logger.info(f"Delivered {len(batch)} transcripts ({self.metrics()})")
@@ -0,0 +1,257 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+
+from list_trunks import list_outbound_trunks
+
+logger = logging.getLogger("trunk-pool")
+
+# SIP responses caused by the callee, not the trunk: don't fail over or penalise the trunk.
+CALLEE_SIP_STATUSES = {"404", "408", "480", "484", "486", "487", "600", "603"}
+
+# EWMA smoothing for success rate and answer latency
+_ALPHA = 0.2
+# How often each process re-lists trunks from LiveKit (seconds)
+_RELOAD_INTERVAL = 300
+
+
+# SIP final responses for calls that never connected, mapped to Call.status
+DIAL_OUTCOMES = {
+    "408": "NO_ANSWER", "480": "NO_ANSWER", "487": "NO_ANSWER",
+    "486": "BUSY", "600": "BUSY",
+    "603": "REJECTED",
+    "404": "INVALID_NUMBER", "484": "INVALID_NUMBER",
+}
+
+
+def sip_status(error: Exception) -> str:
+    """SIP status code carried by a LiveKit TwirpError from create_sip_participant, if any."""
+    metadata = getattr(error, "metadata", None) or {}
+    return str(metadata.get("sip_status_code", ""))
+
+
+def dial_outcome(error: Exception) -> str:
+    """Call.status for a dial-out that raised (ring timeout, busy, rejected...)."""
+    if isinstance(error, asyncio.TimeoutError):
+        return "NO_ANSWER"
+    return DIAL_OUTCOMES.get(sip_status(error), "FAILED")
+
+
+class TrunkPool:
+    """
+    Pool of outbound SIP trunks with per-trunk concurrency caps and rolling health scores.
+
+    State (active calls per process, success EWMA, answer-latency EWMA, failure streak,
+    cooldown) lives in a small JSON file guarded by an fcntl lock, so every job process
+    of the worker shares the same view. Dial-out picks the least-loaded healthy trunk
+    and fails over to the next one on trunk-side SIP errors.
+    """
+
+    def __init__(self, state_path: str, max_concurrent: int, min_health: float = 0.5,
+                 failure_streak: int = 3, cooldown: float = 60.0, limits: dict = None):
+        self.state_path = state_path
+        self.max_concurrent = max_concurrent
+        self.min_health = min_health
+        self.failure_streak = failure_streak
+        self.cooldown = cooldown
+        self.limits = limits or {}
+        self.trunk_ids = []
+        self._loaded_at = 0.0
+        self._check_task = None
+        os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+
+    # --- Trunk discovery ---
+
+    def load(self, lkapi, only_ids: list = None, fallback_id: str = None):
+        """
+        Set the trunks to dial: `only_ids` (SIP_TRUNK_IDS) when given, else just `fallback_id`
+        (SIP_TRUNK_ID). Configured ids are used right away; checking them against LiveKit's
+        trunk list runs in the background (at most every few minutes per process).
+        """
+        if not only_ids:
+            self.trunk_ids = [fallback_id] if fallback_id else []
+            return
+        if not self.trunk_ids:
+            self.trunk_ids = list(only_ids)
+        if time.time() - self._loaded_at >= _RELOAD_INTERVAL:
+            self._loaded_at = time.time()
+            self._check_task = asyncio.create_task(self._check(lkapi, list(only_ids)))
+
+    async def _check(self, lkapi, only_ids: list):
+        """Drop configured trunks that don't exist (any more) as outbound trunks in the project."""
+        try:
+            known = {t.sip_trunk_id for t in await list_outbound_trunks(lkapi)}
+        except Exception as e:
+            logger.warning(f"Could not list SIP trunks: {e}")
+            return
+        missing = [i for i in only_ids if i not in known]
+        if missing:
+            logger.warning(f"SIP_TRUNK_IDS not found among outbound trunks: {missing}")
+        self.trunk_ids = [i for i in only_ids if i in known] or only_ids
+        logger.info(f"Trunk pool: {self.trunk_ids}")
+
+    # --- Shared state ---
+
+    def _locked(self, mutate):
+        """Run mutate(state) -> result under an exclusive file lock and persist the state."""
+        with open(self.state_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                self._prune_dead(state)
+                result = mutate(state)
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _prune_dead(state: dict):
+        """Forget active calls held by processes that no longer exist (crashed jobs)."""
+        for trunk in state.values():
+            for pid in list(trunk.get("active", {})):
+                try:
+                    os.kill(int(pid), 0)
+                except ProcessLookupError:
+                    del trunk["active"][pid]
+                except (PermissionError, ValueError):
+                    pass
+
+    def _entry(self, state: dict, trunk_id: str) -> dict:
+        return state.setdefault(trunk_id, {
+            "active": {}, "ok": 1.0, "latency_ms": 0.0, "fail_streak": 0, "cooldown_until": 0.0,
+        })
+
+    def _cap(self, trunk_id: str) -> int:
+        return self.limits.get(trunk_id, self.max_concurrent)
+
+    @staticmethod
+    def _active(entry: dict) -> int:
+        return sum(entry["active"].values())
+
+    def score(self, entry: dict) -> float:
+        """Health score in [0, 1]: success rate, lightly penalised by slow answers."""
+        latency_penalty = min(entry["latency_ms"], 20000) / 20000 * 0.3
+        return max(0.0, entry["ok"] - latency_penalty)
+
+    # --- Selection ---
+
+    def _acquire(self, exclude: set, preferred: str = None):
+        pid = str(os.getpid())
+        now = time.time()
+
+        def mutate(state):
+            candidates = []
+            for trunk_id in self.trunk_ids:
+                if trunk_id in exclude:
+                    continue
+                entry = self._entry(state, trunk_id)
+                load = self._active(entry) / max(self._cap(trunk_id), 1)
+                if load >= 1:
+                    continue
+                healthy = entry["cooldown_until"] <= now and entry["ok"] >= self.min_health
+                candidates.append((not healthy, trunk_id != preferred, load, -self.score(entry), trunk_id))
+            if not candidates:
+                return None
+            # Healthy first, then the dispatcher's preferred trunk, then least loaded, then best score
+            trunk_id = min(candidates)[-1]
+            entry = self._entry(state, trunk_id)
+            entry["active"][pid] = entry["active"].get(pid, 0) + 1
+            return trunk_id
+
+        return self._locked(mutate)
+
+    def release(self, trunk_id: str):
+        """Free the channel held on `trunk_id` (call ended or dial failed)."""
+        pid = str(os.getpid())
+
+        def mutate(state):
+            entry = self._entry(state, trunk_id)
+            if entry["active"].get(pid, 0) > 1:
+                entry["active"][pid] -= 1
+            else:
+                entry["active"].pop(pid, None)
+
+        self._locked(mutate)
+
+    def _record(self, trunk_id: str, ok: bool, latency_ms: float = None):
+        def mutate(state):
+            entry = self._entry(state, trunk_id)
+            entry["ok"] = entry["ok"] * (1 - _ALPHA) + (1.0 if ok else 0.0) * _ALPHA
+            if latency_ms is not None:
+                entry["latency_ms"] = latency_ms if not entry["latency_ms"] else \
+                    entry["latency_ms"] * (1 - _ALPHA) + latency_ms * _ALPHA
+            if ok:
+                entry["fail_streak"] = 0
+            else:
+                entry["fail_streak"] += 1
+                if entry["fail_streak"] >= self.failure_streak:
+                    entry["cooldown_until"] = time.time() + self.cooldown
+                    logger.warning(f"Trunk {trunk_id} failed {entry['fail_streak']} times in a row; cooling down {self.cooldown:.0f}s")
+
+        self._locked(mutate)
+
+    # --- Dialing ---
+
+    def _release_acquired(self, acquiring: asyncio.Future):
+        if not acquiring.cancelled() and acquiring.exception() is None and acquiring.result() is not None:
+            asyncio.get_running_loop().run_in_executor(None, self.release, acquiring.result())
+
+    async def dial(self, sip_api, build_request, preferred: str = None) -> str:
+        """
+        Place the call through the best available trunk, failing over on trunk-side errors.
+
+        `build_request(trunk_id)` returns the CreateSIPParticipantRequest for that trunk.
+        Returns the trunk that connected; the caller must release() it when the call ends.
+        Raises the last error if every trunk failed, or immediately for callee-side errors.
+        A failed or cancelled dial never keeps its channel.
+        """
+        tried = set()
+        last_error = None
+        while True:
+            acquiring = asyncio.ensure_future(asyncio.to_thread(self._acquire, tried, preferred))
+            try:
+                trunk_id = await asyncio.shield(acquiring)
+            except asyncio.CancelledError:
+                # The thread still takes a channel: hand it back once it has
+                acquiring.add_done_callback(self._release_acquired)
+                raise
+            if trunk_id is None:
+                if last_error:
+                    raise last_error
+                raise RuntimeError("No SIP trunk available (all at capacity)")
+            tried.add(trunk_id)
+
+            start = time.perf_counter()
+            connected = False
+            try:
+                await sip_api.create_sip_participant(build_request(trunk_id))
+                connected = True
+            except Exception as e:
+                status = sip_status(e)
+                if status in CALLEE_SIP_STATUSES:
+                    # The trunk worked; the callee didn't pick up / rejected.
+                    await asyncio.to_thread(self._record, trunk_id, True)
+                    raise
+                await asyncio.to_thread(self._record, trunk_id, False)
+                logger.warning(f"Dial via trunk {trunk_id} failed (SIP {status or '?'}: {e}); trying next trunk")
+                last_error = e
+                continue
+            finally:
+                # Failed, or cancelled mid-dial (the caller's wait_for, shutdown): free the channel
+                if not connected:
+                    await asyncio.shield(asyncio.to_thread(self.release, trunk_id))
+
+            await asyncio.to_thread(self._record, trunk_id, True, (time.perf_counter() - start) * 1000)
+            return trunk_id
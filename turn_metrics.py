@@ -0,0 +1,380 @@
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from livekit.agents import metrics
+
+logger = logging.getLogger("turn-metrics")
+
+# Histogram bucket upper bounds in milliseconds.
+BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+
+# Per-turn stages, measured from the moment the user stopped speaking (VAD).
+#   stt_final        final transcript received
+#   llm_first_token  first LLM token
+#   tts_first_byte   first TTS audio byte
+#   first_audio      agent started speaking (first frame published)
+# Plus the provider-intrinsic numbers reported by the plugins:
+#   llm_ttft, tts_ttfb
+STAGES = ("stt_final", "llm_first_token", "tts_first_byte", "first_audio", "llm_ttft", "tts_ttfb")
+
+# Which provider each stage is attributed to.
+STAGE_KIND = {
+    "stt_final": "stt",
+    "llm_first_token": "llm",
+    "llm_ttft": "llm",
+    "tts_first_byte": "tts",
+    "tts_ttfb": "tts",
+    "first_audio": "tts",
+}
+
+
+# Histograms of job processes that have finished, summed (see LatencyHistograms.fold).
+TOTAL_FILE = "turns-total.json"
+LOCK_FILE = "turns.lock"
+
+
+def _add(merged: dict, data: dict):
+    """Add one histogram dump into `merged`."""
+    counters = merged.setdefault("_counters", {})
+    for key, n in data.get("_counters", {}).items():
+        counters[key] = counters.get(key, 0) + n
+    for key, entry in data.items():
+        if key == "_counters":
+            continue
+        out = merged.setdefault(key, {"buckets": [0] * len(BUCKETS_MS), "count": 0, "sum": 0.0})
+        out["buckets"] = [a + b for a, b in zip(out["buckets"], entry["buckets"])]
+        out["count"] += entry["count"]
+        out["sum"] += entry["sum"]
+
+
+def _read(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write(path: str, data: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _DirLock:
+    """Exclusive lock over a metrics dir: folds and scrapes never see a dump counted twice."""
+
+    def __init__(self, metrics_dir: str):
+        self.path = os.path.join(metrics_dir, LOCK_FILE)
+
+    def __enter__(self):
+        self._f = open(self.path, "a")
+        fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
+
+
+class LatencyHistograms:
+    """
+    Cumulative latency histograms keyed by (stage, provider).
+
+    Every job process keeps its own copy and dumps it to <metrics_dir>/turns-<pid>.json
+    while its call runs. When the job ends, fold() adds it to turns-total.json and removes
+    the per-pid file, so the directory holds one file per live call plus the total, and a
+    recycled PID never overwrites a finished call's numbers. The metrics endpoint merges
+    the total with the live files on scrape, folding files left by processes that died
+    without folding (the same approach as prometheus_client's multiprocess mode).
+    """
+
+    def __init__(self, metrics_dir: str = None):
+        self.metrics_dir = metrics_dir
+        self._data = {}
+        self._counters = {}  # "event|kind|provider" -> count (see provider_chain.py)
+        self._dumped = False
+        self._dump_task = None
+        self._dump_again = False
+
+    def observe(self, stage: str, provider: str, value_ms: float):
+        key = f"{stage}|{provider}"
+        entry = self._data.get(key)
+        if entry is None:
+            entry = self._data[key] = {"buckets": [0] * len(BUCKETS_MS), "count": 0, "sum": 0.0}
+        for i, bound in enumerate(BUCKETS_MS):
+            if value_ms <= bound:
+                entry["buckets"][i] += 1
+        entry["count"] += 1
+        entry["sum"] += value_ms
+
+    def count(self, event: str, kind: str, provider: str, n: int = 1):
+        key = f"{event}|{kind}|{provider}"
+        self._counters[key] = self._counters.get(key, 0) + n
+
+    def _path(self) -> str:
+        return os.path.join(self.metrics_dir, f"turns-{os.getpid()}.json")
+
+    def dump_soon(self):
+        """
+        Write the histograms from a worker thread, off the event loop. One write at a time:
+        whatever is observed while one runs goes out in the next.
+        """
+        if not self.metrics_dir:
+            return
+        if self._dump_task is not None and not self._dump_task.done():
+            self._dump_again = True
+            return
+        self._dump_task = asyncio.ensure_future(self._dump_in_thread())
+
+    async def _dump_in_thread(self):
+        while True:
+            self._dump_again = False
+            # Copied on the loop: observe() keeps running while the thread writes
+            data = {k: dict(v, buckets=list(v["buckets"])) for k, v in self._data.items()}
+            try:
+                await asyncio.to_thread(self.dump, data, dict(self._counters))
+            except OSError as e:
+                logger.warning(f"Could not write turn metrics: {e}")
+            if not self._dump_again:
+                return
+
+    async def flush(self):
+        """Wait for a background dump still being written (call before fold())."""
+        if self._dump_task is not None:
+            await self._dump_task
+
+    def dump(self, data: dict = None, counters: dict = None):
+        """Write this process's histograms to disk (atomic rename). Blocking: see dump_soon()."""
+        if not self.metrics_dir:
+            return
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        if not self._dumped:
+            # A file under our PID is a dead process's that was never folded: keep its counts
+            with _DirLock(self.metrics_dir):
+                if os.path.exists(self._path()):
+                    self._fold_file(self.metrics_dir, self._path())
+        self._dumped = True
+        _write(self._path(), {**(self._data if data is None else data),
+                              "_counters": self._counters if counters is None else counters})
+
+    def fold(self):
+        """At job end: add this process's histograms to the total and remove its file."""
+        if not self.metrics_dir or not (self._data or self._counters):
+            return
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        with _DirLock(self.metrics_dir):
+            total_path = os.path.join(self.metrics_dir, TOTAL_FILE)
+            total = _read(total_path)
+            _add(total, {**self._data, "_counters": self._counters})
+            _write(total_path, total)
+            try:
+                os.remove(self._path())
+            except OSError:
+                pass
+        # Anything recorded after this (late events) starts a fresh per-pid file
+        self._data = {}
+        self._counters = {}
+
+    @staticmethod
+    def _fold_file(metrics_dir: str, path: str):
+        """Move one per-pid file into the total. Caller holds the dir lock."""
+        total_path = os.path.join(metrics_dir, TOTAL_FILE)
+        total = _read(total_path)
+        _add(total, _read(path))
+        _write(total_path, total)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def merge_dir(metrics_dir: str) -> dict:
+        """The total plus every live process's histograms; files of dead processes are folded."""
+        merged = {}
+        with _DirLock(metrics_dir):
+            for path in glob.glob(os.path.join(metrics_dir, "turns-*.json")):
+                pid = os.path.basename(path)[len("turns-"):-len(".json")]
+                if pid.isdigit() and not _alive(int(pid)):
+                    LatencyHistograms._fold_file(metrics_dir, path)
+            for path in glob.glob(os.path.join(metrics_dir, "turns-*.json")):
+                _add(merged, _read(path))
+        return merged
+
+
+def render_prometheus(merged: dict) -> str:
+    """Render merged histograms in the Prometheus text exposition format."""
+    lines = [
+        "# HELP agent_turn_latency_ms Voice turn latency from end of user speech, by stage and provider.",
+        "# TYPE agent_turn_latency_ms histogram",
+    ]
+    counters = merged.get("_counters", {})
+    for key in sorted(k for k in merged if k != "_counters"):
+        stage, provider = key.split("|", 1)
+        entry = merged[key]
+        labels = f'stage="{stage}",provider="{provider}"'
+        for bound, count in zip(BUCKETS_MS, entry["buckets"]):
+            lines.append(f'agent_turn_latency_ms_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'agent_turn_latency_ms_bucket{{{labels},le="+Inf"}} {entry["count"]}')
+        lines.append(f"agent_turn_latency_ms_sum{{{labels}}} {entry['sum']:.1f}")
+        lines.append(f"agent_turn_latency_ms_count{{{labels}}} {entry['count']}")
+    if counters:
+        lines += [
+            "# HELP agent_provider_events_total Provider chain outcomes (win, loss, error, hedge, breaker_open) and call transfer outcomes (kind=transfer).",
+            "# TYPE agent_provider_events_total counter",
+        ]
+        for key in sorted(counters):
+            event, kind, provider = key.split("|", 2)
+            lines.append(
+                f'agent_provider_events_total{{kind="{kind}",provider="{provider}",event="{event}"}} {counters[key]}'
+            )
+    return "\n".join(lines) + "\n"
+
+
+def _percentile(values: list, pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 1)
+
+
+class TurnTracker:
+    """
+    Timestamps each conversation turn of one AgentSession and feeds the
+    process-wide histograms. `providers` maps "stt"/"llm"/"tts" to provider names.
+    """
+
+    def __init__(self, session, providers: dict, histograms: LatencyHistograms):
+        self.providers = providers
+        self.histograms = histograms
+        self.turns = []
+        self._current = None
+        self._answered_at = None
+        self.answer_to_first_audio = None
+
+        session.on("user_state_changed", self._on_user_state)
+        session.on("user_input_transcribed", self._on_transcribed)
+        session.on("metrics_collected", self._on_metrics)
+        session.on("agent_state_changed", self._on_agent_state)
+
+    # --- Event handlers ---
+
+    def _on_user_state(self, ev):
+        if ev.old_state == "speaking" and ev.new_state != "speaking":
+            # End of user speech (VAD) starts a new turn
+            self._finish_turn()
+            self._current = {"eou": time.time(), "stages": {}}
+
+    def _on_transcribed(self, ev):
+        if ev.is_final and self._current is not None:
+            self._mark("stt_final", time.time())
+
+    def _on_metrics(self, ev):
+        m = ev.metrics
+        if self._current is None:
+            return
+        if isinstance(m, metrics.LLMMetrics):
+            self._set("llm_ttft", m.ttft * 1000)
+            self._mark("llm_first_token", m.timestamp - m.duration + m.ttft)
+        elif isinstance(m, metrics.TTSMetrics):
+            self._set("tts_ttfb", m.ttfb * 1000)
+            self._mark("tts_first_byte", m.timestamp - m.duration + m.ttfb)
+
+    def _on_agent_state(self, ev):
+        if ev.new_state != "speaking":
+            return
+        if self._answered_at is not None and self.answer_to_first_audio is None:
+            self.answer_to_first_audio = round((time.time() - self._answered_at) * 1000, 1)
+            self.histograms.observe("answer_to_first_audio", self.providers.get("tts", "unknown"),
+                                    self.answer_to_first_audio)
+        if self._current is not None:
+            self._mark("first_audio", time.time())
+
+    def answered(self):
+        """The callee picked up (or joined): the clock for answer -> first agent audio starts."""
+        self._answered_at = time.time()
+
+    # --- Turn bookkeeping ---
+
+    def _mark(self, stage: str, timestamp: float):
+        """Record `stage` as ms since end of user speech (first occurrence per turn only)."""
+        self._set(stage, max(0.0, (timestamp - self._current["eou"]) * 1000))
+
+    def _set(self, stage: str, value_ms: float):
+        self._current["stages"].setdefault(stage, value_ms)
+
+    def _finish_turn(self):
+        if self._current is None or not self._current["stages"]:
+            self._current = None
+            return
+        stages = {k: round(v, 1) for k, v in self._current["stages"].items()}
+        self.turns.append(stages)
+        for stage, value in stages.items():
+            self.histograms.observe(stage, self.providers.get(STAGE_KIND[stage], "unknown"), value)
+        self._current = None
+        self.histograms.dump_soon()
+
+    def close(self):
+        self._finish_turn()
+
+    def summary(self) -> dict:
+        """Per-call summary attached to the transcript payload."""
+        out = {"turns": len(self.turns), "providers": self.providers,
+               "answer_to_first_audio_ms": self.answer_to_first_audio}
+        for stage in STAGES:
+            values = [t[stage] for t in self.turns if stage in t]
+            if values:
+                out[stage] = {"p50": _percentile(values, 50), "p95": _percentile(values, 95)}
+        return out
+
+
+def start_metrics_server(port: int, metrics_dir: str):
+    """
+    Serve /metrics (Prometheus text format) from a daemon thread in the main worker process.
+    Clears histograms left over from a previous run first.
+    """
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "turns-*.json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus(LatencyHistograms.merge_dir(metrics_dir)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep scrapes out of the agent logs
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Metrics endpoint listening on :{port}/metrics")
+    return server